@@ -372,7 +372,11 @@ def publish_changes(
     current_user = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
-    """Publish changes to the project"""
+    """Publish changes to the project
+    
+    A running demo in the production or static profile is rebuilt by a
+    background job (skipped if its sources hash the same as its current build).
+    """
     demo = db.query(Demonstration).filter(Demonstration.id == demo_id).first()
     if not demo:
         raise HTTPException(
@@ -380,21 +384,26 @@ def publish_changes(
             detail="Project not found"
         )
     
-    # For now, we'll just rebuild the project if it's running
-    # In a real scenario, you might want to trigger a rebuild or deployment
-    
+    from core.builds import DEV, demo_profile
+    from core.jobs import job_engine, rebuild_demo
     from core.process_manager import process_manager
     
     # Check if demo is running
     status_info = process_manager.get_demo_status(demo.folder_name)
     
-    if status_info.get('status') == 'running':
-        # Note: This is a placeholder. In production, you would:
-        # 1. Rebuild the Next.js project
-        # 2. Restart the dev server or deploy to production
+    if status_info.get('status') in ('running', 'starting', 'building'):
+        if demo_profile(demo.folder_name) != DEV:
+            # Built demos only see changes through a new build
+            job = job_engine.submit('rebuild', demo.folder_name, rebuild_demo)
+            return {
+                'status': 'success',
+                'rebuild': True,
+                'job_id': job['id'],
+                'message': 'Rebuilding the demo; it restarts with the changes once the build finishes.'
+            }
         return {
             'status': 'success',
-            'message': 'Changes will be reflected on reload. Rebuild recommended if using production build.'
+            'message': 'Changes will be reflected on reload.'
         }
     else:
         return {
@@ -1,19 +1,45 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from starlette.requests import Request
 from sqlalchemy.orm import Session
-from typing import Dict
+from typing import Dict, List, Optional
 from pydantic import BaseModel
+import asyncio
+import json
+import os
 import shutil
-import subprocess
 
 from db.session import get_db
 from models.demonstration import Demonstration
 from api.auth import get_current_admin
+from core.config import settings
+from core.demo_config import PROJECTS_DIR, save_demo_config
 from core.process_manager import process_manager
+from core.routing import routing_table
+from core.registry_sync import registry_sync
+from core.upstream import upstream_pool
+from core.asset_cache import asset_cache
+from core.singleflight import request_coalescer
+from core.wake import demo_waker
+from core.reaper import idle_reaper
+from core.resources import resource_sampler
+from core.eviction import memory_evictor, is_pinned
+from core.prewarm import demo_prewarmer
+from core.jobs import job_engine, npm_install
+from core.dependency_store import dependency_store
+from core.clone import clone_engine
+from core.next_cache import next_cache
+from core.demo_logs import demo_logs
+from core.ports import port_allocator
 
 router = APIRouter(prefix="/demo-manager", tags=["demo-manager"])
 
 
+class BulkStop(BaseModel):
+    demo_ids: List[int] = []  # empty stops every demo the process manager knows
+    parallelism: Optional[int] = None
+
+
 class CreateFromTemplate(BaseModel):
     title: str
     description: str
@@ -25,10 +51,11 @@ class CreateFromTemplate(BaseModel):
 @router.post("/start/{demo_id}", response_model=Dict)
 def start_demo(
     demo_id: int,
+    wait: bool = False,
     current_user = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
-    """Start a demo project"""
+    """Start a demo project; with wait=true, return once it is ready (or failed)"""
     demo = db.query(Demonstration).filter(Demonstration.id == demo_id).first()
     if not demo:
         raise HTTPException(
@@ -41,27 +68,56 @@ def start_demo(
     project_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '..', 'projects')
     
     result = process_manager.start_demo(demo.folder_name, project_path)
+    if wait and result['status'] in ('started', 'already_running'):
+        status_info = process_manager.wait_until_ready(demo.folder_name, settings.DEMO_STARTUP_TIMEOUT)
+        result.update(status_info, status=result['status'])
     return result
 
 
 @router.post("/stop/{demo_id}", response_model=Dict)
-def stop_demo(
+async def stop_demo(
     demo_id: int,
     current_user = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
     """Stop a demo project"""
-    demo = db.query(Demonstration).filter(Demonstration.id == demo_id).first()
-    if not demo:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Demonstration not found"
-        )
-    
-    result = process_manager.stop_demo(demo.folder_name)
+    folder_name = await asyncio.to_thread(_get_demo_folder, demo_id, db)
+    result = await process_manager.stop_demo_async(folder_name)
     return result
 
 
+@router.post("/stop-bulk", response_model=Dict)
+async def stop_demos_bulk(
+    data: BulkStop,
+    current_user = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Stop several demos (or every running one) concurrently"""
+    def folders_to_stop() -> Dict[str, Optional[int]]:
+        if data.demo_ids:
+            demos = db.query(Demonstration).filter(Demonstration.id.in_(data.demo_ids)).all()
+            return {demo.folder_name: demo.id for demo in demos}
+        return {folder_name: None for folder_name in process_manager.list_all()}
+    
+    # Database and registry reads stay off the event loop
+    folders = await asyncio.to_thread(folders_to_stop)
+    
+    outcome = await process_manager.stop_many(list(folders), data.parallelism)
+    return {
+        'results': [
+            {'demo_id': folders[folder_name], 'folder_name': folder_name, **result}
+            for folder_name, result in outcome['results'].items()
+        ],
+        'seconds': outcome['seconds'],
+    }
+
+
+@router.get("/shutdown-stats", response_model=Dict)
+def get_shutdown_stats(current_user = Depends(get_current_admin)):
+    """How long stopping all demos took when the backend last shut down"""
+    return {'last_shutdown': process_manager.last_shutdown}
+
+
 @router.get("/status/{demo_id}", response_model=Dict)
 def get_demo_status(
     demo_id: int,
@@ -119,9 +175,216 @@ def redirect_to_demo(demo_id: int, request: Request, db: Session = Depends(get_d
 
 
 @router.get("/all")
-def list_all_demos():
-    """List all demo processes"""
-    return process_manager.list_all()
+def list_all_demos(current_user = Depends(get_current_admin)):
+    """List all demo processes, with the latest resource sample of each and whether it is pinned"""
+    demos = process_manager.list_all()
+    for folder_name, info in demos.items():
+        info['resources'] = resource_sampler.latest(folder_name)
+        info['pinned'] = is_pinned(folder_name)
+    return demos
+
+
+@router.get("/proxy-stats", response_model=Dict)
+def get_proxy_stats(current_user = Depends(get_current_admin)):
+    """Routing, connection pool, asset cache, coalescing and wake statistics of the demo proxy"""
+    return {
+        'routing': routing_table.stats(),
+        'registry_sync': registry_sync.stats(),
+        'upstream_pool': upstream_pool.stats(),
+        'asset_cache': asset_cache.stats(),
+        'coalescing': request_coalescer.stats(),
+        'wake': demo_waker.stats(),
+    }
+
+
+@router.post("/reconcile", response_model=Dict)
+def reconcile_orphaned_demos(dry_run: bool = False, current_user = Depends(get_current_admin)):
+    """Find (and unless dry_run, kill) orphaned Node process trees under projects/"""
+    return process_manager.reconcile_orphans(PROJECTS_DIR, dry_run=dry_run)
+
+
+@router.get("/ports", response_model=Dict)
+def get_port_pool(current_user = Depends(get_current_admin)):
+    """Free, reserved and active ports of the demo port pool"""
+    return port_allocator.stats()
+
+
+@router.get("/idle-reaper", response_model=Dict)
+def get_idle_reaper_stats(current_user = Depends(get_current_admin)):
+    """Demos stopped for idleness and the memory (RSS) reclaimed"""
+    return idle_reaper.stats()
+
+
+def _get_demo_folder(demo_id: int, db: Session) -> str:
+    demo = db.query(Demonstration).filter(Demonstration.id == demo_id).first()
+    if not demo:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Demonstration not found"
+        )
+    return demo.folder_name
+
+
+@router.post("/install/{demo_id}", response_model=Dict)
+def install_demo_dependencies(
+    demo_id: int,
+    current_user = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """(Re)install a demo's dependencies as a background job"""
+    folder_name = _get_demo_folder(demo_id, db)
+    active = job_engine.active_for(folder_name)
+    if active:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job {active['id']} ({active['kind']}) is still running for this demo"
+        )
+    # Installing replaces node_modules under a running server
+    demo_status = process_manager.get_demo_status(folder_name)['status']
+    if demo_status not in ('not_running', 'failed'):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Demo is {demo_status}; stop it before reinstalling its dependencies"
+        )
+    return job_engine.submit('npm_install', folder_name, npm_install, os.path.join(PROJECTS_DIR, folder_name))
+
+
+@router.get("/resources", response_model=Dict)
+def get_resource_stats(current_user = Depends(get_current_admin)):
+    """RSS, CPU, open files and threads of every running demo's process tree, largest first"""
+    return resource_sampler.stats()
+
+
+@router.get("/memory", response_model=Dict)
+def get_memory_stats(current_user = Depends(get_current_admin)):
+    """Demo memory budget, watermarks, current usage and demos evicted under pressure"""
+    return memory_evictor.stats()
+
+
+@router.get("/prewarm", response_model=Dict)
+def get_prewarm_stats(current_user = Depends(get_current_admin)):
+    """Demos started at boot because they are requested most (or listed), and how long each took"""
+    return demo_prewarmer.stats()
+
+
+@router.post("/prewarm", response_model=Dict)
+async def prewarm_demos(current_user = Depends(get_current_admin)):
+    """Start the prewarm candidates now, in the background"""
+    demo_prewarmer.start()
+    return demo_prewarmer.stats()
+
+
+@router.get("/dependency-store", response_model=Dict)
+async def get_dependency_store_stats(current_user = Depends(get_current_admin)):
+    """Shared node_modules trees, the projects using each and the disk they save"""
+    return await asyncio.to_thread(dependency_store.stats)
+
+
+@router.post("/dependency-store/gc", response_model=Dict)
+async def collect_dependency_store(dry_run: bool = False, current_user = Depends(get_current_admin)):
+    """Delete (or with dry_run, list) node_modules trees no project uses anymore"""
+    return await asyncio.to_thread(dependency_store.gc, dry_run)
+
+
+@router.get("/next-cache", response_model=Dict)
+async def get_next_cache_stats(current_user = Depends(get_current_admin)):
+    """Compiler cache snapshots per template, and first page compile times of seeded and cold starts"""
+    return await asyncio.to_thread(next_cache.stats)
+
+
+@router.post("/pin/{demo_id}", response_model=Dict)
+def pin_demo(
+    demo_id: int,
+    current_user = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Never evict this demo under memory pressure"""
+    folder_name = _get_demo_folder(demo_id, db)
+    save_demo_config(folder_name, pinned=True)
+    return {'folder_name': folder_name, 'pinned': True}
+
+
+@router.post("/unpin/{demo_id}", response_model=Dict)
+def unpin_demo(
+    demo_id: int,
+    current_user = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Let this demo be evicted under memory pressure again"""
+    folder_name = _get_demo_folder(demo_id, db)
+    save_demo_config(folder_name, pinned=None)
+    return {'folder_name': folder_name, 'pinned': False}
+
+
+@router.get("/resources/{demo_id}", response_model=Dict)
+def get_demo_resource_history(
+    demo_id: int,
+    current_user = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Resource samples of a demo, oldest first"""
+    folder_name = _get_demo_folder(demo_id, db)
+    return {
+        'folder_name': folder_name,
+        'interval': resource_sampler.interval,
+        'samples': resource_sampler.history(folder_name),
+    }
+
+
+@router.get("/logs/{demo_id}", response_model=Dict)
+def get_demo_logs(
+    demo_id: int,
+    lines: int = 200,
+    current_user = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Most recent stdout/stderr lines of a demo"""
+    folder_name = _get_demo_folder(demo_id, db)
+    buf = demo_logs.get(folder_name)
+    return {'folder_name': folder_name, 'lines': buf.tail(lines) if buf else []}
+
+
+@router.get("/logs/{demo_id}/stream")
+async def stream_demo_logs(
+    demo_id: int,
+    request: Request,
+    lines: int = 200,
+    current_user = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Stream a demo's output as Server-Sent Events: the last lines, then new ones as they arrive"""
+    folder_name = await asyncio.to_thread(_get_demo_folder, demo_id, db)
+    # The stream may stay open for hours; don't pin a database connection
+    db.close()
+    buf = demo_logs.buffer(folder_name)
+    last_event_id = request.headers.get('last-event-id', '')
+    
+    async def events():
+        # A reconnecting client resumes after the last line it received
+        if last_event_id.isdigit():
+            pending = buf.since(int(last_event_id))
+        else:
+            pending = buf.tail(lines)
+        seq = pending[-1]['seq'] if pending else buf.last_seq
+        idle = 0.0
+        while not await request.is_disconnected():
+            for line in pending:
+                yield f"id: {line['seq']}\ndata: {json.dumps(line)}\n\n"
+                seq = line['seq']
+                idle = 0.0
+            if idle >= 15:
+                # Comment line keeps proxies from closing a quiet stream
+                yield ": keep-alive\n\n"
+                idle = 0.0
+            await asyncio.sleep(0.5)
+            idle += 0.5
+            pending = buf.since(seq)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
 
 
 @router.post("/create-from-template", response_model=Dict)
@@ -130,7 +393,11 @@ def create_from_template(
     current_user = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
-    """Create a new demo from a template"""
+    """Create a new demo from a template
+    
+    Returns once the files are copied and the demo recorded; npm install
+    runs as a background job whose id is returned.
+    """
     # Get the template demo
     template_demo = db.query(Demonstration).filter(Demonstration.id == data.template_id).first()
     if not template_demo:
@@ -166,8 +433,8 @@ def create_from_template(
         )
     
     try:
-        # Copy the template directory
-        shutil.copytree(template_dir, new_dir, ignore=shutil.ignore_patterns('node_modules', '.next', '*.log'))
+        # Copy the template directory (reflinked or hardlinked where possible)
+        clone_engine.clone_tree(template_dir, new_dir, ignore=shutil.ignore_patterns('node_modules', '.next', '*.log'))
         
         # Update package.json to remove hardcoded ports
         package_json_path = os.path.join(new_dir, 'package.json')
@@ -184,13 +451,8 @@ def create_from_template(
             with open(package_json_path, 'w') as f:
                 json.dump(package_json, f, indent=2)
         
-        # Install dependencies
-        subprocess.run(
-            ['npm', 'install'],
-            cwd=new_dir,
-            capture_output=True,
-            timeout=120
-        )
+        # Remember the template, so the demo shares its compiler cache snapshots
+        save_demo_config(data.folder_name, template=template_demo.folder_name)
         
         # Create the demo record in the database
         new_demo = Demonstration(
@@ -203,12 +465,17 @@ def create_from_template(
         db.add(new_demo)
         db.commit()
         db.refresh(new_demo)
+        routing_table.set_demo(new_demo.id, new_demo.folder_name)
+        
+        # Install dependencies in the background; follow it at /jobs/{job_id}
+        job = job_engine.submit('npm_install', data.folder_name, npm_install, new_dir)
         
         return {
             'status': 'success',
             'demo_id': new_demo.id,
             'folder_name': data.folder_name,
-            'message': f'Demo created from template successfully'
+            'job_id': job['id'],
+            'message': f'Demo created from template; installing dependencies'
         }
         
     except Exception as e:
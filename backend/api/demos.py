@@ -7,6 +7,7 @@ from models.demonstration import Demonstration
 from models.user import User
 from schemas.demonstration import DemonstrationCreate, DemonstrationUpdate, DemonstrationResponse
 from api.auth import get_current_admin, get_current_user
+from core.routing import routing_table
 
 router = APIRouter(prefix="/demos", tags=["demos"])
 
@@ -77,6 +78,7 @@ def create_demo(
     db.add(db_demo)
     db.commit()
     db.refresh(db_demo)
+    routing_table.set_demo(db_demo.id, db_demo.folder_name)
     return db_demo
 
 
@@ -101,6 +103,7 @@ def update_demo(
     
     db.commit()
     db.refresh(db_demo)
+    routing_table.set_demo(db_demo.id, db_demo.folder_name)
     return db_demo
 
 
@@ -120,4 +123,5 @@ def delete_demo(
     
     db.delete(db_demo)
     db.commit()
+    routing_table.remove_demo(demo_id)
 
@@ -1,15 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import Response
+from starlette.requests import Request
 from sqlalchemy.orm import Session
 from typing import List, Dict, Optional
 from pydantic import BaseModel
 import os
 import shutil
 import json
-import subprocess
 
 from db.session import get_db
 from models.demonstration import Demonstration
 from api.auth import get_current_admin
+from core.routing import routing_table
+from core.jobs import job_engine, npm_install
+from core.clone import clone_engine
+from core.asset_cache import etag_matches
+from core.extension_catalog import extension_catalog
 
 router = APIRouter(prefix="/extensions", tags=["extensions"])
 
@@ -26,104 +32,30 @@ class CreateFromExtensionRequest(BaseModel):
 
 
 
+def _catalog_response(request: Request, body: bytes, etag: str) -> Response:
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type='application/json', headers=headers)
+
+
 @router.get("/list", response_model=List[ExtensionInfo])
-def list_extensions():
+def list_extensions(request: Request):
     """List all available template extensions"""
-    extensions_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'extensions')
-    
-    if not os.path.exists(extensions_dir):
-        return []
-    
-    extensions = []
-    for item in os.listdir(extensions_dir):
-        item_path = os.path.join(extensions_dir, item)
-        if os.path.isdir(item_path):
-            # Check for template.json or use default info
-            template_json = os.path.join(item_path, 'template.json')
-            if os.path.exists(template_json):
-                try:
-                    with open(template_json, 'r') as f:
-                        template_data = json.load(f)
-                        extensions.append(ExtensionInfo(
-                            name=template_data.get('name', item),
-                            description=template_data.get('description', ''),
-                            path=item,
-                            icon=template_data.get('icon')
-                        ))
-                except:
-                    extensions.append(ExtensionInfo(
-                        name=item,
-                        description='Template extension',
-                        path=item
-                    ))
-            else:
-                extensions.append(ExtensionInfo(
-                    name=item,
-                    description='Template extension',
-                    path=item
-                ))
-    
-    return extensions
+    body, etag = extension_catalog.listing()
+    return _catalog_response(request, body, etag)
 
 
 @router.get("/{extension_name}/info", response_model=Dict)
-def get_extension_info(extension_name: str):
-    """Get information about a specific extension"""
-    extensions_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'extensions')
-    extension_path = os.path.join(extensions_dir, extension_name)
-    
-    if not os.path.exists(extension_path):
+def get_extension_info(extension_name: str, request: Request):
+    """Get information about a specific extension, with its content files and their sizes"""
+    cached = extension_catalog.info(extension_name)
+    if cached is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Extension not found"
         )
-    
-    template_json = os.path.join(extension_path, 'template.json')
-    info = {
-        'name': extension_name,
-        'path': extension_path,
-        'has_template_json': os.path.exists(template_json)
-    }
-    
-    if os.path.exists(template_json):
-        try:
-            with open(template_json, 'r') as f:
-                info['template_data'] = json.load(f)
-        except:
-            pass
-    
-    # List content files structure
-    public_dir = os.path.join(extension_path, 'public', 'content')
-    if os.path.exists(public_dir):
-        info['content_structure'] = get_directory_structure(public_dir)
-    
-    return info
-
-
-def get_directory_structure(root_dir: str, current_path: str = '') -> Dict:
-    """Recursively get directory structure"""
-    structure = {}
-    full_path = os.path.join(root_dir, current_path) if current_path else root_dir
-    
-    if not os.path.exists(full_path):
-        return structure
-    
-    for item in os.listdir(full_path):
-        item_path = os.path.join(full_path, item)
-        relative_path = os.path.join(current_path, item).replace('\\', '/')
-        
-        if os.path.isdir(item_path):
-            structure[relative_path] = {
-                'type': 'directory',
-                'children': get_directory_structure(root_dir, relative_path)
-            }
-        else:
-            structure[relative_path] = {
-                'type': 'file',
-                'size': os.path.getsize(item_path)
-            }
-    
-    return structure
+    return _catalog_response(request, *cached)
 
 
 @router.post("/create-from-extension")
@@ -133,7 +65,10 @@ def create_project_from_extension(
     current_user = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
-    """Create a new project from an extension template"""
+    """Create a new project from an extension template
+    
+    npm install runs as a background job whose id is returned.
+    """
     # Check if folder_name already exists
     existing = db.query(Demonstration).filter(Demonstration.folder_name == data.folder_name).first()
     if existing:
@@ -161,8 +96,8 @@ def create_project_from_extension(
         )
     
     try:
-        # Copy the extension directory
-        shutil.copytree(extension_path, project_path, ignore=shutil.ignore_patterns('node_modules', '.next', '*.log', '__pycache__', '.git'))
+        # Copy the extension directory (reflinked or hardlinked where possible)
+        clone_engine.clone_tree(extension_path, project_path, ignore=shutil.ignore_patterns('node_modules', '.next', '*.log', '__pycache__', '.git'))
         
         # Write marker file for extension provenance
         try:
@@ -191,17 +126,6 @@ def create_project_from_extension(
             with open(package_json_path, 'w') as f:
                 json.dump(package_json, f, indent=2)
         
-        # Install dependencies (non-blocking)
-        try:
-            subprocess.Popen(
-                ['npm', 'install'],
-                cwd=project_path,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-        except:
-            pass  # Don't fail if npm install fails
-        
         # Create the demo record in the database
         new_demo = Demonstration(
             title=data.title,
@@ -213,12 +137,17 @@ def create_project_from_extension(
         db.add(new_demo)
         db.commit()
         db.refresh(new_demo)
+        routing_table.set_demo(new_demo.id, new_demo.folder_name)
+        
+        # Install dependencies in the background; follow it at /jobs/{job_id}
+        job = job_engine.submit('npm_install', data.folder_name, npm_install, project_path)
         
         return {
             'status': 'success',
             'demo_id': new_demo.id,
             'folder_name': data.folder_name,
-            'message': f'Project created from extension successfully'
+            'job_id': job['id'],
+            'message': f'Project created from extension; installing dependencies'
         }
         
     except Exception as e:
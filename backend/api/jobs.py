@@ -0,0 +1,92 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from starlette.requests import Request
+from typing import Dict, List, Optional
+import asyncio
+import json
+
+from api.auth import get_current_admin
+from core.jobs import job_engine, ACTIVE_STATES
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def _get_job(job_id: str) -> Dict:
+    job = job_engine.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return job
+
+
+@router.get("", response_model=List[Dict])
+def list_jobs(
+    folder_name: Optional[str] = None,
+    limit: int = 50,
+    current_user = Depends(get_current_admin)
+):
+    """Most recent background jobs, optionally of one demo"""
+    return job_engine.list(limit, folder_name)
+
+
+@router.get("/{job_id}", response_model=Dict)
+def get_job(job_id: str, current_user = Depends(get_current_admin)):
+    """State, progress and result of a job"""
+    return _get_job(job_id)
+
+
+@router.get("/{job_id}/logs", response_model=Dict)
+def get_job_logs(job_id: str, offset: int = 0, current_user = Depends(get_current_admin)):
+    """Output of a job after byte offset (0 for all of it), and the offset to continue from"""
+    _get_job(job_id)
+    lines, offset = job_engine.read_log(job_id, offset)
+    return {'lines': lines, 'offset': offset}
+
+
+@router.post("/{job_id}/cancel", response_model=Dict)
+def cancel_job(job_id: str, current_user = Depends(get_current_admin)):
+    """Cancel a queued job, or stop a running one"""
+    _get_job(job_id)
+    return job_engine.cancel(job_id)
+
+
+@router.get("/{job_id}/stream")
+async def stream_job(job_id: str, request: Request, current_user = Depends(get_current_admin)):
+    """Follow a job as Server-Sent Events: "log" events with its output and
+    "status" events whenever its state or progress changes, until it ends"""
+    job = await asyncio.to_thread(_get_job, job_id)
+    last_event_id = request.headers.get('last-event-id', '')
+
+    async def events():
+        # A reconnecting client resumes after the last line it received
+        offset = int(last_event_id) if last_event_id.isdigit() else 0
+        current = job
+        reported = None
+        idle = 0.0
+        while not await request.is_disconnected():
+            lines, offset = await asyncio.to_thread(job_engine.read_log, job_id, offset)
+            for line in lines:
+                yield f"event: log\nid: {line['offset']}\ndata: {json.dumps(line)}\n\n"
+                idle = 0.0
+            progress = (current['state'], current['progress'], current['message'])
+            if progress != reported:
+                yield f"event: status\ndata: {json.dumps(current)}\n\n"
+                reported = progress
+                idle = 0.0
+            if current['state'] not in ACTIVE_STATES:
+                break
+            if idle >= 15:
+                # Comment line keeps proxies from closing a quiet stream
+                yield ": keep-alive\n\n"
+                idle = 0.0
+            await asyncio.sleep(0.5)
+            idle += 0.5
+            current = await asyncio.to_thread(job_engine.get, job_id) or current
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
@@ -1,115 +1,465 @@
 from fastapi import APIRouter, Response, HTTPException, status, Depends
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse, HTMLResponse
+from starlette.background import BackgroundTask
 from starlette.requests import Request as StarletteRequest
 from sqlalchemy.orm import Session
+from typing import AsyncIterator, Optional
 from db.session import get_db
 from models.demonstration import Demonstration
 from core.process_manager import process_manager
+from core.demo_config import load_demo_config
+from core.upstream import upstream_pool
+from core.routing import routing_table
+from core.html_rewriter import rewrite_html_stream
+from core.asset_cache import asset_cache, etag_matches, CachedAsset
+from core.singleflight import request_coalescer, UpstreamBody, CREDENTIAL_HEADERS
+from core.wake import demo_waker, auto_wake_enabled
+from core.static_site import (
+    exported_pages, file_etag, is_not_modified, last_modified, resolve_export_path, select_variant,
+)
+from core.config import settings
+import anyio
 import httpx
+import mimetypes
+import os
 
 router = APIRouter()
 
 
+# Headers that only make sense for a single hop and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    'host', 'connection', 'upgrade', 'proxy-connection', 'keep-alive',
+    'transfer-encoding', 'te', 'trailer',
+}
+
+# Content-hashed Next.js build output, safe to cache at the proxy
+STATIC_ASSET_PREFIX = '_next/static/'
+
+# Cache-Control of content-hashed files served from a static export
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# ASGI extensions that let the server send a file without copying it through Python
+ZERO_COPY_EXTENSIONS = {'http.response.zerocopysend', 'http.response.pathsend'}
+
+# Headers repeated on a 304 Not Modified
+NOT_MODIFIED_HEADERS = {'etag', 'cache-control', 'expires', 'vary', 'last-modified'}
+
+# Seconds a client should wait before retrying a demo that is still starting
+WAKE_RETRY_AFTER = 5
+
+WARMING_UP_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta http-equiv="refresh" content="{retry}">
+<title>Warming up</title>
+<style>
+body {{ font-family: system-ui, sans-serif; display: flex; align-items: center; justify-content: center; height: 100vh; margin: 0; color: #444; }}
+</style>
+</head>
+<body>
+<div>
+<h1>Warming up&hellip;</h1>
+<p>This demo is starting. The page reloads automatically in a few seconds.</p>
+</div>
+</body>
+</html>
+"""
+
+
+async def _close_after(chunks: AsyncIterator[bytes], response: httpx.Response) -> AsyncIterator[bytes]:
+    """Yield from an upstream body and always release its connection."""
+    try:
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        await response.aclose()
+
+
+def _encode_headers(headers) -> list[tuple[bytes, bytes]]:
+    return [(key.encode('latin-1'), value.encode('latin-1')) for key, value in headers]
+
+
+def cached_asset_response(asset: CachedAsset, request: StarletteRequest) -> Response:
+    """Serve a cached asset, or 304 if the client already has this ETag."""
+    if etag_matches(request.headers.get('if-none-match'), asset.etag):
+        asset_cache.not_modified += 1
+        response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+        response.raw_headers = _encode_headers(
+            (key, value) for key, value in asset.headers
+            if key.lower() in NOT_MODIFIED_HEADERS
+        )
+        return response
+    response = Response(content=asset.body)
+    response.raw_headers = _encode_headers(asset.headers + [('content-length', str(asset.size))])
+    return response
+
+
+def _is_cacheable_response(response: httpx.Response) -> bool:
+    if response.status_code != 200:
+        return False
+    cache_control = response.headers.get('cache-control', '').lower()
+    if 'no-store' in cache_control or 'private' in cache_control:
+        return False
+    vary = {v.strip().lower() for v in response.headers.get('vary', '').split(',') if v.strip()}
+    return vary <= {'accept-encoding'}
+
+
+async def _cache_while_streaming(
+    chunks: AsyncIterator[bytes],
+    scope: str,
+    key: str,
+    headers: list[tuple[str, str]],
+    encoding: str,
+) -> AsyncIterator[bytes]:
+    """Pass chunks through and cache the body once it completed in full."""
+    parts = []
+    size = 0
+    async for chunk in chunks:
+        if parts is not None:
+            size += len(chunk)
+            if size > asset_cache.max_entry_bytes:
+                parts = None
+            else:
+                parts.append(chunk)
+        yield chunk
+    if parts is not None:
+        await asset_cache.put(scope, key, headers, b"".join(parts), encoding)
+
+
 async def proxy_request(
     target_url: str,
     request: StarletteRequest,
     path_suffix: str = "",
     url_prefix: str | None = None,
+    client_overrides: dict | None = None,
+    cache_scope: str | None = None,
 ) -> Response:
     """
-    Proxy a request to a target URL
+    Proxy a request to a target URL using the pooled client for that upstream.
+
+    Request and response bodies are streamed, never buffered in full. HTML
+    responses that need their URLs rewritten are decoded and rewritten on the
+    fly; everything else is passed through as raw upstream bytes.
+
+    With a cache_scope, GETs under /_next/static/ are served from (and fill)
+    the proxy's asset cache for that demo. Identical concurrent GET/HEAD
+    requests without a body are coalesced into a single upstream fetch.
     """
-    try:
-        # Build the full target URL
-        if path_suffix:
-            # Remove leading slash if present
-            path_suffix = path_suffix.lstrip('/')
-            target_full_url = f"{target_url}/{path_suffix}"
-        else:
-            target_full_url = target_url
+    # Build the full target URL
+    if path_suffix:
+        # Remove leading slash if present
+        path_suffix = path_suffix.lstrip('/')
+        target_full_url = f"{target_url}/{path_suffix}"
+    else:
+        target_full_url = target_url
+    
+    # Keep the raw query string so repeated parameters survive
+    if request.url.query:
+        target_full_url = f"{target_full_url}?{request.url.query}"
+    
+    # Immutable build assets may be answered from the proxy cache
+    cache_key = None
+    if (
+        cache_scope and asset_cache.enabled
+        and request.method in ('GET', 'HEAD')
+        and path_suffix.startswith(STATIC_ASSET_PREFIX)
+    ):
+        cache_key = f"{path_suffix}?{request.url.query}"
+        asset = await asset_cache.get(cache_scope, cache_key, request.headers.get('accept-encoding', ''))
+        if asset:
+            return cached_asset_response(asset, request)
+    
+    # Prepare headers (exclude some that shouldn't be forwarded)
+    excluded = HOP_BY_HOP_HEADERS
+    if cache_key:
+        # Always fetch the full body so it can be cached; 304s are ours to send
+        excluded = excluded | {'if-none-match', 'if-modified-since'}
+    headers = [
+        (key, value) for key, value in request.headers.items()
+        if key.lower() not in excluded
+    ]
+    
+    # Stream the request body upstream only when the client sent one
+    has_body = 'content-length' in request.headers or 'transfer-encoding' in request.headers
+    content = request.stream() if has_body else None
+    
+    async def open_upstream() -> UpstreamBody:
+        try:
+            # Make the proxied request over the upstream's keep-alive pool
+            client = await upstream_pool.get_client(target_url, client_overrides)
+            upstream_request = client.build_request(
+                method=request.method,
+                url=target_full_url,
+                headers=headers,
+                content=content,
+            )
+            response = await client.send(upstream_request, stream=True)
+        except httpx.TimeoutException:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Gateway timeout"
+            )
+        except httpx.ConnectError:
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="Cannot connect to demo service"
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Proxy error: {str(e)}"
+            )
         
-        # Get query parameters from original request
-        query_params = dict(request.query_params)
+        if 'vary' in response.headers:
+            request_coalescer.note_vary(target_url, response.headers['vary'])
         
-        # Prepare headers (exclude some that shouldn't be forwarded)
-        headers = {}
-        exclude_headers = {
-            'host', 'content-length', 'connection', 
-            'upgrade', 'proxy-connection', 'keep-alive'
-        }
+        # Possibly rewrite HTML so asset URLs work behind the proxy
+        content_type = response.headers.get('content-type', '')
+        rewrite = bool(url_prefix) and content_type.startswith('text/html')
         
-        for key, value in request.headers.items():
-            if key.lower() not in exclude_headers:
-                headers[key] = value
+        if rewrite:
+            # Body is decoded and its length changes
+            exclude_response_headers = HOP_BY_HOP_HEADERS | {'content-encoding', 'content-length'}
+            body = rewrite_html_stream(response.aiter_bytes(), url_prefix)
+        else:
+            # Raw pass-through keeps the upstream encoding and length
+            exclude_response_headers = HOP_BY_HOP_HEADERS
+            body = response.aiter_raw()
         
-        # Read request body if present
-        body = await request.body()
+        response_headers = [
+            (key, value) for key, value in response.headers.multi_items()
+            if key.lower() not in exclude_response_headers
+        ]
         
-        # Make the proxied request
-        async with httpx.AsyncClient(timeout=30.0, follow_redirects=True, trust_env=False) as client:
-            # Determine the method
-            method = request.method
-            
-            response = await client.request(
-                method=method,
-                url=target_full_url,
-                params=query_params,
-                headers=headers,
-                content=body,
-            )
-            
-            # Get response headers (exclude some)
-            response_headers = {}
-            exclude_response_headers = {
-                'content-encoding', 'content-length', 'transfer-encoding',
-                'connection', 'keep-alive'
-            }
-            
-            for key, value in response.headers.items():
-                if key.lower() not in exclude_response_headers:
-                    response_headers[key] = value
-            
-            # Possibly rewrite HTML so asset URLs work behind the proxy
-            content_type = response.headers.get('content-type', '')
-            if url_prefix and content_type.startswith('text/html'):
-                try:
-                    text = response.text
-                    # Rewrite common URL attributes that start at root
-                    # href="/...", src="/...", action="/..."
-                    import re as _re
-                    def _repl(m):
-                        return f"{m.group(1)}{url_prefix}/"
-                    pattern = _re.compile(r"((?:href|src|action)=[\"\'])(/(?!/|https?:))")
-                    text = _re.sub(pattern, _repl, text)
-                    body_bytes = text.encode('utf-8')
-                except Exception:
-                    body_bytes = response.content
-            else:
-                body_bytes = response.content
-
-            # Return a regular Response with full body
-            return Response(
-                content=body_bytes,
-                status_code=response.status_code,
-                headers=response_headers,
-                media_type=response.headers.get('content-type')
+        if cache_key and request.method == 'GET' and not rewrite and _is_cacheable_response(response):
+            cached_headers = [
+                (key, value) for key, value in response_headers
+                if key.lower() not in ('content-length', 'set-cookie')
+            ]
+            encoding = response.headers.get('content-encoding', 'identity')
+            body = _cache_while_streaming(body, cache_scope, cache_key, cached_headers, encoding)
+        
+        return UpstreamBody(response.status_code, response_headers, _close_after(body, response))
+    
+    if settings.PROXY_COALESCE and request.method in ('GET', 'HEAD') and not has_body:
+        vary = request_coalescer.vary_for(target_url)
+        if '*' not in vary:
+            # Identical concurrent requests share one upstream fetch
+            key_headers = sorted(set(settings.proxy_coalesce_vary_headers) | CREDENTIAL_HEADERS | vary)
+            key = (
+                target_full_url, url_prefix, request.method,
+                tuple(tuple(request.headers.getlist(name)) for name in key_headers),
             )
-            
-    except httpx.TimeoutException:
+            upstream = await request_coalescer.fetch(key, open_upstream)
+            return _streaming_response(upstream.status_code, upstream.headers, upstream.chunks, cache_key, request)
+    
+    upstream = await open_upstream()
+    return _streaming_response(upstream.status_code, upstream.headers, upstream.chunks, cache_key, request)
+
+
+def _streaming_response(
+    status_code: int,
+    headers: list[tuple[str, str]],
+    chunks: AsyncIterator[bytes],
+    cache_key: str | None,
+    request: StarletteRequest,
+) -> Response:
+    if (
+        cache_key and status_code == 200
+        and etag_matches(request.headers.get('if-none-match'), _header(headers, 'etag'))
+    ):
+        # Client is current; the body is still read to completion for the cache
+        asset_cache.not_modified += 1
+        response = Response(status_code=status.HTTP_304_NOT_MODIFIED, background=BackgroundTask(_drain, chunks))
+        response.raw_headers = _encode_headers(
+            (key, value) for key, value in headers
+            if key.lower() in NOT_MODIFIED_HEADERS
+        )
+        return response
+    proxied = StreamingResponse(chunks, status_code=status_code)
+    proxied.raw_headers = _encode_headers(headers)
+    return proxied
+
+
+async def _drain(chunks: AsyncIterator[bytes]):
+    async for _ in chunks:
+        pass
+
+
+def _header(headers: list[tuple[str, str]], name: str) -> str:
+    return next((value for key, value in headers if key.lower() == name), '')
+
+
+async def resolve_demo_folder(demo_id: int, db: Session) -> str:
+    """Map a demo id to its folder, querying the database (in a thread) only
+    on a miss or once the cached mapping has expired"""
+    folder_name = routing_table.folder_for(demo_id)
+    if folder_name is not None:
+        return folder_name
+    
+    demo = await anyio.to_thread.run_sync(
+        lambda: db.query(Demonstration).filter(Demonstration.id == demo_id).first()
+    )
+    if not demo:
+        routing_table.remove_demo(demo_id)
         raise HTTPException(
-            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-            detail="Gateway timeout"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Demonstration not found"
         )
-    except httpx.ConnectError:
+    routing_table.set_demo(demo.id, demo.folder_name)
+    return demo.folder_name
+
+
+async def resolve_demo_port(folder_name: str) -> Optional[int]:
+    """Upstream port of a running demo from the routing table (None for a static export)"""
+    if not routing_table.has_route(folder_name):
+        # Slow path: the process manager re-checks and re-adds the route
+        await anyio.to_thread.run_sync(process_manager.get_demo_status, folder_name)
+    port = routing_table.port_for(folder_name)
+    if not port and not routing_table.has_route(folder_name):
         raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="Cannot connect to demo service"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Demo service is not running"
+        )
+    return port
+
+
+class ZeroCopyFileResponse(FileResponse):
+    """FileResponse that hands the file to the server to send itself.
+
+    Servers offering the ASGI zero-copy send extension get the open file
+    (sendfile(2), no copy through Python), those offering path send get its
+    path; otherwise the file is read and sent in chunks as usual.
+    """
+
+    chunk_size = 256 * 1024
+
+    async def __call__(self, scope, receive, send):
+        extensions = scope.get('extensions') or {}
+        if self.send_header_only or not (ZERO_COPY_EXTENSIONS & extensions.keys()):
+            await super().__call__(scope, receive, send)
+            return
+        await send({'type': 'http.response.start', 'status': self.status_code, 'headers': self.raw_headers})
+        if 'http.response.pathsend' in extensions:
+            await send({'type': 'http.response.pathsend', 'path': os.fspath(self.path)})
+            return
+        with open(self.path, 'rb') as f:
+            await send({'type': 'http.response.zerocopysend', 'file': f, 'more_body': False})
+
+
+def _export_headers(path: str, st: os.stat_result, etag: str, encoding: str) -> dict:
+    headers = {
+        'etag': etag,
+        'last-modified': last_modified(st),
+        'vary': 'Accept-Encoding',
+        # Content-hashed build output never changes; everything else is revalidated
+        'cache-control': IMMUTABLE_CACHE_CONTROL if STATIC_ASSET_PREFIX in path else 'no-cache',
+    }
+    if encoding != 'identity':
+        headers['content-encoding'] = encoding
+    return headers
+
+
+async def static_export_response(root: str, path: str, request: StarletteRequest, url_prefix: str) -> Response:
+    """Serve a request from a demo's static export instead of an upstream.
+
+    Files go out as-is (or as their precompressed .br/.gz sibling), HTML
+    with its URLs rewritten for the proxy prefix; both carry an ETag and
+    Last-Modified and answer conditional requests with 304.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        raise HTTPException(status_code=status.HTTP_405_METHOD_NOT_ALLOWED, detail="Static demo")
+    file_path, status_code = resolve_export_path(root, path)
+    if file_path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    media_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+    accept_encoding = request.headers.get('accept-encoding', '')
+    
+    if media_type == 'text/html':
+        # Same URL rewriting as proxied HTML, so root-relative links stay under the proxy
+        st = os.stat(file_path)
+        body, encoding = await anyio.to_thread.run_sync(
+            exported_pages.page, file_path, st, url_prefix, accept_encoding
         )
-    except Exception as e:
+        send_path, etag = None, file_etag(st, 'html' if encoding == 'identity' else f'html-{encoding}')
+    else:
+        send_path, st, encoding = select_variant(file_path, accept_encoding)
+        etag = file_etag(st)
+    headers = _export_headers(path, st, etag, encoding)
+    
+    if status_code == status.HTTP_200_OK and is_not_modified(
+        request.headers.get('if-none-match'), request.headers.get('if-modified-since'), etag, st
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if send_path is None:
+        return Response(content=body, status_code=status_code, media_type='text/html', headers=headers)
+    return ZeroCopyFileResponse(
+        send_path, status_code=status_code, media_type=media_type, headers=headers,
+        stat_result=st, method=request.method,
+    )
+
+
+def warming_up_response(request: StarletteRequest, woken: dict) -> Response:
+    """Answer a request whose demo could not be woken in time"""
+    if woken['status'] == 'error':
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Proxy error: {str(e)}"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Demo failed to start: {woken.get('message', 'unknown error')}"
+        )
+    retry_headers = {'Retry-After': str(WAKE_RETRY_AFTER), 'Cache-Control': 'no-store'}
+    if request.method == 'GET' and 'text/html' in request.headers.get('accept', ''):
+        return HTMLResponse(
+            WARMING_UP_PAGE.format(retry=WAKE_RETRY_AFTER),
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers=retry_headers,
+        )
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Demo service is starting" if woken['status'] == 'timeout' else "Too many requests waiting for demo to start",
+        headers=retry_headers,
+    )
+
+
+async def proxy_to_demo(demo_id: int, path: str, request: StarletteRequest, db: Session) -> Response:
+    """Resolve a demo's upstream and proxy the request to it"""
+    folder_name = await resolve_demo_folder(demo_id, db)
+    if demo_waker.is_waking(folder_name) or process_manager.is_starting(folder_name) or (
+        not routing_table.has_route(folder_name) and auto_wake_enabled(folder_name)
+    ):
+        # Hold the request until the demo is ready instead of failing with a 502;
+        # don't keep a database connection meanwhile
+        db.close()
+        woken = await demo_waker.wake(folder_name)
+        if woken['status'] != 'ready':
+            return warming_up_response(request, woken)
+        port = woken['port']
+    else:
+        port = await resolve_demo_port(folder_name)
+    process_manager.touch(folder_name)
+    
+    static_root = routing_table.static_root_for(folder_name)
+    if static_root:
+        return await static_export_response(static_root, path, request, f"/proxy/{demo_id}")
+    
+    # Build the internal URL (localhost since we're in the same network)
+    internal_url = f"http://127.0.0.1:{port}"
+    
+    try:
+        return await proxy_request(
+            internal_url, request, path,
+            url_prefix=f"/proxy/{demo_id}",
+            client_overrides=load_demo_config(folder_name).get('proxy'),
+            cache_scope=folder_name,
         )
+    except HTTPException as e:
+        if e.status_code == status.HTTP_502_BAD_GATEWAY:
+            # Nothing listens on the port: stop routing there until the
+            # process manager has re-checked the demo (which re-adds a
+            # route still valid, and drops a dead demo's record)
+            routing_table.remove_port(folder_name)
+            await anyio.to_thread.run_sync(process_manager.get_demo_status, folder_name)
+        raise
 
 
 @router.api_route(
@@ -125,29 +475,7 @@ async def proxy_demo_request(
     """
     Proxy requests to a demo application
     """
-    # Get the demo from database
-    demo = db.query(Demonstration).filter(Demonstration.id == demo_id).first()
-    if not demo:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Demonstration not found"
-        )
-    
-    # Check if demo is running
-    status_info = process_manager.get_demo_status(demo.folder_name)
-    
-    if status_info['status'] != 'running' or not status_info.get('port'):
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Demo service is not running"
-        )
-    
-    # Build the internal URL (localhost since we're in the same network)
-    port = status_info['port']
-    internal_url = f"http://127.0.0.1:{port}"
-    
-    # Proxy the request
-    return await proxy_request(internal_url, request, path, url_prefix=f"/proxy/{demo_id}")
+    return await proxy_to_demo(demo_id, path, request, db)
 
 
 @router.api_route(
@@ -162,27 +490,4 @@ async def proxy_demo_root(
     """
     Proxy requests to demo root (no additional path)
     """
-    # Get the demo from database
-    demo = db.query(Demonstration).filter(Demonstration.id == demo_id).first()
-    if not demo:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Demonstration not found"
-        )
-    
-    # Check if demo is running
-    status_info = process_manager.get_demo_status(demo.folder_name)
-    
-    if status_info['status'] != 'running' or not status_info.get('port'):
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Demo service is not running"
-        )
-    
-    # Build the internal URL
-    port = status_info['port']
-    internal_url = f"http://127.0.0.1:{port}"
-    
-    # Proxy the request (no path suffix)
-    return await proxy_request(internal_url, request, "", url_prefix=f"/proxy/{demo_id}")
-
+    return await proxy_to_demo(demo_id, "", request, db)
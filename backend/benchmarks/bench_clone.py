@@ -0,0 +1,95 @@
+"""Project creation: shutil.copytree against the clone engine.
+
+Clones every template under projects/ and every extension, plus two
+synthetic ones, since the real templates are small: ASSET_COUNT binary
+assets of ASSET_BYTES in public/, and SOURCE_COUNT source files. Each is
+cloned [clones] times with both, the way create-from-template and
+create-from-extension do. Reports the median
+time per clone and the disk each clone adds (blocks of inodes not shared
+with the source; reflinked blocks cannot be told apart from copied ones
+by stat, so reflinks show up as full size). Run from the backend
+directory:
+
+    python -m benchmarks.bench_clone [clones]
+"""
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from core.clone import CloneEngine
+from core.config import settings
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SOURCES = [BACKEND_DIR.parent / 'projects', BACKEND_DIR / 'extensions']
+IGNORE = shutil.ignore_patterns('node_modules', '.next', '*.log', '__pycache__', '.git')
+ASSET_COUNT = 40
+ASSET_BYTES = 2 * 1024 * 1024
+SOURCE_COUNT = 2000
+SOURCE_BYTES = 4096
+
+
+def added_bytes(tree: Path, source: Path) -> int:
+    """Disk blocks of files in tree that are not hardlinks into source"""
+    shared = {os.stat(os.path.join(root, name)).st_ino for root, _, names in os.walk(source) for name in names}
+    total = 0
+    for root, _, names in os.walk(tree):
+        for name in names:
+            st = os.stat(os.path.join(root, name))
+            if st.st_ino not in shared:
+                total += st.st_blocks * 512
+    return total
+
+
+def main():
+    clones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    engine = CloneEngine(workers=settings.CLONE_WORKERS)
+    # Next to projects/, so both are on the same filesystem as in production
+    work = Path(tempfile.mkdtemp(prefix='bench-clone-', dir=BACKEND_DIR.parent))
+    try:
+        assets = work / 'synthetic-assets'
+        (assets / 'public' / 'images').mkdir(parents=True)
+        (assets / 'package.json').write_text('{"name": "synthetic-assets"}')
+        for i in range(ASSET_COUNT):
+            (assets / 'public' / 'images' / f'image{i}.png').write_bytes(os.urandom(ASSET_BYTES))
+
+        sources = work / 'synthetic-sources'
+        for i in range(SOURCE_COUNT):
+            (sources / 'app' / f'section{i % 50}').mkdir(parents=True, exist_ok=True)
+            (sources / 'app' / f'section{i % 50}' / f'page{i}.tsx').write_bytes(os.urandom(SOURCE_BYTES))
+        (sources / 'package.json').write_text('{"name": "synthetic-sources"}')
+
+        templates = [assets, sources] + [
+            template
+            for source in SOURCES if source.is_dir()
+            for template in sorted(source.iterdir()) if (template / 'package.json').is_file()
+        ]
+        print(f"{'template':<32} {'copytree ms':>12} {'clone ms':>10} {'copytree MiB':>13} {'clone MiB':>10}  clone")
+        for template in templates:
+            results = {}
+            for name, clone in (
+                ('copytree', lambda dst: shutil.copytree(template, dst, ignore=IGNORE)),
+                ('clone', lambda dst: engine.clone_tree(str(template), str(dst), ignore=IGNORE)),
+            ):
+                times = []
+                for i in range(clones):
+                    dst = work / f'{name}-{i}'
+                    started = time.perf_counter()
+                    counts = clone(dst)
+                    times.append(time.perf_counter() - started)
+                    size = added_bytes(dst, template)
+                    shutil.rmtree(dst)
+                results[name] = (statistics.median(times), size, counts)
+            (copy_time, copy_size, _), (clone_time, clone_size, counts) = results['copytree'], results['clone']
+            methods = ', '.join(f"{counts[k]} {k}" for k in ('reflinked', 'hardlinked', 'copied') if counts[k])
+            print(f"{template.name:<32} {copy_time * 1000:>12.1f} {clone_time * 1000:>10.1f} "
+                  f"{copy_size / 1048576:>13.2f} {clone_size / 1048576:>10.2f}  {methods}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Cold start and RSS of a demo dev server: `npm run dev` vs. the next binary directly.
+
+Starts the demo several times in each mode (alternating, so both see the
+same .next cache) through the process manager, and reports the time until
+it is ready - port open and first page answered - and the RSS and process
+count of its whole process tree at that point. The demo's dependencies must
+be installed (node_modules/.bin/next), or the direct mode falls back to npm.
+Run from the backend directory:
+
+    python -m benchmarks.bench_demo_launch [folder_name] [rounds]
+"""
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+from core.config import settings
+from core.demo_config import PROJECTS_DIR
+from core.launcher import DIRECT, NPM
+from core.procfs import process_tree, tree_rss_bytes
+from core.process_manager import process_manager
+from core.registry import DemoRegistry
+
+MODES = (NPM, DIRECT)
+
+
+def launch(folder_name: str, mode: str):
+    """Start, measure and stop the demo once; None if it did not run in that mode."""
+    settings.DEMO_DIRECT_EXEC = mode == DIRECT
+    result = process_manager.start_demo(folder_name, PROJECTS_DIR)
+    if result.get('status') != 'started':
+        raise SystemExit(f"Could not start {folder_name}: {result}")
+    try:
+        if result['launcher'] != mode:
+            return None
+        status = process_manager.wait_until_ready(folder_name, settings.DEMO_STARTUP_TIMEOUT)
+        if status['status'] != 'running':
+            raise SystemExit(f"{folder_name} did not become ready: {status}")
+        pid = result['pid']
+        return status['startup_seconds'], tree_rss_bytes(pid), len(process_tree(pid))
+    finally:
+        process_manager.stop_demo(folder_name)
+
+
+def main():
+    folder_name = sys.argv[1] if len(sys.argv) > 1 else 'template'
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    # Keep the real demo registry untouched
+    process_manager.registry = DemoRegistry(f"sqlite:///{Path(tempfile.mkdtemp()) / 'demo_registry.db'}")
+    process_manager.processes = {}
+
+    samples = {mode: [] for mode in MODES}
+    for _ in range(rounds):
+        for mode in MODES:
+            sample = launch(folder_name, mode)
+            if sample is None:
+                raise SystemExit(f"{folder_name} cannot run in {mode} mode (is node_modules installed?)")
+            samples[mode].append(sample)
+
+    print(f"{folder_name}, {rounds} cold starts per mode (medians)")
+    for mode in MODES:
+        startup, rss, processes = (statistics.median(column) for column in zip(*samples[mode]))
+        print(f"{mode:<7}: ready in {startup:6.2f}s, {rss / 1048576:7.1f} MiB RSS, {processes:.0f} processes")
+
+
+if __name__ == "__main__":
+    main()
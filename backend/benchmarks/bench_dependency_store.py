@@ -0,0 +1,93 @@
+"""Disk use and creation time of node_modules with the dependency store.
+
+Copies the package.json and package-lock.json of every project under
+projects/ (and extensions/) into a temporary projects directory, then
+"installs" each in turn: the first project of a lockfile gets a
+node_modules tree and fills the store, later ones are linked from it.
+Reports per project how long its node_modules took and the disk used
+with and without the store. Run from the backend directory:
+
+    python -m benchmarks.bench_dependency_store [node_modules to copy]
+
+Without an argument the trees are synthesized from the lockfiles - one
+directory per locked package with a package.json and FILES_PER_PACKAGE
+source files - since installing needs the network; pass a real, installed
+node_modules to measure it instead (it is used for every lockfile).
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from core.dependency_store import DependencyStore, LOCKFILE, _tree_bytes
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SOURCES = [BACKEND_DIR.parent / 'projects', BACKEND_DIR / 'extensions']
+FILES_PER_PACKAGE = 8
+FILE_BYTES = 6000
+
+
+def synthesize(project: Path):
+    """A node_modules with the shape of the project's lockfile"""
+    lock = json.loads((project / LOCKFILE).read_text())
+    for path in lock.get('packages', {}):
+        if not path:
+            continue
+        package = project / path
+        package.mkdir(parents=True, exist_ok=True)
+        (package / 'package.json').write_text(json.dumps({'name': path.rsplit('node_modules/', 1)[-1]}))
+        for i in range(FILES_PER_PACKAGE):
+            (package / f'file{i}.js').write_bytes(os.urandom(FILE_BYTES // 2).hex().encode())
+
+
+def main():
+    source_tree = Path(sys.argv[1]) if len(sys.argv) > 1 else None
+    work = Path(tempfile.mkdtemp(prefix='bench-store-', dir=BACKEND_DIR.parent))
+    projects_dir = work / 'projects'
+    store = DependencyStore(str(work / 'store'))
+    try:
+        projects = []
+        for source in SOURCES:
+            for project in sorted(source.iterdir()) if source.is_dir() else []:
+                if (project / LOCKFILE).is_file() and (project / 'package.json').is_file():
+                    target = projects_dir / f'{source.name}-{project.name}'
+                    target.mkdir(parents=True)
+                    for name in ('package.json', LOCKFILE):
+                        shutil.copy2(project / name, target / name)
+                    projects.append(target)
+
+        print(f"{'project':<40} {'key':<12} {'source':<7} {'seconds':>8} {'MiB':>8}")
+        unshared = 0
+        for project in projects:
+            key = store.key_for(str(project))
+            started = time.monotonic()
+            if store.has(key):
+                store.materialize(str(project), key)
+                source = 'store'
+            else:
+                if source_tree is not None:
+                    shutil.copytree(source_tree, project / 'node_modules', symlinks=True)
+                else:
+                    synthesize(project)
+                store.ingest(str(project), key)
+                source = 'install'
+            seconds = time.monotonic() - started
+            size = _tree_bytes(project / 'node_modules')
+            unshared += size
+            print(f"{project.name:<40} {key[:12]:<12} {source:<7} {seconds:>8.2f} {size / 1048576:>8.1f}")
+
+        shared = _tree_bytes(work)  # store and projects; shared inodes counted once
+        stats = store.stats(str(projects_dir))
+        print(f"{len(projects)} projects, {len(stats['entries'])} lockfiles")
+        print(f"disk without the store: {unshared / 1048576:.1f} MiB")
+        print(f"disk with the store:    {shared / 1048576:.1f} MiB")
+        print(f"gc with every project present: {store.gc(projects_dir=str(projects_dir))['removed']}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
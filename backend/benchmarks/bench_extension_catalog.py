@@ -0,0 +1,53 @@
+"""Extension list and info lookups: reading the files per request against the catalog.
+
+Times, per call, what list_extensions and get_extension_info did before
+the catalog - read every template.json, walk public/content - and the
+catalog's lookups once built. Run from the backend directory:
+
+    python -m benchmarks.bench_extension_catalog [calls]
+"""
+import json
+import os
+import sys
+import timeit
+
+from core.extension_catalog import EXTENSIONS_DIR, TEMPLATE_JSON, ExtensionCatalog, directory_structure
+
+
+def read_listing():
+    listing = []
+    for item in os.listdir(EXTENSIONS_DIR):
+        template_json = os.path.join(EXTENSIONS_DIR, item, TEMPLATE_JSON)
+        if os.path.exists(template_json):
+            with open(template_json, 'r') as f:
+                listing.append(json.load(f))
+    return listing
+
+
+def read_info(folder: str):
+    return directory_structure(os.path.join(EXTENSIONS_DIR, folder, 'public', 'content'))
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    catalog = ExtensionCatalog(EXTENSIONS_DIR, check_interval=3600)
+    catalog.refresh(force=True)
+    folders = sorted(entry.name for entry in os.scandir(EXTENSIONS_DIR) if entry.is_dir())
+    if not folders:
+        raise SystemExit(f"No extensions in {EXTENSIONS_DIR}")
+    folder = folders[0]
+
+    def per_call(fn) -> float:
+        return timeit.timeit(fn, number=calls) / calls * 1e6
+
+    print(f"{len(folders)} extensions, info of {folder}, {calls} calls")
+    print(f"list from files:   {per_call(read_listing):8.1f} us")
+    print(f"list from catalog: {per_call(catalog.listing):8.2f} us")
+    print(f"info from files:   {per_call(lambda: read_info(folder)):8.1f} us")
+    print(f"info from catalog: {per_call(lambda: catalog.info(folder)):8.2f} us")
+    # What a request pays when the check interval has passed and nothing changed
+    print(f"change check:      {per_call(lambda: catalog.refresh(force=True)):8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
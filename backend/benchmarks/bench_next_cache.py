@@ -0,0 +1,73 @@
+"""First page compile latency of new demos, cold and seeded from a snapshot.
+
+Creates demos from a template in a temporary projects directory, the way
+create-from-template does, and starts each as a dev server: the first
+compiles from scratch and, once stopped, publishes its compiler cache; the
+rest are seeded from that snapshot. Reports each start's readiness time
+and how long its first page request (which waits for the compile) took.
+Needs the template's dependencies in the dependency store - install any
+demo of that lockfile once. Run from the backend directory:
+
+    python -m benchmarks.bench_next_cache [template] [seeded demos]
+"""
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import core.demo_config as demo_config
+from core.clone import clone_engine
+from core.dependency_store import dependency_store
+from core.next_cache import NextCacheSnapshots
+from core.process_manager import process_manager
+import core.process_manager as process_manager_module
+from core.registry import DemoRegistry
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+IGNORE = shutil.ignore_patterns('node_modules', '.next', '*.log')
+
+
+def main():
+    template = sys.argv[1] if len(sys.argv) > 1 else 'template'
+    seeded = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    template_dir = BACKEND_DIR.parent / 'projects' / template
+    key = dependency_store.key_for(str(template_dir))
+    if not key or not dependency_store.has(key):
+        raise SystemExit(f"Install a demo with the lockfile of {template} first, so its dependencies are in the store")
+
+    work = Path(tempfile.mkdtemp(prefix='bench-next-cache-', dir=BACKEND_DIR.parent))
+    projects_dir = work / 'projects'
+    projects_dir.mkdir()
+    # Keep the real projects, registry and snapshots untouched
+    demo_config.PROJECTS_DIR = str(projects_dir)
+    process_manager.registry = DemoRegistry(f"sqlite:///{work / 'demo_registry.db'}")
+    process_manager.processes = {}
+    process_manager_module.next_cache = NextCacheSnapshots(str(work / 'next_cache'), refresh=0)
+    try:
+        print(f"{'demo':<16} {'cache':<7} {'ready s':>8} {'first page s':>13}")
+        for i in range(1 + seeded):
+            folder_name = f'bench-{i}'
+            clone_engine.clone_tree(str(template_dir), str(projects_dir / folder_name), ignore=IGNORE)
+            demo_config.save_demo_config(folder_name, template=template, profile='dev')
+            dependency_store.materialize(str(projects_dir / folder_name), key)
+
+            result = process_manager.start_demo(folder_name, str(projects_dir))
+            if result['status'] != 'started':
+                raise SystemExit(f"Could not start {folder_name}: {result}")
+            status = process_manager.wait_until_ready(folder_name, 300)
+            cache = process_manager_module.next_cache.events[-1]['cache'] if process_manager_module.next_cache.events else '?'
+            print(f"{folder_name:<16} {cache:<7} {status.get('startup_seconds') or 0:>8.1f} "
+                  f"{status.get('first_page_seconds') or 0:>13.1f}")
+            process_manager.stop_demo(folder_name)
+            # The first demo's cache is published in the background
+            deadline = time.monotonic() + 120
+            while process_manager_module.next_cache._publishing and time.monotonic() < deadline:
+                time.sleep(0.2)
+    finally:
+        process_manager.cleanup_all()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
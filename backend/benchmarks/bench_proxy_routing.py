@@ -0,0 +1,142 @@
+"""Requests/sec through the demo proxy: per-request DB + PID lookup vs. routing table.
+
+Starts a local stub upstream, serves the proxy router in-process with an
+in-memory SQLite database, and drives both resolution paths with the same
+concurrency. Run from the backend directory:
+
+    python -m benchmarks.bench_proxy_routing
+"""
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import uvicorn
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from api import proxy
+from core.process_manager import process_manager
+from core.registry import DemoRegistry, HOST, worker_id
+from db.session import Base, get_db
+from models import Demonstration
+
+FOLDER = "bench-demo"
+REQUESTS = 3000
+CONCURRENCY = 32
+
+
+@compiles(UUID, "sqlite")
+def _uuid_on_sqlite(element, compiler, **kw):
+    return "CHAR(32)"
+
+
+async def _upstream_asset(request):
+    return Response(b"console.log('ok');" * 64, media_type="application/javascript")
+
+
+def start_stub_upstream() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    app = Starlette(routes=[Route("/{path:path}", _upstream_asset)])
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return port
+
+
+def build_app(session_factory) -> FastAPI:
+    app = FastAPI()
+
+    def override_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/legacy/{demo_id}/{path:path}")
+    async def legacy_proxy(demo_id: int, path: str, request: Request, db: Session = Depends(get_db)):
+        # The resolution proxy_demo_request used to do on every request
+        demo = db.query(Demonstration).filter(Demonstration.id == demo_id).first()
+        if not demo:
+            raise HTTPException(status_code=404)
+        status_info = process_manager.get_demo_status(demo.folder_name)
+        if status_info['status'] != 'running' or not status_info.get('port'):
+            raise HTTPException(status_code=503)
+        return await proxy.proxy_request(
+            f"http://127.0.0.1:{status_info['port']}", request, path, url_prefix=f"/proxy/{demo_id}",
+        )
+
+    app.include_router(proxy.router)
+    app.dependency_overrides[get_db] = override_db
+    return app
+
+
+async def drive(app: FastAPI, url: str) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        remaining = iter(range(REQUESTS))
+
+        async def worker():
+            for _ in remaining:
+                response = await client.get(url)
+                assert response.status_code == 200, response.status_code
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+        return REQUESTS / (time.perf_counter() - start)
+
+
+def main():
+    # Keep the real demo registry untouched
+    process_manager.registry = DemoRegistry(f"sqlite:///{Path(tempfile.mkdtemp()) / 'demo_registry.db'}")
+    process_manager.processes = {}
+
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        db.add(Demonstration(id=1, title="Bench", folder_name=FOLDER))
+        db.commit()
+
+    port = start_stub_upstream()
+    # Pretend this process is the demo server so the PID probe succeeds
+    process_manager.registry.claim({
+        'folder_name': FOLDER, 'host': HOST, 'owner': worker_id(),
+        'pid': os.getpid(), 'port': port, 'state': 'ready', 'path': '',
+    }, lambda info: True)
+
+    app = build_app(session_factory)
+
+    async def run():
+        await drive(app, "/proxy/1/warmup.js")
+        for label, url in (("DB query + PID probe", "/legacy/1/chunks/main.js"),
+                           ("routing table", "/proxy/1/chunks/main.js")):
+            rps = await drive(app, url)
+            print(f"{label:<22}: {rps:8.0f} req/s ({REQUESTS} requests, concurrency {CONCURRENCY})")
+
+    asyncio.run(run())
+    # Don't let the exit cleanup "stop" the fake demo, i.e. this process
+    process_manager.registry.delete(FOLDER)
+    process_manager.processes.clear()
+
+
+if __name__ == "__main__":
+    main()
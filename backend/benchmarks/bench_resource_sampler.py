@@ -0,0 +1,66 @@
+"""CPU cost of one resource-sampler sweep with many running demos.
+
+Spawns stand-in demo process trees (a shell with two sleeping children,
+like npm -> node), records them as running demos in a temporary registry,
+and times ResourceSampler.sample() over them. Reports the CPU time of a
+sweep and what that costs at DEMO_SAMPLE_INTERVAL. Run from the backend
+directory:
+
+    python -m benchmarks.bench_resource_sampler [demos] [sweeps]
+"""
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from core.config import settings
+from core.process_manager import process_manager
+from core.registry import DemoRegistry, HOST, worker_id
+from core.resources import ResourceSampler
+
+
+def main():
+    demos = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    sweeps = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    # Keep the real demo registry untouched
+    process_manager.registry = DemoRegistry(f"sqlite:///{Path(tempfile.mkdtemp()) / 'demo_registry.db'}")
+    process_manager.processes = {}
+
+    trees = [
+        subprocess.Popen(['sh', '-c', 'sleep 600 & sleep 600 & wait'], start_new_session=True)
+        for _ in range(demos)
+    ]
+    try:
+        for i, tree in enumerate(trees):
+            process_manager.registry.claim({
+                'folder_name': f'bench-{i}', 'host': HOST, 'owner': worker_id(),
+                'pid': tree.pid, 'port': 40000 + i, 'state': 'ready', 'path': '',
+            }, lambda info: True)
+        time.sleep(0.5)  # let the shells fork their children
+
+        sampler = ResourceSampler(interval=settings.DEMO_SAMPLE_INTERVAL, history=settings.DEMO_SAMPLE_HISTORY)
+        costs = []
+        for _ in range(sweeps):
+            sampled = sampler.sample()
+            costs.append(sampler.last_sweep_seconds)
+        processes = sum(sample['processes'] for sample in sampled.values())
+
+        cost = statistics.median(costs)
+        print(f"{len(sampled)} demos, {processes} processes, {sweeps} sweeps")
+        print(f"sweep CPU time: {cost * 1000:.1f} ms (median), {max(costs) * 1000:.1f} ms (max)")
+        print(f"overhead at a {settings.DEMO_SAMPLE_INTERVAL:g}s interval: {cost / settings.DEMO_SAMPLE_INTERVAL * 100:.3f}% of one CPU")
+    finally:
+        for i, tree in enumerate(trees):
+            tree.send_signal(signal.SIGKILL)
+            subprocess.run(['pkill', '-KILL', '-s', str(tree.pid)], check=False)
+            tree.wait()
+            process_manager.registry.delete(f'bench-{i}')
+        # Don't let the exit cleanup try to stop the stand-ins again
+        process_manager.processes.clear()
+
+
+if __name__ == "__main__":
+    main()
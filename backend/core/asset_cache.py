@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from core.config import settings
+
+# Encodings a cached body may carry, in order of preference
+CACHEABLE_ENCODINGS = ('br', 'gzip', 'identity')
+
+
+class CachedAsset:
+    """A fully buffered upstream response for an immutable asset"""
+
+    __slots__ = ('headers', 'body', 'etag', 'encoding', 'size')
+
+    def __init__(self, headers: List[Tuple[str, str]], body: Optional[bytes], etag: str, encoding: str, size: int):
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.encoding = encoding
+        self.size = size
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    wanted = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """Cached encodings usable for a request, in preference order."""
+    offered = set()
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0'):
+            continue
+        offered.add(name.strip())
+    return [enc for enc in CACHEABLE_ENCODINGS if enc == 'identity' or enc in offered or '*' in offered]
+
+
+class StaticAssetCache:
+    """Byte-budgeted LRU cache of immutable demo assets (/_next/static/...).
+
+    Entries are scoped per demo (folder name) and keyed by path, query and
+    content encoding. One LRU order and one byte budget span all demos.
+    When a disk directory is configured, entries evicted from memory spill
+    to disk (with their own byte budget) and are promoted back on a hit;
+    disk reads and writes run in a thread, only the memory tier is used on
+    the event loop. The whole scope of a demo is dropped when the demo starts, stops or dies,
+    because a new build may serve different files under the same paths.
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int, disk_dir: str = "", disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        # Each worker process spills into its own subdirectory
+        self.disk_dir = Path(disk_dir).expanduser() / str(os.getpid()) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes if self.disk_dir else 0
+
+        self._memory: "OrderedDict[Tuple[str, str], CachedAsset]" = OrderedDict()
+        self._disk: "OrderedDict[Tuple[str, str], CachedAsset]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        # Bumped by invalidate, so disk I/O that was in progress does not
+        # bring back entries of a dropped scope
+        self._generations: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+        if self.disk_dir:
+            # Spilled bodies never outlive the process that indexed them
+            shutil.rmtree(self.disk_dir, ignore_errors=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _disk_path(self, scope: str, key: str) -> Path:
+        return self.disk_dir / scope / hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    async def get(self, scope: str, key: str, accept_encoding: str = "") -> Optional[CachedAsset]:
+        """Return the best cached variant the client accepts, or None."""
+        for encoding in accepted_encodings(accept_encoding):
+            entry_key = (scope, f"{key}\n{encoding}")
+            with self._lock:
+                asset = self._memory.get(entry_key)
+                if asset is not None:
+                    self._memory.move_to_end(entry_key)
+                    self.hits += 1
+                    return asset
+                asset = self._disk.pop(entry_key, None)
+                if asset is not None:
+                    self._disk_bytes -= asset.size
+                generation = self._generations.get(scope, 0)
+            if asset is not None:
+                body = await asyncio.to_thread(self._unspill, entry_key)
+                if body is None:
+                    continue
+                promoted = CachedAsset(asset.headers, body, asset.etag, asset.encoding, asset.size)
+                await self._store(entry_key, promoted, generation)
+                with self._lock:
+                    self.hits += 1
+                return promoted
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def put(self, scope: str, key: str, headers: List[Tuple[str, str]], body: bytes, encoding: str = 'identity') -> Optional[CachedAsset]:
+        """Cache a complete 200 response body; returns the entry or None if too large."""
+        if not self.enabled or len(body) > self.max_entry_bytes:
+            return None
+        etag = next((v for k, v in headers if k.lower() == 'etag'), None)
+        if not etag:
+            etag = make_etag(body)
+            headers = headers + [('etag', etag)]
+        asset = CachedAsset(headers, body, etag, encoding or 'identity', len(body))
+        with self._lock:
+            generation = self._generations.get(scope, 0)
+        await self._store((scope, f"{key}\n{asset.encoding}"), asset, generation)
+        return asset
+
+    async def _store(self, entry_key: Tuple[str, str], asset: CachedAsset, generation: int):
+        spilled = []
+        with self._lock:
+            if self._generations.get(entry_key[0], 0) != generation:
+                return  # the scope was invalidated meanwhile
+            previous = self._memory.pop(entry_key, None)
+            if previous is not None:
+                self._memory_bytes -= previous.size
+            self._memory[entry_key] = asset
+            self._memory_bytes += asset.size
+            while self._memory_bytes > self.max_bytes and self._memory:
+                evicted_key, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted.size
+                if self.disk_max_bytes and evicted.size <= self.disk_max_bytes:
+                    spilled.append((evicted_key, evicted, self._generations.get(evicted_key[0], 0)))
+        if spilled:
+            await asyncio.to_thread(self._spill, spilled)
+
+    def _unspill(self, entry_key: Tuple[str, str]) -> Optional[bytes]:
+        """Read (and remove) a spilled body; runs in a thread."""
+        path = self._disk_path(*entry_key)
+        try:
+            body = path.read_bytes()
+            path.unlink()
+        except OSError:
+            return None
+        return body
+
+    def _spill(self, spilled: List[Tuple[Tuple[str, str], CachedAsset, int]]):
+        """Write entries evicted from memory to disk; runs in a thread."""
+        for entry_key, asset, generation in spilled:
+            path = self._disk_path(*entry_key)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(asset.body)
+            except OSError as e:
+                print(f"Error spilling asset to disk: {e}")
+                continue
+            removed = []
+            with self._lock:
+                if self._generations.get(entry_key[0], 0) != generation:
+                    removed.append(entry_key)
+                else:
+                    previous = self._disk.pop(entry_key, None)
+                    if previous is not None:
+                        self._disk_bytes -= previous.size
+                    self._disk[entry_key] = CachedAsset(asset.headers, None, asset.etag, asset.encoding, asset.size)
+                    self._disk_bytes += asset.size
+                while self._disk_bytes > self.disk_max_bytes and self._disk:
+                    old_key, old = self._disk.popitem(last=False)
+                    self._disk_bytes -= old.size
+                    removed.append(old_key)
+            for old_key in removed:
+                try:
+                    self._disk_path(*old_key).unlink()
+                except OSError:
+                    pass
+
+    def invalidate(self, scope: str):
+        """Drop every cached asset of one demo."""
+        with self._lock:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+            for entry_key in [k for k in self._memory if k[0] == scope]:
+                self._memory_bytes -= self._memory.pop(entry_key).size
+            for entry_key in [k for k in self._disk if k[0] == scope]:
+                self._disk_bytes -= self._disk.pop(entry_key).size
+        if self.disk_dir:
+            shutil.rmtree(self.disk_dir / scope, ignore_errors=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._memory),
+                'bytes': self._memory_bytes,
+                'max_bytes': self.max_bytes,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+            }
+
+
+# Global instance
+asset_cache = StaticAssetCache(
+    max_bytes=settings.ASSET_CACHE_MAX_BYTES,
+    max_entry_bytes=settings.ASSET_CACHE_MAX_ENTRY_BYTES,
+    disk_dir=settings.ASSET_CACHE_DISK_DIR,
+    disk_max_bytes=settings.ASSET_CACHE_DISK_MAX_BYTES,
+)
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from core.config import settings
+from core.demo_config import load_demo_config
+
+# Runtime profiles of a demo
+DEV = 'dev'                # next dev: compiles pages on demand, watches files
+PRODUCTION = 'production'  # next build once per source change, then next start
+STATIC = 'static'          # next build with output: 'export', served from out/ by the proxy
+PROFILES = (DEV, PRODUCTION, STATIC)
+
+# Folder a static export is written to
+EXPORT_DIR = 'out'
+
+# File in the build directory recording which sources it was built from
+BUILD_STAMP = 'central-illustration-build.json'
+
+# Never part of a demo's sources
+IGNORED_DIRS = {'node_modules', '.git', EXPORT_DIR}
+IGNORED_FILES = {'.demo.json', '.DS_Store'}
+
+NEXT_CONFIG_FILES = ('next.config.js', 'next.config.mjs', 'next.config.cjs', 'next.config.ts')
+DIST_DIR_PATTERN = re.compile(r"""distDir\s*:\s*['"`]([^'"`]+)['"`]""")
+
+
+def demo_profile(folder_name: str) -> str:
+    """The demo's runtime profile: "profile" in .demo.json, else DEMO_PROFILE."""
+    profile = load_demo_config(folder_name).get('profile', settings.DEMO_PROFILE)
+    if profile not in PROFILES:
+        print(f"Unknown profile {profile!r} for {folder_name}, using {DEV}")
+        return DEV
+    return profile
+
+
+def dist_dir(demo_dir: Path) -> Path:
+    """The project's Next.js build directory (its distDir, .next by default)."""
+    for name in NEXT_CONFIG_FILES:
+        try:
+            match = DIST_DIR_PATTERN.search((demo_dir / name).read_text(encoding='utf-8'))
+        except OSError:
+            continue
+        if match:
+            return demo_dir / match.group(1)
+    return demo_dir / '.next'
+
+
+def export_dir(demo_dir: Path) -> Path:
+    return demo_dir / EXPORT_DIR
+
+
+class BuildCache:
+    """Decides whether a demo's build output is current for its sources.
+
+    Sources are hashed by content: every file of the project outside
+    node_modules, build and export directories. File digests are memoized
+    by (size, mtime), so re-hashing an unchanged demo only stats its files.
+    A successful build writes the hash into the build directory; next build
+    clears that directory when it starts, so an interrupted build never
+    looks current. Next.js keeps its own compiler cache in <distDir>/cache,
+    which makes the rebuild after a change incremental.
+    """
+
+    def __init__(self):
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _file_digest(self, path: str, st: os.stat_result) -> str:
+        memo = self._digests.get(path)
+        if memo and memo[0] == st.st_size and memo[1] == st.st_mtime_ns:
+            return memo[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        with self._lock:
+            self._digests[path] = (st.st_size, st.st_mtime_ns, digest.hexdigest())
+        return digest.hexdigest()
+
+    def source_hash(self, demo_dir: Path, profile: str) -> str:
+        """Content hash of the project's sources (and the profile they are built for)."""
+        build_dir = dist_dir(demo_dir).name
+        total = hashlib.sha256(profile.encode())
+        for root, dirs, files in os.walk(demo_dir):
+            dirs[:] = sorted(
+                d for d in dirs
+                if d not in IGNORED_DIRS and d != build_dir and not d.startswith('.next')
+            )
+            for name in sorted(files):
+                if name in IGNORED_FILES:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                    digest = self._file_digest(path, st)
+                except OSError:
+                    continue
+                total.update(f"{os.path.relpath(path, demo_dir)}\0{digest}\n".encode())
+        return total.hexdigest()
+
+    def is_current(self, demo_dir: Path, profile: str, source_hash: str) -> bool:
+        """Whether the build output on disk was built from exactly these sources."""
+        build_dir = dist_dir(demo_dir)
+        try:
+            with open(build_dir / BUILD_STAMP, 'r') as f:
+                stamp = json.load(f)
+        except (OSError, ValueError):
+            stamp = {}
+        output = export_dir(demo_dir) / 'index.html' if profile == STATIC else build_dir / 'BUILD_ID'
+        current = stamp.get('source_hash') == source_hash and output.is_file()
+        if current:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return current
+
+    def record(self, demo_dir: Path, source_hash: str):
+        """Mark the freshly built output as built from source_hash."""
+        with open(dist_dir(demo_dir) / BUILD_STAMP, 'w') as f:
+            json.dump({'source_hash': source_hash}, f)
+
+    def stats(self) -> Dict:
+        return {'hits': self.hits, 'misses': self.misses, 'memoized_files': len(self._digests)}
+
+
+# Global instance
+build_cache = BuildCache()
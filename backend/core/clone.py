@@ -0,0 +1,159 @@
+import errno
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from core.config import settings
+
+# ioctl that makes a file share another's extents (Btrfs, XFS with reflink=1, bcachefs)
+FICLONE = 0x40049409
+
+# Files written over in place after a clone - by the creator, npm or the
+# content editor - which must never share data with their source
+REWRITTEN_NAMES = {'package.json', 'package-lock.json', '.extension.json', '.demo.json'}
+
+# Binary assets nothing in the backend writes in place, so a project may
+# share them with its template through a hardlink
+HARDLINK_EXTENSIONS = {
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.ico', '.bmp',
+    '.woff', '.woff2', '.ttf', '.otf', '.eot',
+    '.mp4', '.webm', '.mov', '.mp3', '.wav', '.ogg',
+    '.pdf', '.zip',
+}
+
+# Trees smaller than both are cloned on the calling thread
+PARALLEL_MIN_FILES = 64
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024
+
+# Errors meaning a filesystem (or pair of them) cannot reflink or hardlink
+_UNSUPPORTED = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOSYS}
+
+
+class CloneEngine:
+    """Copies template and extension trees into new projects cheaply.
+
+    Each file is reflinked where the filesystem supports it - a copy that
+    shares the source's blocks until either is written - and otherwise
+    copied, on a thread pool for large trees. Binary assets
+    are hardlinked instead when reflinks are unavailable: they are never
+    written in place, and a hardlink costs no data at all. Files in
+    REWRITTEN_NAMES are always separate copies. Filesystems that refuse
+    reflinks or hardlinks are remembered by device, so they are tried
+    once per process rather than once per file.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._no_reflink: Set[Tuple[int, int]] = set()
+        self._no_hardlink: Set[Tuple[int, int]] = set()
+        self._lock = threading.Lock()
+
+    def clone_tree(self, src: str, dst: str, ignore: Optional[Callable] = None,
+                   deadline: Optional[float] = None) -> Dict:
+        """Clone src to dst (which must not exist), like shutil.copytree.
+
+        ignore is called like copytree's (shutil.ignore_patterns works).
+        Past deadline (a time.monotonic() value), TimeoutError is raised and
+        dst is left partly cloned. Returns how many files were reflinked,
+        hardlinked and copied.
+        """
+        started = time.monotonic()
+        files: List[Tuple[int, str, str, Tuple[int, int]]] = []
+        dirs: List[Tuple[str, str]] = []
+        for root, subdirs, names in os.walk(src, followlinks=True):
+            ignored = ignore(root, subdirs + names) if ignore else set()
+            subdirs[:] = [name for name in subdirs if name not in ignored]
+            target = dst if root == src else os.path.join(dst, os.path.relpath(root, src))
+            os.makedirs(target, exist_ok=root != src)
+            dirs.append((root, target))
+            devices = (os.stat(root).st_dev, os.stat(target).st_dev)
+            for name in names:
+                if name not in ignored:
+                    path = os.path.join(root, name)
+                    files.append((os.stat(path).st_size, path, os.path.join(target, name), devices))
+
+        counts = {'reflinked': 0, 'hardlinked': 0, 'copied': 0}
+        if self.workers > 1 and (len(files) >= PARALLEL_MIN_FILES or sum(f[0] for f in files) >= PARALLEL_MIN_BYTES):
+            # One batch per thread, balanced by size: handing each file to
+            # the pool separately costs more than copying a small file
+            batches = [[] for _ in range(self.workers)]
+            for i, file in enumerate(sorted(files, reverse=True)):
+                batches[i % self.workers].append(file)
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='clone') as pool:
+                for methods in pool.map(self._clone_batch, batches, [deadline] * len(batches)):
+                    for method in methods:
+                        counts[method] += 1
+        else:
+            for method in self._clone_batch(files, deadline):
+                counts[method] += 1
+        # After the files, whose creation changes directory mtimes
+        for source, target in dirs:
+            shutil.copystat(source, target)
+        counts['seconds'] = round(time.monotonic() - started, 3)
+        return counts
+
+    def _clone_batch(self, files: List[Tuple[int, str, str, Tuple[int, int]]],
+                     deadline: Optional[float] = None) -> List[str]:
+        methods = []
+        for _, src, dst, devices in files:
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Cloning {src} took too long")
+            methods.append(self.clone_file(src, dst, devices))
+        return methods
+
+    def clone_file(self, src: str, dst: str, devices: Tuple[int, int]) -> str:
+        """Clone one file; returns 'reflinked', 'hardlinked' or 'copied'.
+
+        devices are those of src and of dst's directory.
+        """
+        name = os.path.basename(src)
+        if name not in REWRITTEN_NAMES:
+            if self._reflink(src, dst, devices):
+                return 'reflinked'
+            if os.path.splitext(name)[1].lower() in HARDLINK_EXTENSIONS and self._hardlink(src, dst, devices):
+                return 'hardlinked'
+        shutil.copy2(src, dst)
+        return 'copied'
+
+    def _reflink(self, src: str, dst: str, devices: Tuple[int, int]) -> bool:
+        if not sys.platform.startswith('linux') or devices in self._no_reflink:
+            return False
+        import fcntl
+        with open(src, 'rb') as source, open(dst, 'wb') as target:
+            try:
+                fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED:
+                    raise
+                with self._lock:
+                    self._no_reflink.add(devices)
+                failed = True
+            else:
+                failed = False
+        if failed:
+            os.unlink(dst)
+            return False
+        shutil.copystat(src, dst)
+        return True
+
+    def _hardlink(self, src: str, dst: str, devices: Tuple[int, int]) -> bool:
+        if devices in self._no_hardlink:
+            return False
+        try:
+            os.link(src, dst)
+            return True
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+            if e.errno != errno.EMLINK:  # only that file is out of links
+                with self._lock:
+                    self._no_hardlink.add(devices)
+            return False
+
+
+# Global instance
+clone_engine = CloneEngine(workers=settings.CLONE_WORKERS)
@@ -34,11 +34,169 @@ class Settings(BaseSettings):
     # CORS
     CORS_ORIGINS: str = "http://localhost:3000,http://localhost:3001"
     
+    # Demo reverse proxy (defaults; override per demo in <project>/.demo.json)
+    PROXY_TIMEOUT: float = 30.0
+    PROXY_CONNECT_TIMEOUT: float = 5.0
+    PROXY_MAX_CONNECTIONS: int = 100
+    PROXY_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    PROXY_KEEPALIVE_EXPIRY: float = 30.0
+
+    # Proxy-side cache for immutable /_next/static assets (0 disables)
+    ASSET_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    ASSET_CACHE_MAX_ENTRY_BYTES: int = 8 * 1024 * 1024
+    ASSET_CACHE_DISK_DIR: str = ""  # empty disables the spill-to-disk tier
+    ASSET_CACHE_DISK_MAX_BYTES: int = 1024 * 1024 * 1024
+
+    # Rewritten HTML pages of statically exported demos kept in memory
+    STATIC_PAGE_CACHE_BYTES: int = 32 * 1024 * 1024
+
+    # Single-flight for identical concurrent proxied GET/HEAD requests
+    PROXY_COALESCE: bool = True
+    PROXY_COALESCE_MAX_BYTES: int = 16 * 1024 * 1024
+    # Request headers that always distinguish otherwise identical requests
+    # (any header named in an upstream Vary is added automatically)
+    PROXY_COALESCE_VARY_HEADERS: str = (
+        "accept,accept-encoding,accept-language,authorization,cookie,range,"
+        "if-none-match,if-modified-since,rsc,next-router-state-tree,"
+        "next-router-prefetch,next-url"
+    )
+
+    # Shared demo process registry, so every API worker (and host) agrees on
+    # which demos run where; empty uses ~/.central-illustration/demo_registry.db
+    # (SQLite, WAL). Any SQLAlchemy URL works, e.g. DATABASE_URL across hosts.
+    DEMO_REGISTRY_URL: str = ""
+    # Seconds between each worker's re-reads of the registry, which keep its
+    # proxy routes current and save its demos' last-request times
+    DEMO_REGISTRY_SYNC_INTERVAL: float = 2.0
+    # Seconds other hosts trust a host's records without a heartbeat from
+    # it (renewed every quarter of this by the sync); once expired, a crashed
+    # host's demos may be started elsewhere
+    DEMO_REGISTRY_LEASE: float = 60.0
+    # Seconds a worker trusts its cached demo id -> folder mapping before
+    # reading it from the database again (another worker may have renamed
+    # or deleted the demo)
+    DEMO_FOLDER_CACHE_TTL: float = 5.0
+
+    # Ports leased to demo dev servers
+    DEMO_PORT_MIN: int = 49152
+    DEMO_PORT_MAX: int = 65535
+
+    # Run a demo's dev script binary (node_modules/.bin/next) directly rather
+    # than through `npm run dev`; npm remains the fallback for scripts that
+    # need a shell or binaries that are not installed (per demo:
+    # "direct_exec" in .demo.json)
+    DEMO_DIRECT_EXEC: bool = True
+
+    # Default runtime profile of a demo (per demo: "profile" in .demo.json):
+    # "dev" (next dev), "production" (cached next build + next start) or
+    # "static" (cached next build with output: 'export', served from out/)
+    DEMO_PROFILE: str = "dev"
+    DEMO_BUILD_TIMEOUT: float = 900.0
+
+    # Background jobs (project creation installs, rebuilds): worker threads
+    # per API worker, the npm install time limit, and where job output is
+    # kept (empty uses ~/.central-illustration/jobs)
+    JOB_WORKERS: int = 2
+    JOB_LOG_DIR: str = ""
+    NPM_INSTALL_TIMEOUT: float = 600.0
+
+    # Shared node_modules store: projects with an already installed
+    # package-lock.json get a hardlinked tree instead of an npm install
+    # (empty uses ~/.central-illustration/node_modules_store; keep it on
+    # the same filesystem as projects/)
+    DEPENDENCY_STORE: bool = True
+    DEPENDENCY_STORE_DIR: str = ""
+
+    # Threads copying a template or extension into a new project (files are
+    # reflinked where the filesystem allows, else copied in parallel)
+    CLONE_WORKERS: int = 8
+
+    # Next.js compiler cache snapshots per template/extension, seeding new
+    # demos' <distDir>/cache (empty dir uses ~/.central-illustration/next_cache;
+    # a family's snapshot is refreshed at most every NEXT_CACHE_REFRESH seconds;
+    # a start gives up seeding after NEXT_CACHE_SEED_TIMEOUT seconds)
+    NEXT_CACHE_SNAPSHOTS: bool = True
+    NEXT_CACHE_DIR: str = ""
+    NEXT_CACHE_REFRESH: float = 3600.0
+    NEXT_CACHE_SEED_TIMEOUT: float = 10.0
+
+    # Extension catalog: seconds between checks of backend/extensions for
+    # changed template.json files or content (served from memory meanwhile)
+    EXTENSION_CATALOG_CHECK_INTERVAL: float = 2.0
+
+    # Prewarm at backend boot: start the DEMO_PREWARM_COUNT most requested
+    # demos, plus those listed in DEMO_PREWARM_DEMOS (comma-separated; per
+    # demo: "prewarm" in .demo.json), DEMO_PREWARM_CONCURRENCY at a time
+    DEMO_PREWARM_COUNT: int = 0
+    DEMO_PREWARM_DEMOS: str = ""
+    DEMO_PREWARM_CONCURRENCY: int = 2
+
+    # Demo startup: a demo is ready once its port accepts connections and
+    # it answers an HTTP GET of "/" (per demo: "ready_path" in .demo.json)
+    DEMO_STARTUP_TIMEOUT: float = 120.0
+    DEMO_PROBE_HTTP_TIMEOUT: float = 30.0
+
+    # Stopping demos: grace period between SIGTERM and SIGKILL, and how many
+    # demos cleanup_all / bulk stop take down at once
+    DEMO_STOP_TIMEOUT: float = 5.0
+    DEMO_STOP_PARALLELISM: int = 8
+
+    # Kill Node process trees under projects/ left by a previous backend
+    DEMO_RECONCILE_ON_STARTUP: bool = True
+
+    # Demo stdout/stderr: lines kept in memory per demo, and optional
+    # rotating log files (<DEMO_LOG_DIR>/<folder>.log; empty disables)
+    DEMO_LOG_BUFFER_LINES: int = 2000
+    DEMO_LOG_DIR: str = ""
+    DEMO_LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    DEMO_LOG_BACKUP_COUNT: int = 3
+
+    # Scale-to-zero: start a stopped demo on its first proxied request
+    # (per demo: "auto_wake" in .demo.json)
+    DEMO_AUTO_WAKE: bool = False
+    DEMO_WAKE_TIMEOUT: float = 60.0
+    DEMO_WAKE_QUEUE_SIZE: int = 100  # max requests held per waking demo
+
+    # Stop demos idle longer than this many seconds (0 keeps them running;
+    # per demo: "idle_ttl" in .demo.json)
+    DEMO_IDLE_TTL: float = 0
+    DEMO_REAPER_INTERVAL: float = 60.0  # seconds between idle sweeps (0 disables)
+
+    # Resource accounting: seconds between /proc samples of every demo's
+    # process tree (0 disables) and samples kept per demo
+    DEMO_SAMPLE_INTERVAL: float = 10.0
+    DEMO_SAMPLE_HISTORY: int = 360
+
+    # Memory-pressure eviction: the RSS of all demo process trees shares a
+    # budget (bytes; 0 derives it as DEMO_MEMORY_BUDGET_FRACTION of
+    # MemTotal). Above the high watermark, least recently used demos are
+    # stopped until usage is below the low watermark; pinned demos never are
+    # (per demo: "pinned" in .demo.json). DEMO_EVICTION_INTERVAL 0 disables.
+    DEMO_MEMORY_BUDGET: int = 0
+    DEMO_MEMORY_BUDGET_FRACTION: float = 0.5
+    DEMO_MEMORY_HIGH_WATERMARK: float = 0.9
+    DEMO_MEMORY_LOW_WATERMARK: float = 0.75
+    DEMO_EVICTION_INTERVAL: float = 30.0
+
+    # V8 heap limit of a demo's Node processes (per demo: "max_old_space_mb"
+    # in .demo.json)
+    DEMO_NODE_MAX_OLD_SPACE_MB: int = 4096
+
     @property
     def cors_origins_list(self) -> list[str]:
         """Return CORS origins as a list."""
         return parse_cors_origins(self.CORS_ORIGINS)
     
+    @property
+    def demo_prewarm_demos(self) -> list[str]:
+        """Return the always-prewarmed demo folders as a list."""
+        return [name.strip() for name in self.DEMO_PREWARM_DEMOS.split(',') if name.strip()]
+    
+    @property
+    def proxy_coalesce_vary_headers(self) -> list[str]:
+        """Return the coalescing key headers as a lowercase list."""
+        return [h.strip().lower() for h in self.PROXY_COALESCE_VARY_HEADERS.split(',') if h.strip()]
+    
     class Config:
         env_file = ".env"
 
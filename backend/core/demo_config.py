@@ -0,0 +1,65 @@
+import json
+import os
+from typing import Dict, Tuple
+
+# Root folder holding all demo projects (relative to backend)
+PROJECTS_DIR = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), '..', 'projects')
+)
+
+# Name of the optional per-demo settings file inside a project folder
+DEMO_CONFIG_FILE = '.demo.json'
+
+_cache: Dict[str, Tuple[float, Dict]] = {}
+
+
+def load_demo_config(folder_name: str) -> Dict:
+    """Load per-demo settings from <project>/.demo.json.
+
+    The file is optional; a missing or unreadable file yields an empty dict.
+    Results are cached and only re-read when the file's mtime changes.
+    """
+    config_path = os.path.join(PROJECTS_DIR, folder_name, DEMO_CONFIG_FILE)
+    try:
+        mtime = os.stat(config_path).st_mtime
+    except OSError:
+        _cache.pop(folder_name, None)
+        return {}
+
+    cached = _cache.get(folder_name)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            data = {}
+    except Exception as e:
+        print(f"Error reading {config_path}: {e}")
+        data = {}
+
+    _cache[folder_name] = (mtime, data)
+    return data
+
+
+def save_demo_config(folder_name: str, **values) -> Dict:
+    """Update keys of a demo's .demo.json (None removes one), keeping the rest.
+
+    The file is replaced atomically, so readers never see it half written.
+    Returns the new settings.
+    """
+    data = dict(load_demo_config(folder_name))
+    for key, value in values.items():
+        if value is None:
+            data.pop(key, None)
+        else:
+            data[key] = value
+    config_path = os.path.join(PROJECTS_DIR, folder_name, DEMO_CONFIG_FILE)
+    temp_path = f"{config_path}.tmp{os.getpid()}"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+    os.replace(temp_path, config_path)
+    _cache.pop(folder_name, None)
+    return data
@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from logging import Formatter, LogRecord
+from pathlib import Path
+from typing import IO, Dict, List, Optional
+
+from core.config import settings
+
+MAX_LINE_BYTES = 64 * 1024
+
+
+class DemoLogBuffer:
+    """Fixed-size ring of the most recent output lines of one demo.
+
+    Every line gets a sequence number that keeps growing across restarts,
+    so a follower can ask for everything after the last line it saw.
+    """
+
+    def __init__(self, max_lines: int, log_file: Optional[Path] = None):
+        self._lines: deque = deque(maxlen=max_lines)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._file: Optional[RotatingFileHandler] = None
+        if log_file:
+            log_file.parent.mkdir(parents=True, exist_ok=True)
+            self._file = RotatingFileHandler(
+                log_file,
+                maxBytes=settings.DEMO_LOG_MAX_BYTES,
+                backupCount=settings.DEMO_LOG_BACKUP_COUNT,
+                encoding='utf-8',
+            )
+            self._file.setFormatter(Formatter('%(asctime)s %(name)s %(message)s'))
+
+    def append(self, stream: str, text: str):
+        with self._lock:
+            self._seq += 1
+            self._lines.append({'seq': self._seq, 'time': time.time(), 'stream': stream, 'text': text})
+        if self._file:
+            self._file.handle(LogRecord(stream, 20, '', 0, text, None, None))
+
+    def tail(self, lines: int) -> List[Dict]:
+        with self._lock:
+            if lines <= 0:
+                return []
+            return list(self._lines)[-lines:]
+
+    def since(self, seq: int) -> List[Dict]:
+        """Lines newer than seq (oldest first) that are still buffered."""
+        with self._lock:
+            if not self._lines or self._seq <= seq:
+                return []
+            skip = max(0, len(self._lines) - (self._seq - seq))
+            return list(self._lines)[skip:]
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+
+class DemoLogManager:
+    """Drains demo stdout/stderr so a chatty `next dev` never blocks on a full pipe.
+
+    One daemon thread per pipe reads lines as they arrive into the demo's
+    ring buffer (and, when DEMO_LOG_DIR is set, a rotating file per demo).
+    """
+
+    def __init__(self, max_lines: int, log_dir: str = ""):
+        self.max_lines = max_lines
+        self.log_dir = Path(log_dir).expanduser() if log_dir else None
+        self._buffers: Dict[str, DemoLogBuffer] = {}
+        self._lock = threading.Lock()
+
+    def buffer(self, folder_name: str) -> DemoLogBuffer:
+        with self._lock:
+            buf = self._buffers.get(folder_name)
+            if buf is None:
+                log_file = self.log_dir / f"{folder_name}.log" if self.log_dir else None
+                buf = self._buffers[folder_name] = DemoLogBuffer(self.max_lines, log_file)
+            return buf
+
+    def get(self, folder_name: str) -> Optional[DemoLogBuffer]:
+        return self._buffers.get(folder_name)
+
+    def attach(self, folder_name: str, process):
+        """Start draining a freshly spawned process's stdout and stderr."""
+        buf = self.buffer(folder_name)
+        command = process.args if isinstance(process.args, str) else ' '.join(map(str, process.args))
+        buf.append('system', f"--- started pid {process.pid}: {command} ---")
+        for stream, pipe in (('stdout', process.stdout), ('stderr', process.stderr)):
+            if pipe is None:
+                continue
+            threading.Thread(
+                target=self._drain,
+                args=(buf, stream, pipe),
+                name=f"logs-{folder_name}-{stream}",
+                daemon=True,
+            ).start()
+
+    def _drain(self, buf: DemoLogBuffer, stream: str, pipe: IO[bytes]):
+        try:
+            # Bounded reads so a line without a newline cannot grow unbounded
+            for raw in iter(lambda: pipe.readline(MAX_LINE_BYTES), b''):
+                buf.append(stream, raw.decode('utf-8', errors='replace').rstrip('\r\n'))
+        except (OSError, ValueError):
+            pass
+        finally:
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+
+# Global instance
+demo_logs = DemoLogManager(max_lines=settings.DEMO_LOG_BUFFER_LINES, log_dir=settings.DEMO_LOG_DIR)
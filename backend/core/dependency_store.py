@@ -0,0 +1,256 @@
+"""Shared, content-addressed node_modules trees for demo projects.
+
+Most projects are copies of a few templates with identical
+package-lock.json files, so their node_modules are identical too. The
+store keeps one tree per lockfile (and Node version and platform, since
+native modules differ by them) and materializes it into a project by
+hardlinking every file, which takes seconds and no extra disk space.
+
+Run from the backend directory:
+
+    python -m core.dependency_store stats
+    python -m core.dependency_store gc [--dry-run]
+"""
+import functools
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from core.config import settings
+from core.demo_config import PROJECTS_DIR
+
+LOCKFILE = 'package-lock.json'
+# Written into a materialized node_modules, naming the store entry it came from
+MARKER = '.central-illustration-store'
+ENTRY_META = 'meta.json'
+# Prefix of entries still being written; never read, and removed by gc
+STAGING_PREFIX = '.staging-'
+# Directories tools write into at runtime (babel-loader, eslint, terser and
+# Vite caches), rewriting files in place: never stored, and created empty
+# in each project instead
+RUNTIME_DIRS = {'.cache', '.vite'}
+
+
+@functools.lru_cache(maxsize=1)
+def node_version() -> str:
+    try:
+        return subprocess.run(['node', '--version'], capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return 'unknown'
+
+
+def link_tree(src: Path, dst: Path, hardlink: bool = True) -> Dict[str, int]:
+    """Recreate the tree at src under dst, hardlinking its files.
+
+    Directories are created and symlinks copied as links; RUNTIME_DIRS are
+    left out. A file that cannot be hardlinked (another filesystem, link
+    limit) is copied, and without hardlink every file is. Returns how many
+    files were linked and copied.
+    """
+    linked = copied = 0
+    for root, dirs, files in os.walk(src):
+        dirs[:] = [name for name in dirs if name not in RUNTIME_DIRS]
+        target = dst / os.path.relpath(root, src)
+        target.mkdir(parents=True, exist_ok=True)
+        for name in dirs + files:
+            path = os.path.join(root, name)
+            if os.path.islink(path):
+                os.symlink(os.readlink(path), target / name)
+                if name in dirs:
+                    dirs.remove(name)  # not followed
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.islink(path):
+                continue
+            if hardlink:
+                try:
+                    os.link(path, target / name)
+                    linked += 1
+                    continue
+                except OSError:
+                    pass
+            shutil.copy2(path, target / name)
+            copied += 1
+    return {'linked': linked, 'copied': copied}
+
+
+def _tree_bytes(path: Path) -> int:
+    """Disk bytes of a tree's files, counting each inode once"""
+    seen = set()
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            if st.st_ino not in seen:
+                seen.add(st.st_ino)
+                total += st.st_blocks * 512
+    return total
+
+
+class DependencyStore:
+    """node_modules trees keyed by the hash of a project's lockfile.
+
+    An entry is <store>/<key>/node_modules plus meta.json. It is filled
+    once with a copy of a project that just ran npm install. Projects get
+    it hardlinked (the store should live on the same filesystem as
+    projects/, or entries are copied), so a package edited in place
+    changes for all of them; npm itself replaces files rather than
+    rewriting them. Runtime caches such as node_modules/.cache, which are
+    rewritten in place, stay out of the store and each project's own.
+    """
+
+    def __init__(self, root: str = ""):
+        self.root = Path(root).expanduser() if root else Path.home() / ".central-illustration" / "node_modules_store"
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def key_for(self, project_dir: str) -> Optional[str]:
+        """Store key of a project's dependencies, None without a lockfile."""
+        try:
+            with open(os.path.join(project_dir, LOCKFILE), 'rb') as f:
+                lockfile = f.read()
+        except OSError:
+            return None
+        digest = hashlib.sha256(lockfile)
+        digest.update(f"\0{node_version()}\0{sys.platform}\0{platform.machine()}".encode())
+        return digest.hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key
+
+    def has(self, key: str) -> bool:
+        return (self._entry(key) / ENTRY_META).is_file()
+
+    def materialize(self, project_dir: str, key: str) -> Dict:
+        """Replace a project's node_modules with a linked copy of an entry."""
+        started = time.monotonic()
+        project = Path(project_dir)
+        staging = project / f"node_modules{STAGING_PREFIX}{uuid.uuid4().hex[:8]}"
+        try:
+            counts = link_tree(self._entry(key) / 'node_modules', staging)
+            (staging / '.cache').mkdir(exist_ok=True)
+            (staging / MARKER).write_text(key)
+            if (project / 'node_modules').exists():
+                shutil.rmtree(project / 'node_modules')
+            os.rename(staging, project / 'node_modules')
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        os.utime(self._entry(key) / ENTRY_META)  # last used, for stats
+        return dict(counts, key=key, seconds=round(time.monotonic() - started, 2))
+
+    def ingest(self, project_dir: str, key: str) -> bool:
+        """Make a project's freshly installed node_modules the entry for key.
+
+        Returns False if there is nothing to take or another project filled
+        the entry first.
+        """
+        node_modules = Path(project_dir) / 'node_modules'
+        if self.has(key) or not node_modules.is_dir():
+            return False
+        staging = self.root / f"{STAGING_PREFIX}{uuid.uuid4().hex}"
+        try:
+            # Copies: the project goes on using (and writing) its own tree
+            link_tree(node_modules, staging / 'node_modules', hardlink=False)
+            (node_modules / MARKER).write_text(key)
+            meta = {
+                'key': key,
+                'source': os.path.basename(os.path.normpath(project_dir)),
+                'node': node_version(),
+                'created_at': time.time(),
+                'bytes': _tree_bytes(staging / 'node_modules'),
+            }
+            (staging / ENTRY_META).write_text(json.dumps(meta))
+            os.rename(staging, self._entry(key))
+            return True
+        except OSError as e:
+            if self.has(key):
+                return False  # filled concurrently
+            raise e
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def entries(self) -> Dict[str, Dict]:
+        entries = {}
+        for entry in self.root.iterdir():
+            if entry.name.startswith(STAGING_PREFIX):
+                continue
+            try:
+                meta = json.loads((entry / ENTRY_META).read_text())
+                meta['last_used'] = (entry / ENTRY_META).stat().st_mtime
+            except (OSError, ValueError):
+                continue
+            entries[entry.name] = meta
+        return entries
+
+    def references(self, projects_dir: str = PROJECTS_DIR) -> Dict[str, List[str]]:
+        """key -> projects using it: by their lockfile, or the entry their node_modules came from."""
+        refs: Dict[str, List[str]] = {}
+        try:
+            projects = sorted(entry.path for entry in os.scandir(projects_dir) if entry.is_dir())
+        except OSError:
+            projects = []
+        for project in projects:
+            keys = {self.key_for(project)}
+            try:
+                keys.add(Path(project, 'node_modules', MARKER).read_text().strip())
+            except OSError:
+                pass
+            for key in keys - {None}:
+                refs.setdefault(key, []).append(os.path.basename(project))
+        return refs
+
+    def gc(self, dry_run: bool = False, projects_dir: str = PROJECTS_DIR) -> Dict:
+        """Remove entries no project references (and abandoned staging directories)."""
+        refs = self.references(projects_dir)
+        entries = self.entries()
+        removed, freed = [], 0
+        for key, meta in entries.items():
+            if key in refs:
+                continue
+            removed.append(key)
+            freed += meta.get('bytes', 0)
+            if not dry_run:
+                shutil.rmtree(self._entry(key), ignore_errors=True)
+        for entry in self.root.iterdir():
+            # Staging directories of installs that died; live ones are minutes old at most
+            if entry.name.startswith(STAGING_PREFIX) and time.time() - entry.stat().st_mtime > 3600 and not dry_run:
+                shutil.rmtree(entry, ignore_errors=True)
+        return {'removed': removed, 'freed_bytes': freed, 'kept': len(entries) - len(removed), 'dry_run': dry_run}
+
+    def stats(self, projects_dir: str = PROJECTS_DIR) -> Dict:
+        entries = self.entries()
+        refs = self.references(projects_dir)
+        stored = sum(meta.get('bytes', 0) for meta in entries.values())
+        # What the projects would take with a node_modules each
+        unshared = sum(meta.get('bytes', 0) * len(refs.get(key, [])) for key, meta in entries.items())
+        return {
+            'root': str(self.root),
+            'entries': {key: dict(meta, projects=refs.get(key, [])) for key, meta in entries.items()},
+            'stored_bytes': stored,
+            'unshared_bytes': unshared,
+            'saved_bytes': max(0, unshared - stored),
+        }
+
+
+# Global instance
+dependency_store = DependencyStore(settings.DEPENDENCY_STORE_DIR)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    if command == 'gc':
+        print(json.dumps(dependency_store.gc(dry_run='--dry-run' in sys.argv), indent=2))
+    elif command == 'stats':
+        print(json.dumps(dependency_store.stats(), indent=2))
+    else:
+        raise SystemExit(f"Unknown command {command!r} (stats, gc)")
@@ -0,0 +1,178 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from core import procfs
+from core.config import settings
+from core.demo_config import load_demo_config
+from core.process_manager import process_manager
+from core.resources import resource_sampler
+from core.wake import demo_waker
+
+
+def memory_budget() -> int:
+    """Bytes all demo process trees may use together; 0 if it cannot be known.
+
+    DEMO_MEMORY_BUDGET when set, else DEMO_MEMORY_BUDGET_FRACTION of the
+    host's MemTotal, leaving the rest to the database, the API and the OS.
+    """
+    if settings.DEMO_MEMORY_BUDGET > 0:
+        return settings.DEMO_MEMORY_BUDGET
+    return int(procfs.meminfo().get('MemTotal', 0) * settings.DEMO_MEMORY_BUDGET_FRACTION)
+
+
+def is_pinned(folder_name: str) -> bool:
+    """Whether a demo must never be evicted ("pinned" in .demo.json)."""
+    return bool(load_demo_config(folder_name).get('pinned'))
+
+
+class MemoryEvictor:
+    """Background task that stops demos when they use too much memory together.
+
+    Usage is the combined RSS of every demo's process tree on this host,
+    from the resource sampler's latest samples (or read from /proc when the
+    sampler is off). Once it crosses the high watermark of the budget, the
+    least recently used running demos - longest since their last proxied
+    request - are stopped until it is below the low watermark. Pinned
+    demos, demos being woken and static exports (which have no process)
+    are never stopped; each worker only stops the demos it owns.
+    """
+
+    def __init__(self, interval: float, high: float, low: float, history: int = 50):
+        self.interval = interval
+        self.high = high
+        self.low = min(low, high)
+        self._task: Optional[asyncio.Task] = None
+        self.evicted = 0
+        self.reclaimed_bytes = 0
+        self.last_usage_bytes = 0
+        self.events: deque = deque(maxlen=history)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Error in memory evictor: {e}")
+
+    def _usage(self, demos: Dict[str, Dict]) -> Dict[str, int]:
+        """RSS of each demo's process tree"""
+        usage = {}
+        children = None
+        for folder_name, info in demos.items():
+            sample = resource_sampler.latest(folder_name)
+            if sample is not None:
+                usage[folder_name] = sample['rss_bytes']
+                continue
+            if children is None:
+                children = procfs.children_map()
+            usage[folder_name] = sum(procfs.rss_bytes(pid) for pid in procfs.process_tree(info['pid'], children))
+        return usage
+
+    def _measure(self):
+        """Budget, each demo's RSS and, over the high watermark, this worker's
+        evictable demos least recently used first with their idle seconds
+        (blocking: reads the registry, /proc and .demo.json files)"""
+        budget = memory_budget()
+        if not budget:
+            return 0, {}, []
+        demos = {
+            folder_name: info for folder_name, info in process_manager.list_all().items()
+            if info.get('pid')
+        }
+        usage = self._usage(demos)
+        if sum(usage.values()) <= budget * self.high:
+            return budget, usage, []
+
+        def last_used(folder_name: str) -> float:
+            idle = process_manager.idle_seconds(folder_name)
+            return float('inf') if idle is None else idle
+
+        candidates = sorted(
+            (
+                (folder_name, last_used(folder_name)) for folder_name, info in demos.items()
+                if info['status'] == 'running'
+                and process_manager.owns(folder_name)
+                and not is_pinned(folder_name)
+            ),
+            key=lambda candidate: candidate[1],
+            reverse=True,
+        )
+        return budget, usage, candidates
+
+    async def sweep(self) -> list:
+        """Stop least recently used demos while over the high watermark; returns the events."""
+        budget, usage, candidates = await asyncio.to_thread(self._measure)
+        if not budget:
+            return []
+        used = self.last_usage_bytes = sum(usage.values())
+        if used <= budget * self.high:
+            return []
+
+        evicted = []
+        for folder_name, idle in candidates:
+            if used <= budget * self.low:
+                break
+            if demo_waker.is_waking(folder_name):
+                continue
+            result = await process_manager.stop_demo_async(folder_name)
+            if result.get('status') != 'stopped':
+                print(f"Memory evictor could not stop {folder_name}: {result}")
+                continue
+            used -= usage[folder_name]
+            event = {
+                'folder_name': folder_name,
+                'idle_seconds': round(idle, 1) if idle != float('inf') else None,
+                'rss_bytes': usage[folder_name],
+                'usage_after_bytes': used,
+                'budget_bytes': budget,
+                'stopped_at': time.time(),
+            }
+            self.evicted += 1
+            self.reclaimed_bytes += usage[folder_name]
+            self.events.append(event)
+            evicted.append(event)
+            print(f"Evicted demo {folder_name} under memory pressure, reclaimed {usage[folder_name] / 1048576:.1f} MiB RSS")
+        self.last_usage_bytes = used
+        if used > budget * self.low:
+            print(f"Demos still use {used / 1048576:.0f} MiB of a {budget / 1048576:.0f} MiB budget; the rest are pinned, busy or owned by other workers")
+        return evicted
+
+    def stats(self) -> Dict:
+        budget = memory_budget()
+        host = procfs.meminfo()
+        return {
+            'interval': self.interval,
+            'budget_bytes': budget,
+            'high_watermark_bytes': int(budget * self.high),
+            'low_watermark_bytes': int(budget * self.low),
+            'usage_bytes': self.last_usage_bytes,
+            'host_total_bytes': host.get('MemTotal'),
+            'host_available_bytes': host.get('MemAvailable'),
+            'evicted': self.evicted,
+            'reclaimed_bytes': self.reclaimed_bytes,
+            'recent': list(self.events),
+        }
+
+
+# Global instance
+memory_evictor = MemoryEvictor(
+    interval=settings.DEMO_EVICTION_INTERVAL,
+    high=settings.DEMO_MEMORY_HIGH_WATERMARK,
+    low=settings.DEMO_MEMORY_LOW_WATERMARK,
+)
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from core.config import settings
+
+# Template extensions shipped with the backend
+EXTENSIONS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'extensions'))
+
+# Per-extension metadata file (name, description, icon)
+TEMPLATE_JSON = 'template.json'
+
+
+def directory_structure(root_dir: str, current_path: str = '') -> Dict:
+    """Nested files and directories under root_dir, with file sizes"""
+    structure = {}
+    full_path = os.path.join(root_dir, current_path) if current_path else root_dir
+    try:
+        entries = sorted(os.scandir(full_path), key=lambda entry: entry.name)
+    except OSError:
+        return structure
+    for entry in entries:
+        relative_path = os.path.join(current_path, entry.name).replace('\\', '/')
+        if entry.is_dir():
+            structure[relative_path] = {
+                'type': 'directory',
+                'children': directory_structure(root_dir, relative_path)
+            }
+        else:
+            structure[relative_path] = {
+                'type': 'file',
+                'size': entry.stat().st_size
+            }
+    return structure
+
+
+def _signature(extension_path: str) -> Tuple:
+    """What an extension's catalog entry is built from: the stat of its
+    template.json and of everything under public/content"""
+    parts = []
+    for path in (extension_path, os.path.join(extension_path, TEMPLATE_JSON)):
+        try:
+            st = os.stat(path)
+            parts.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            parts.append((path, None, None))
+    for root, dirs, files in os.walk(os.path.join(extension_path, 'public', 'content')):
+        dirs.sort()
+        for name in [''] + sorted(files):
+            path = os.path.join(root, name) if name else root
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            parts.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(parts)
+
+
+class ExtensionCatalog:
+    """The template extensions, indexed in memory and served as ready JSON.
+
+    Listing extensions used to read every template.json, and each info
+    request walked the extension's public/content; both are done once per
+    change instead. Every EXTENSION_CATALOG_CHECK_INTERVAL seconds at most,
+    a request stats the extensions directory and each extension's
+    template.json and content tree, rebuilding only extensions whose stats
+    changed. Responses carry an ETag of their content, so a client
+    revalidating an unchanged catalog gets a 304 without a body.
+    """
+
+    def __init__(self, root: str = EXTENSIONS_DIR, check_interval: float = 2.0):
+        self.root = root
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._root_mtime: Optional[int] = None
+        self._entries: Dict[str, Dict] = {}
+        self._listing: Tuple[bytes, str] = (b'[]', '"empty"')
+        self.rebuilds = 0
+
+    def _build_entry(self, folder: str, signature: Tuple) -> Dict:
+        extension_path = os.path.join(self.root, folder)
+        template_json = os.path.join(extension_path, TEMPLATE_JSON)
+        summary = {'name': folder, 'description': 'Template extension', 'path': folder, 'icon': None}
+        info = {
+            'name': folder,
+            'path': extension_path,
+            'has_template_json': os.path.exists(template_json)
+        }
+        if info['has_template_json']:
+            try:
+                with open(template_json, 'r') as f:
+                    template_data = json.load(f)
+                info['template_data'] = template_data
+                summary.update(
+                    name=template_data.get('name', folder),
+                    description=template_data.get('description', ''),
+                    icon=template_data.get('icon'),
+                )
+            except Exception:
+                pass
+        content_dir = os.path.join(extension_path, 'public', 'content')
+        if os.path.exists(content_dir):
+            info['content_structure'] = directory_structure(content_dir)
+        body = json.dumps(info).encode()
+        return {
+            'signature': signature,
+            'summary': summary,
+            'info_body': body,
+            'info_etag': f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        }
+
+    def refresh(self, force: bool = False):
+        """Re-read extensions whose files changed, at most every check_interval."""
+        if not force and time.monotonic() - self._checked < self.check_interval:
+            return
+        with self._lock:
+            if not force and time.monotonic() - self._checked < self.check_interval:
+                return
+            try:
+                root_mtime = os.stat(self.root).st_mtime_ns
+                folders = sorted(entry.name for entry in os.scandir(self.root) if entry.is_dir())
+            except OSError:
+                root_mtime, folders = None, []
+            changed = root_mtime != self._root_mtime or set(folders) != set(self._entries)
+            entries = {}
+            for folder in folders:
+                signature = _signature(os.path.join(self.root, folder))
+                entry = self._entries.get(folder)
+                if entry is None or entry['signature'] != signature:
+                    entry = self._build_entry(folder, signature)
+                    changed = True
+                entries[folder] = entry
+            if changed:
+                self._entries = entries
+                self._root_mtime = root_mtime
+                body = json.dumps([entry['summary'] for entry in entries.values()]).encode()
+                self._listing = (body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+                self.rebuilds += 1
+            self._checked = time.monotonic()
+
+    def listing(self) -> Tuple[bytes, str]:
+        """JSON list of every extension's summary, and its ETag"""
+        self.refresh()
+        return self._listing
+
+    def info(self, folder: str) -> Optional[Tuple[bytes, str]]:
+        """JSON details of one extension, with its content tree, and their ETag; None if unknown"""
+        self.refresh()
+        entry = self._entries.get(folder)
+        return (entry['info_body'], entry['info_etag']) if entry else None
+
+
+# Global instance
+extension_catalog = ExtensionCatalog(check_interval=settings.EXTENSION_CATALOG_CHECK_INTERVAL)
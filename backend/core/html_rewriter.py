@@ -0,0 +1,168 @@
+import re
+from functools import lru_cache
+from typing import AsyncIterator, Optional, Tuple
+
+# Start of a region whose contents are never rewritten
+RAW_START_PATTERN = re.compile(rb"<(?:!--|(script|style)(?=[\s>/]))", re.IGNORECASE)
+
+# A complete start tag, quotes respected
+START_TAG_PATTERN = re.compile(rb"<[a-zA-Z][^>\"']*(?:(?:\"[^\"]*\"|'[^']*')[^>\"']*)*>")
+
+# Terminators of the non-rewritten modes
+RAW_END_PATTERNS = {
+    b'comment': re.compile(rb"-->"),
+    b'script': re.compile(rb"</script", re.IGNORECASE),
+    b'style': re.compile(rb"</style", re.IGNORECASE),
+}
+RAW_END_KEEP = len(b"</script") - 1
+
+# srcset values are rewritten candidate by candidate (also matches imagesrcset)
+SRCSET_PATTERN = re.compile(rb"(srcset=)(\"[^\"]*\"|'[^']*')", re.IGNORECASE)
+
+# Upper bound on bytes held back waiting for a tag to complete
+MAX_HOLDBACK = 64 * 1024
+
+
+# Attributes whose root-relative value gets the proxy prefix; data-src and
+# formaction are covered as suffixes
+URL_ATTRIBUTES = (b"href", b"src", b"action", b"poster")
+
+
+@lru_cache(maxsize=256)
+def _url_patterns(prefix: bytes) -> Tuple[re.Pattern, re.Pattern]:
+    """Match the leading '/' of root-relative URL attribute values.
+
+    The pattern starts with a literal '/' and checks the attribute name with
+    fixed-width lookbehinds, so the regex engine can use its fast literal
+    search and the replacement is a plain byte string (no per-match Python).
+    Attribute names match in any case, as HTML's do; the URLs themselves
+    are case-sensitive. Values that
+    are protocol-relative ("//"), odd "/http:" forms, or already under the
+    prefix are left alone.
+
+    The second pattern does the same for candidates inside a quoted srcset
+    value, where a URL starts after the quote, a comma or whitespace.
+    """
+    lookbehinds = b"|".join(
+        b"(?<=(?i:" + name + b")=" + quote + b"/)"
+        for name in URL_ATTRIBUTES
+        for quote in (b'"', b"'", b"")
+    )
+    not_root = rb"(?!/|https?:|" + re.escape(prefix[1:]) + rb"(?:/|[\"'\s>,]))"
+    attr_pattern = re.compile(rb"/(?<=[=\"']/)(?:" + lookbehinds + rb")" + not_root)
+    candidate_pattern = re.compile(rb"/(?<=[\"',\s]/)" + not_root)
+    return attr_pattern, candidate_pattern
+
+
+class HTMLURLRewriter:
+    """Incremental rewriter for root-relative URLs in proxied HTML.
+
+    Works on raw bytes, so any ASCII-compatible charset passes through
+    untouched. Feed chunks as they arrive; each call returns the bytes that
+    are safe to send. State carried between chunks:
+
+    - the tail of the buffer from the last '<', so an attribute split across
+      a chunk boundary is still matched (bounded by MAX_HOLDBACK);
+    - whether the scanner is inside a comment, <script> or <style>, whose
+      contents are never rewritten.
+
+    href, src, action, formaction, poster (and their data-* forms) are
+    prefixed when root-relative; every candidate of a srcset or imagesrcset
+    is rewritten. Values already under the prefix are left alone.
+    <base href="/"> is rewritten like any other href so relative URLs
+    resolve under the proxy prefix too.
+    """
+
+    def __init__(self, url_prefix: str):
+        self.prefix = url_prefix.rstrip('/').encode('utf-8')
+        self._attr_pattern, self._candidate_pattern = _url_patterns(self.prefix)
+        self._attr_replacement = self.prefix.replace(b"\\", b"\\\\") + b"/"
+        self._pending = b""
+        self._raw_end: Optional[re.Pattern] = None
+
+    def _rewrite_srcset(self, m: re.Match) -> bytes:
+        value = m.group(2)
+        if b"data:" in value:
+            return m.group(0)
+        return m.group(1) + self._candidate_pattern.sub(self._attr_replacement, value)
+
+    def _rewrite_text(self, text: bytes) -> bytes:
+        text = self._attr_pattern.sub(self._attr_replacement, text)
+        return SRCSET_PATTERN.sub(self._rewrite_srcset, text)
+
+    def _process(self, buf: bytes, final: bool) -> bytes:
+        out = []
+        pos = 0
+        end = len(buf)
+
+        while pos < end:
+            if self._raw_end is not None:
+                m = self._raw_end.search(buf, pos)
+                if m:
+                    out.append(buf[pos:m.start()])
+                    pos = m.start()
+                    self._raw_end = None
+                    continue
+                keep = end if final else max(pos, end - RAW_END_KEEP)
+                out.append(buf[pos:keep])
+                pos = keep
+                break
+
+            # Never scan past an unterminated '<' unless this is the last chunk
+            limit = end
+            if not final:
+                last_open = buf.rfind(b"<", pos)
+                if last_open >= 0 and end - last_open <= MAX_HOLDBACK:
+                    limit = last_open
+
+            m = RAW_START_PATTERN.search(buf, pos, limit)
+            if not m:
+                out.append(self._rewrite_text(buf[pos:limit]))
+                pos = limit
+                break
+
+            out.append(self._rewrite_text(buf[pos:m.start()]))
+            raw = m.group(1)
+            if raw is None:
+                # Comment
+                out.append(m.group(0))
+                pos = m.end()
+                self._raw_end = RAW_END_PATTERNS[b'comment']
+                continue
+
+            tag = START_TAG_PATTERN.match(buf, m.start())
+            if not tag:
+                if not final and end - m.start() <= MAX_HOLDBACK:
+                    pos = m.start()
+                    break
+                # Not a well-formed start tag; copy it through as text
+                out.append(m.group(0))
+                pos = m.end()
+                continue
+            # The <script>/<style> tag itself is rewritten (script src=...)
+            out.append(self._rewrite_text(tag.group(0)))
+            pos = tag.end()
+            self._raw_end = RAW_END_PATTERNS[raw.lower()]
+
+        self._pending = buf[pos:]
+        return b"".join(out)
+
+    def feed(self, chunk: bytes) -> bytes:
+        """Consume a chunk and return the rewritten bytes ready to send."""
+        return self._process(self._pending + chunk, final=False)
+
+    def close(self) -> bytes:
+        """Flush whatever is still held back at end of document."""
+        return self._process(self._pending, final=True)
+
+
+async def rewrite_html_stream(chunks: AsyncIterator[bytes], url_prefix: str) -> AsyncIterator[bytes]:
+    """Rewrite an HTML byte stream on the fly with HTMLURLRewriter."""
+    rewriter = HTMLURLRewriter(url_prefix)
+    async for chunk in chunks:
+        data = rewriter.feed(chunk)
+        if data:
+            yield data
+    data = rewriter.close()
+    if data:
+        yield data
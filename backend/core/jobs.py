@@ -0,0 +1,336 @@
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, IO, List, Optional, Tuple
+
+from core.config import settings
+from core.demo_config import PROJECTS_DIR
+from core.demo_logs import MAX_LINE_BYTES
+from core.dependency_store import dependency_store
+from core.process_manager import process_manager
+from core.registry import is_owner_alive, worker_id
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+# Seconds between checks of a running job for cancellation (which may come from another worker)
+CANCEL_POLL_INTERVAL = 1.0
+# Grace period between SIGTERM and SIGKILL for a cancelled command
+KILL_GRACE_SECONDS = 5.0
+
+
+class JobCancelled(Exception):
+    """Raised inside a job that was cancelled"""
+
+
+class JobContext:
+    """Handed to a job function: progress and log reporting, and commands
+    that are killed when the job is cancelled."""
+
+    def __init__(self, engine: 'JobEngine', job_id: str, cancel: threading.Event):
+        self.engine = engine
+        self.id = job_id
+        self._cancel = cancel
+        self._checked = 0.0
+
+    def log(self, text: str, stream: str = 'system'):
+        self.engine.append_log(self.id, stream, text)
+
+    def progress(self, fraction: float, message: Optional[str] = None):
+        """Report how far the job is (0..1), and what it is doing now."""
+        values = {'progress': max(0.0, min(1.0, fraction))}
+        if message is not None:
+            values['message'] = message
+            self.log(message)
+        self.engine.registry.update_job(self.id, (RUNNING,), **values)
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._cancel.is_set() and time.monotonic() - self._checked >= CANCEL_POLL_INTERVAL:
+            self._checked = time.monotonic()
+            job = self.engine.registry.get_job(self.id)
+            if job and job['cancel_requested']:
+                self._cancel.set()
+        return self._cancel.is_set()
+
+    def check(self):
+        """Stop here if the job was cancelled."""
+        if self.cancelled:
+            raise JobCancelled()
+
+    def run(self, command: List[str], cwd: str, timeout: float, env: Optional[Dict[str, str]] = None):
+        """Run a command with its output in the job log.
+
+        Raises if it exits non-zero or runs past timeout; on cancellation
+        its whole process group is killed and JobCancelled raised.
+        """
+        self.check()
+        self.log(f"$ {' '.join(command)}")
+        process = subprocess.Popen(
+            command,
+            cwd=cwd,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+        # Recorded so orphan reconciliation leaves the command alone
+        self.engine.registry.update_job(self.id, (RUNNING,), pid=process.pid)
+        reader = threading.Thread(target=self._drain, args=(process.stdout,), name=f"job-{self.id}", daemon=True)
+        reader.start()
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                try:
+                    code = process.wait(timeout=CANCEL_POLL_INTERVAL)
+                    break
+                except subprocess.TimeoutExpired:
+                    pass
+                if self.cancelled:
+                    raise JobCancelled()
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{command[0]} did not finish in {timeout:.0f}s")
+        except BaseException:
+            _kill_group(process)
+            raise
+        finally:
+            reader.join(timeout=KILL_GRACE_SECONDS)
+            self.engine.registry.update_job(self.id, pid=None)
+        if code:
+            raise RuntimeError(f"{command[0]} exited with code {code}")
+
+    def _drain(self, pipe: IO[bytes]):
+        try:
+            for raw in iter(lambda: pipe.readline(MAX_LINE_BYTES), b''):
+                self.log(raw.decode('utf-8', errors='replace').rstrip('\r\n'), 'output')
+        except (OSError, ValueError):
+            pass
+        finally:
+            pipe.close()
+
+
+def _kill_group(process: subprocess.Popen):
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(process.pid, sig)
+        except OSError:
+            return
+        try:
+            process.wait(timeout=KILL_GRACE_SECONDS)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+class JobEngine:
+    """Runs slow work - npm installs, builds - outside of HTTP requests.
+
+    Jobs run on a bounded thread pool per API worker; more wait queued.
+    Each job is a row in the registry's demo_jobs table, so every worker
+    can report its state and progress or cancel it, and its output is
+    appended to <log dir>/<id>.log as JSON lines, which followers read by
+    byte offset. A queued or running job whose worker exited is marked
+    failed the next time it is read.
+    """
+
+    def __init__(self, workers: int, log_dir: str = ""):
+        self.workers = max(1, workers)
+        self.log_dir = Path(log_dir).expanduser() if log_dir else Path.home() / ".central-illustration" / "jobs"
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+        self._futures: Dict[str, Future] = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._log_lock = threading.Lock()
+
+    @property
+    def registry(self):
+        return process_manager.registry
+
+    def submit(self, kind: str, folder_name: Optional[str], fn: Callable, *args) -> Dict:
+        """Queue fn(job, *args); returns the job record right away."""
+        job_id = uuid.uuid4().hex
+        record = {
+            'id': job_id,
+            'kind': kind,
+            'folder_name': folder_name,
+            'owner': worker_id(),
+            'state': QUEUED,
+            'progress': 0.0,
+            'message': 'Queued',
+            'cancel_requested': 0,
+            'created_at': time.time(),
+        }
+        self.registry.add_job(record)
+        self._cancel_events[job_id] = threading.Event()
+        self._futures[job_id] = self._executor.submit(self._execute, job_id, fn, args)
+        return self._public(record)
+
+    def _execute(self, job_id: str, fn: Callable, args: tuple):
+        try:
+            # Unless it was cancelled while queued
+            if not self.registry.update_job(job_id, (QUEUED,), state=RUNNING, started_at=time.time(), message='Running'):
+                return
+            job = JobContext(self, job_id, self._cancel_events[job_id])
+            try:
+                result = fn(job, *args)
+            except JobCancelled:
+                job.log('Cancelled')
+                self._finish(job_id, CANCELLED, message='Cancelled')
+            except Exception as e:
+                job.log(f"Failed: {e}")
+                self._finish(job_id, FAILED, message='Failed', error=str(e))
+            else:
+                self._finish(job_id, SUCCEEDED, progress=1.0, message='Done',
+                             result=json.dumps(result) if result is not None else None)
+        except Exception as e:
+            print(f"Error running job {job_id}: {e}")
+        finally:
+            self._futures.pop(job_id, None)
+            self._cancel_events.pop(job_id, None)
+
+    def _finish(self, job_id: str, state: str, **values):
+        self.registry.update_job(job_id, (RUNNING,), state=state, finished_at=time.time(), **values)
+
+    def _public(self, job: Dict) -> Dict:
+        job = dict(job)
+        job['cancel_requested'] = bool(job.get('cancel_requested'))
+        job['result'] = json.loads(job['result']) if job.get('result') else None
+        return job
+
+    def _reap(self, job: Dict) -> Dict:
+        """Mark a job failed if the worker running it is gone"""
+        if job['state'] in ACTIVE_STATES and not is_owner_alive(job['owner']):
+            self.registry.update_job(
+                job['id'], ACTIVE_STATES, state=FAILED, finished_at=time.time(),
+                message='Failed', error='Interrupted: the worker running it exited',
+            )
+            job = self.registry.get_job(job['id']) or job
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self.registry.get_job(job_id)
+        return self._public(self._reap(job)) if job else None
+
+    def list(self, limit: int = 50, folder_name: Optional[str] = None) -> List[Dict]:
+        return [self._public(self._reap(job)) for job in self.registry.jobs(limit, folder_name)]
+
+    def active_for(self, folder_name: str) -> Optional[Dict]:
+        """A queued or running job of a demo, if any"""
+        for job in self.registry.jobs(10, folder_name, ACTIVE_STATES):
+            job = self._reap(job)
+            if job['state'] in ACTIVE_STATES:
+                return self._public(job)
+        return None
+
+    def recover(self):
+        """Fail the jobs of workers on this host that exited (at startup)"""
+        for job in self.registry.jobs(1000, states=ACTIVE_STATES):
+            self._reap(job)
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """Cancel a queued job, or ask a running one (in whichever worker) to stop."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job['state'] == QUEUED and self.registry.update_job(
+            job_id, (QUEUED,), state=CANCELLED, finished_at=time.time(), message='Cancelled'
+        ):
+            future = self._futures.pop(job_id, None)
+            if future is not None and future.cancel():
+                self._cancel_events.pop(job_id, None)
+        elif job['state'] == RUNNING:
+            self.registry.update_job(job_id, (RUNNING,), cancel_requested=1)
+            event = self._cancel_events.get(job_id)
+            if event is not None:
+                event.set()
+        return self.get(job_id)
+
+    def shutdown(self):
+        """Cancel this worker's jobs so their commands don't outlive it"""
+        for job_id, event in list(self._cancel_events.items()):
+            self.registry.update_job(job_id, (QUEUED,), state=CANCELLED, finished_at=time.time(), message='Cancelled')
+            event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _log_path(self, job_id: str) -> Path:
+        return self.log_dir / f"{job_id}.log"
+
+    def append_log(self, job_id: str, stream: str, text: str):
+        line = json.dumps({'time': time.time(), 'stream': stream, 'text': text}) + '\n'
+        with self._log_lock:
+            with open(self._log_path(job_id), 'a', encoding='utf-8') as f:
+                f.write(line)
+
+    def read_log(self, job_id: str, offset: int = 0) -> Tuple[List[Dict], int]:
+        """Log lines after byte offset, each with the offset that follows it, and the new offset."""
+        try:
+            with open(self._log_path(job_id), 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return [], offset
+        lines = []
+        for raw in data.splitlines(keepends=True):
+            if not raw.endswith(b'\n'):
+                break  # still being written
+            offset += len(raw)
+            try:
+                lines.append(dict(json.loads(raw), offset=offset))
+            except ValueError:
+                continue
+        return lines, offset
+
+
+def npm_install(job: JobContext, project_dir: str) -> Dict:
+    """Install a project's dependencies: linked from the dependency store
+    when its lockfile was installed before, else by npm (filling the store)"""
+    folder_name = os.path.basename(project_dir)
+    key = dependency_store.key_for(project_dir) if settings.DEPENDENCY_STORE else None
+    if key and dependency_store.has(key):
+        job.progress(0.1, f"Linking dependencies of {folder_name} from the store ({key[:12]})")
+        linked = dependency_store.materialize(project_dir, key)
+        job.log(f"Linked {linked['linked']} files and copied {linked['copied']} in {linked['seconds']}s")
+        return dict(linked, folder_name=folder_name, source='store')
+
+    job.progress(0.05, f"Installing dependencies of {folder_name}")
+    job.run(['npm', 'install'], cwd=project_dir, timeout=settings.NPM_INSTALL_TIMEOUT)
+    # npm may have written the lockfile; store what it actually installed
+    key = dependency_store.key_for(project_dir) if settings.DEPENDENCY_STORE else None
+    if key:
+        job.progress(0.9, 'Adding the dependencies to the store')
+        try:
+            if dependency_store.ingest(project_dir, key):
+                job.log(f"Stored as {key[:12]}")
+        except OSError as e:
+            job.log(f"Could not add the dependencies to the store: {e}")
+    return {'folder_name': folder_name, 'key': key, 'source': 'npm'}
+
+
+def rebuild_demo(job: JobContext, folder_name: str) -> Dict:
+    """Rebuild a production or static demo from its current sources, until it serves again"""
+    job.progress(0.05, f"Rebuilding {folder_name}")
+    result = process_manager.rebuild_demo(folder_name, PROJECTS_DIR)
+    if result['status'] == 'error':
+        raise RuntimeError(result.get('message', 'Rebuild failed'))
+    if result['status'] != 'started':
+        return result
+    job.progress(0.2, 'Building and starting')
+    status = process_manager.wait_until_ready(folder_name, settings.DEMO_BUILD_TIMEOUT + settings.DEMO_STARTUP_TIMEOUT)
+    if status['status'] != 'running':
+        raise RuntimeError(status.get('error') or f"Demo is {status['status']} after the rebuild")
+    return status
+
+
+# Global instance
+job_engine = JobEngine(workers=settings.JOB_WORKERS, log_dir=settings.JOB_LOG_DIR)
@@ -0,0 +1,65 @@
+import json
+import os
+import shlex
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Characters in a script that only a shell can expand
+SHELL_EXPANSIONS = set('$`*?~')
+
+# Modes of running a demo's dev server
+DIRECT = 'direct'  # the package binary itself, e.g. node_modules/.bin/next
+NPM = 'npm'        # npm run <script>, which adds an npm process in between
+
+
+def package_script(demo_dir: Path, name: str) -> Optional[str]:
+    """A script of the project's package.json, None if missing or unreadable."""
+    try:
+        with open(demo_dir / 'package.json', 'r', encoding='utf-8') as f:
+            script = json.load(f).get('scripts', {}).get(name)
+    except (OSError, ValueError, AttributeError):
+        return None
+    return script if isinstance(script, str) else None
+
+
+def resolve_script(demo_dir: Path, name: str) -> Optional[List[str]]:
+    """argv that runs a package.json script without npm, or None if only npm can.
+
+    Works for scripts that are a single command of a binary installed in
+    node_modules/.bin (e.g. "next dev -p 3001"); anything using shell syntax
+    (&&, pipes, redirects, variables, env assignments, globs) is left to npm.
+    """
+    script = package_script(demo_dir, name)
+    if not script or SHELL_EXPANSIONS & set(script):
+        return None
+    lexer = shlex.shlex(script, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    try:
+        argv = list(lexer)
+    except ValueError:
+        return None
+    if not argv or '=' in argv[0] or any(arg[:1] in ('&', '|', ';', '<', '>', '(', ')') for arg in argv):
+        return None
+    binary = demo_dir / 'node_modules' / '.bin' / argv[0]
+    if not os.access(binary, os.X_OK):
+        return None
+    return [str(binary)] + argv[1:]
+
+
+def script_command(demo_dir: Path, name: str, args: List[str], direct: bool = True) -> Tuple[List[str], str]:
+    """Command line running a package.json script with extra args, and its mode.
+
+    Like `npm run <name> -- <args>`, minus the npm process whenever the
+    script can be resolved to its binary.
+    """
+    argv = resolve_script(demo_dir, name) if direct else None
+    if argv:
+        return argv + args, DIRECT
+    return ['npm', 'run', name, '--'] + args, NPM
+
+
+def script_env(demo_dir: Path, env: Dict[str, str]) -> Dict[str, str]:
+    """Put the project's binaries first on PATH, as npm run does."""
+    bin_dir = str(demo_dir / 'node_modules' / '.bin')
+    env['PATH'] = bin_dir + os.pathsep + env.get('PATH', '')
+    return env
@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import shutil
+import statistics
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Dict, Optional
+
+from core.builds import dist_dir
+from core.clone import clone_engine
+from core.config import settings
+from core.demo_config import DEMO_CONFIG_FILE
+from core.dependency_store import dependency_store
+
+# Subdirectories of <distDir>/cache holding compiler output; the rest
+# (fetch-cache, images) is the data of one demo and is never shared
+COMPILER_CACHES = ('webpack', 'swc')
+
+# Files that change what the compiler produces from the same sources
+COMPILER_CONFIG_FILES = (
+    'next.config.js', 'next.config.mjs', 'next.config.cjs', 'next.config.ts',
+    'tsconfig.json', 'jsconfig.json', '.babelrc', 'babel.config.js',
+    'postcss.config.js', 'postcss.config.mjs', 'tailwind.config.js', 'tailwind.config.ts',
+)
+
+SNAPSHOT_META = 'meta.json'
+STAGING_PREFIX = '.staging-'
+# Seconds after which a staging directory is taken to be left by a dead publisher
+STAGING_ABANDONED_AFTER = 3600
+
+# How a demo's compiler cache came to be when it was started
+SEEDED = 'seeded'  # copied from its family's snapshot
+OWN = 'own'        # its own, from earlier runs
+COLD = 'cold'      # none; the first pages compile from scratch
+
+
+def demo_family(demo_dir: Path) -> Optional[str]:
+    """What a demo was created from: its extension, else its template."""
+    try:
+        with open(demo_dir / '.extension.json', 'r', encoding='utf-8') as f:
+            name = json.load(f).get('extension_name')
+        if name:
+            return f"extension-{name}"
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        with open(demo_dir / DEMO_CONFIG_FILE, 'r', encoding='utf-8') as f:
+            name = json.load(f).get('template')
+        if name:
+            return f"template-{name}"
+    except (OSError, ValueError, AttributeError):
+        pass
+    return None
+
+
+def installed_next_version(demo_dir: Path) -> Optional[str]:
+    try:
+        with open(demo_dir / 'node_modules' / 'next' / 'package.json', 'r', encoding='utf-8') as f:
+            return json.load(f).get('version')
+    except (OSError, ValueError):
+        return None
+
+
+class NextCacheSnapshots:
+    """Per-template snapshots of Next.js compiler caches, seeding new demos.
+
+    Demos created from the same template or extension compile nearly the
+    same modules, but each would fill <distDir>/cache from scratch. After
+    a successful build - or a dev server's clean exit - the demo's webpack
+    and SWC caches are copied to <root>/<family>/<key>; a demo of that
+    family starting without a cache of its own gets a copy first.
+
+    The key hashes everything that makes a cache incompatible rather than
+    merely incomplete: the lockfile with the Node version and platform
+    (the dependency store key), the installed Next.js version and the
+    compiler configs. Sources are not in it - webpack validates cached
+    modules against their content itself. A family keeps only its latest
+    snapshot, refreshed at most every NEXT_CACHE_REFRESH seconds.
+    """
+
+    def __init__(self, root: str = "", refresh: float = 3600.0, seed_timeout: float = 10.0, history: int = 100):
+        self.root = Path(root).expanduser() if root else Path.home() / ".central-illustration" / "next_cache"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.refresh = refresh
+        self.seed_timeout = seed_timeout
+        self._lock = threading.Lock()
+        self._publishing = set()
+        self._starts: Dict[str, str] = {}
+        self.events: deque = deque(maxlen=history)
+
+    def key(self, demo_dir: Path) -> Optional[str]:
+        """Compatibility key of a demo's compiler cache; None without a lockfile or Next.js install."""
+        dependencies = dependency_store.key_for(str(demo_dir))
+        version = installed_next_version(demo_dir)
+        if not dependencies or not version:
+            return None
+        digest = hashlib.sha256(f"{dependencies}\0{version}\0".encode())
+        for name in COMPILER_CONFIG_FILES:
+            try:
+                digest.update(name.encode() + b'\0' + (demo_dir / name).read_bytes() + b'\0')
+            except OSError:
+                continue
+        return digest.hexdigest()
+
+    def _snapshot(self, family: str, key: str) -> Path:
+        return self.root / family / key
+
+    def seed(self, demo_dir: Path) -> str:
+        """Give a demo without a compiler cache its family's snapshot, if one fits.
+
+        Runs in the start of the demo, so a copy taking longer than
+        seed_timeout is abandoned and the demo starts cold. Returns SEEDED,
+        OWN or COLD, which is also reported with the demo's first page
+        compile once it is ready.
+        """
+        cache_dir = dist_dir(demo_dir) / 'cache'
+        if any((cache_dir / name).is_dir() for name in COMPILER_CACHES):
+            outcome = OWN
+        else:
+            outcome = COLD
+            family = demo_family(demo_dir)
+            key = self.key(demo_dir) if family else None
+            snapshot = self._snapshot(family, key) if key else None
+            if snapshot is not None and (snapshot / SNAPSHOT_META).is_file():
+                deadline = time.monotonic() + self.seed_timeout
+                try:
+                    for name in COMPILER_CACHES:
+                        if (snapshot / name).is_dir():
+                            clone_engine.clone_tree(str(snapshot / name), str(cache_dir / name), deadline=deadline)
+                    outcome = SEEDED
+                except OSError as e:
+                    print(f"Error seeding the Next.js cache of {demo_dir.name}: {e}")
+                    for name in COMPILER_CACHES:
+                        shutil.rmtree(cache_dir / name, ignore_errors=True)
+        with self._lock:
+            self._starts[demo_dir.name] = outcome
+        return outcome
+
+    def publish(self, demo_dir: Path):
+        """Snapshot a demo's compiler cache for its family, in the background."""
+        family = demo_family(demo_dir)
+        if family is None:
+            return
+        with self._lock:
+            if family in self._publishing:
+                return
+            self._publishing.add(family)
+        threading.Thread(
+            target=self._publish, args=(demo_dir, family), name=f"next-cache-{family}", daemon=True
+        ).start()
+
+    def _publish(self, demo_dir: Path, family: str):
+        staging = self.root / family / f"{STAGING_PREFIX}{uuid.uuid4().hex}"
+        retired = self.root / family / f"{STAGING_PREFIX}{uuid.uuid4().hex}"
+        try:
+            key = self.key(demo_dir)
+            cache_dir = dist_dir(demo_dir) / 'cache'
+            caches = [name for name in COMPILER_CACHES if (cache_dir / name).is_dir()]
+            if not key or not caches:
+                return
+            snapshot = self._snapshot(family, key)
+            try:
+                if time.time() - (snapshot / SNAPSHOT_META).stat().st_mtime < self.refresh:
+                    return
+            except OSError:
+                pass
+            started = time.monotonic()
+            for name in caches:
+                clone_engine.clone_tree(str(cache_dir / name), str(staging / name))
+            meta = {'family': family, 'key': key, 'source': demo_dir.name, 'created_at': time.time()}
+            (staging / SNAPSHOT_META).write_text(json.dumps(meta))
+            # Swap it in, then drop this family's snapshots for older keys
+            if snapshot.exists():
+                os.rename(snapshot, retired)
+            os.rename(staging, snapshot)
+            self._drop_older(family, key, meta['created_at'])
+            print(f"Published the Next.js cache of {demo_dir.name} for {family} in {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            print(f"Error publishing the Next.js cache of {demo_dir.name}: {e}")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+            shutil.rmtree(retired, ignore_errors=True)
+            with self._lock:
+                self._publishing.discard(family)
+
+    def _drop_older(self, family: str, key: str, created_at: float):
+        """Remove a family's snapshots made before created_at for other keys,
+        and staging directories abandoned by a publisher that died."""
+        for entry in (self.root / family).iterdir():
+            if entry.name.startswith(STAGING_PREFIX):
+                # Other workers may be writing theirs right now
+                try:
+                    abandoned = time.time() - entry.stat().st_mtime > STAGING_ABANDONED_AFTER
+                except OSError:
+                    continue
+                if abandoned:
+                    shutil.rmtree(entry, ignore_errors=True)
+                continue
+            if entry.name == key:
+                continue
+            try:
+                meta = json.loads((entry / SNAPSHOT_META).read_text())
+            except (OSError, ValueError):
+                continue  # not complete, or not a snapshot
+            if meta.get('key') != key and meta.get('created_at', 0) < created_at:
+                shutil.rmtree(entry, ignore_errors=True)
+
+    def record_first_page(self, folder_name: str, seconds: float):
+        """Note how long a demo's first page took, with how its cache was seeded."""
+        with self._lock:
+            outcome = self._starts.pop(folder_name, None)
+        if outcome is not None:
+            self.events.append({'folder_name': folder_name, 'cache': outcome,
+                                'first_page_seconds': seconds, 'at': time.time()})
+
+    def stats(self) -> Dict:
+        snapshots = []
+        for family in sorted(p for p in self.root.iterdir() if p.is_dir()):
+            for snapshot in family.iterdir():
+                try:
+                    snapshots.append(json.loads((snapshot / SNAPSHOT_META).read_text()))
+                except (OSError, ValueError):
+                    continue
+        events = list(self.events)
+        first_page = {}
+        for outcome in (SEEDED, OWN, COLD):
+            seconds = [event['first_page_seconds'] for event in events if event['cache'] == outcome]
+            if seconds:
+                first_page[outcome] = {'starts': len(seconds), 'median_seconds': round(statistics.median(seconds), 3)}
+        return {
+            'enabled': settings.NEXT_CACHE_SNAPSHOTS,
+            'root': str(self.root),
+            'snapshots': snapshots,
+            'first_page': first_page,
+            'recent': events,
+        }
+
+
+# Global instance
+next_cache = NextCacheSnapshots(
+    settings.NEXT_CACHE_DIR, refresh=settings.NEXT_CACHE_REFRESH, seed_timeout=settings.NEXT_CACHE_SEED_TIMEOUT
+)
@@ -0,0 +1,120 @@
+import socket
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from core.config import settings
+
+# Lease states
+RESERVED = 'reserved'  # handed to a starting demo, not yet serving
+ACTIVE = 'active'      # the demo passed its readiness probe
+
+
+class PortLease:
+    __slots__ = ('folder_name', 'port', 'state', 'since')
+
+    def __init__(self, folder_name: str, port: int, state: str):
+        self.folder_name = folder_name
+        self.port = port
+        self.state = state
+        self.since = time.time()
+
+
+def _port_is_free(port: int) -> bool:
+    """Whether nothing outside our leases listens on the port right now."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            s.bind(("127.0.0.1", port))
+            return True
+        except OSError:
+            return False
+
+
+class PortAllocator:
+    """Leases demo ports from a fixed range.
+
+    Free ports sit in a FIFO queue: a lease pops from the front and a
+    release appends to the back, so a port is reused as late as possible
+    and allocation is O(1) regardless of how many demos hold leases. A port
+    stays reserved for its demo from spawn until stop or death, so two
+    concurrent starts can never be handed the same port. Only the port
+    about to be leased is test-bound, to skip ones taken by other programs.
+    """
+
+    def __init__(self, low: int, high: int):
+        self.low = low
+        self.high = high
+        self._free = deque(range(low, high + 1))
+        self._leases: Dict[int, PortLease] = {}
+        self._by_folder: Dict[str, PortLease] = {}
+        self._lock = threading.Lock()
+        self.skipped_busy = 0
+
+    def reserve(self, folder_name: str) -> int:
+        """Lease a port to a demo (its existing lease, if it has one)."""
+        with self._lock:
+            lease = self._by_folder.get(folder_name)
+            if lease is not None:
+                return lease.port
+            for _ in range(len(self._free)):
+                port = self._free.popleft()
+                if port in self._leases:
+                    continue  # stale entry of a port adopted while queued
+                if not _port_is_free(port):
+                    # Held by something we don't manage; retry it much later
+                    self.skipped_busy += 1
+                    self._free.append(port)
+                    continue
+                lease = PortLease(folder_name, port, RESERVED)
+                self._leases[port] = lease
+                self._by_folder[folder_name] = lease
+                return port
+        raise RuntimeError(f"No available ports in {self.low}–{self.high} range")
+
+    def adopt(self, folder_name: str, port: int, state: str = ACTIVE):
+        """Record a lease for a demo that already runs on a port (e.g. after a restart)."""
+        with self._lock:
+            self._release_locked(folder_name)
+            lease = PortLease(folder_name, port, state)
+            self._leases[port] = lease
+            self._by_folder[folder_name] = lease
+
+    def activate(self, folder_name: str):
+        """Mark a reservation as serving once the demo is ready."""
+        with self._lock:
+            lease = self._by_folder.get(folder_name)
+            if lease is not None:
+                lease.state = ACTIVE
+
+    def release(self, folder_name: str):
+        """Return a demo's port to the pool (on stop or death)."""
+        with self._lock:
+            self._release_locked(folder_name)
+
+    def _release_locked(self, folder_name: str):
+        lease = self._by_folder.pop(folder_name, None)
+        if lease is not None and self._leases.get(lease.port) is lease:
+            del self._leases[lease.port]
+            if self.low <= lease.port <= self.high:
+                self._free.append(lease.port)
+
+    def port_of(self, folder_name: str) -> Optional[int]:
+        lease = self._by_folder.get(folder_name)
+        return lease.port if lease else None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            reserved = sum(1 for lease in self._leases.values() if lease.state == RESERVED)
+            return {
+                'range': [self.low, self.high],
+                'free': self.high - self.low + 1 - len(self._leases),
+                'reserved': reserved,
+                'active': len(self._leases) - reserved,
+                'skipped_busy': self.skipped_busy,
+            }
+
+
+# Global instance
+port_allocator = PortAllocator(settings.DEMO_PORT_MIN, settings.DEMO_PORT_MAX)
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+
+from core.config import settings
+from core.demo_config import PROJECTS_DIR, load_demo_config
+from core.process_manager import process_manager
+
+
+def prewarm_candidates() -> List[str]:
+    """Demos to start at boot: the listed ones first, then the most requested.
+
+    Listed means DEMO_PREWARM_DEMOS or "prewarm": true in a demo's
+    .demo.json; request counts come from the registry, so they survive
+    restarts. Only folders with a package.json under projects/ qualify.
+    """
+    try:
+        folders = sorted(entry.name for entry in os.scandir(PROJECTS_DIR) if entry.is_dir())
+    except OSError:
+        folders = []
+    listed = settings.demo_prewarm_demos + [
+        folder_name for folder_name in folders if load_demo_config(folder_name).get('prewarm')
+    ]
+    busiest = []
+    if settings.DEMO_PREWARM_COUNT > 0:
+        try:
+            busiest = list(process_manager.registry.most_requested(settings.DEMO_PREWARM_COUNT))
+        except Exception as e:
+            print(f"Error reading demo request counts: {e}")
+
+    candidates = []
+    for folder_name in listed + busiest:
+        if folder_name in candidates:
+            continue
+        if not os.path.isfile(os.path.join(PROJECTS_DIR, folder_name, 'package.json')):
+            continue
+        candidates.append(folder_name)
+    return candidates
+
+
+class DemoPrewarmer:
+    """Starts the demos likely to be visited first, in the background at boot.
+
+    A demo is started and waited for until it is ready (or failed) before
+    its slot goes to the next one, so at most `concurrency` demos boot and
+    compile at once and the API stays responsive meanwhile. Demos that are
+    already running - after a restart, or started by another worker - are
+    left alone. Prewarmed demos are ordinary running demos afterwards:
+    the idle reaper and memory evictor treat them like any other.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = max(1, concurrency)
+        self._task: Optional[asyncio.Task] = None
+        self.results: Dict[str, Dict] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        # Reads the registry and every demo's .demo.json
+        folders = await asyncio.to_thread(prewarm_candidates)
+        await self.prewarm(folders)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def prewarm(self, folders: List[str]) -> Dict[str, Dict]:
+        """Start folders, concurrency at a time; returns each one's outcome."""
+        self.results = {folder_name: {'status': 'pending'} for folder_name in folders}
+        self.started_at, self.finished_at = time.time(), None
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def warm(folder_name: str):
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    result = await asyncio.to_thread(process_manager.start_demo, folder_name, PROJECTS_DIR)
+                    if result['status'] == 'started':
+                        status = await asyncio.to_thread(
+                            process_manager.wait_until_ready, folder_name, settings.DEMO_STARTUP_TIMEOUT
+                        )
+                        result = {
+                            'status': 'ready' if status['status'] == 'running' else status['status'],
+                            'error': status.get('error'),
+                        }
+                except Exception as e:
+                    result = {'status': 'error', 'message': str(e)}
+                result['seconds'] = round(time.monotonic() - started, 2)
+                self.results[folder_name] = result
+                print(f"Prewarm {folder_name}: {result['status']} in {result['seconds']:.1f}s")
+
+        await asyncio.gather(*(warm(folder_name) for folder_name in folders))
+        self.finished_at = time.time()
+        return self.results
+
+    def stats(self) -> Dict:
+        return {
+            'concurrency': self.concurrency,
+            'count': settings.DEMO_PREWARM_COUNT,
+            'listed': settings.demo_prewarm_demos,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'results': self.results,
+        }
+
+
+# Global instance
+demo_prewarmer = DemoPrewarmer(concurrency=settings.DEMO_PREWARM_CONCURRENCY)
@@ -1,225 +1,945 @@
+import asyncio
 import subprocess
 import os
 import json
 import atexit
 import socket
-import random
-from typing import Dict, Optional
+import time
+import signal
+import threading
+import http.client
+from typing import Callable, Dict, Optional
 from pathlib import Path
 
+from core import procfs
+from core.asset_cache import asset_cache
+from core.builds import DEV, STATIC, build_cache, demo_profile, export_dir
+from core.config import settings
+from core.demo_logs import demo_logs
+from core.demo_config import load_demo_config
+from core.launcher import script_command, script_env
+from core.next_cache import next_cache
+from core.ports import port_allocator, ACTIVE, RESERVED
+from core.registry import DemoRegistry, PortTaken, HOST, worker_id
+from core.routing import routing_table
+from core.static_site import exported_pages, precompress_export
+from core.upstream import upstream_pool
+
+# Lifecycle states of a demo process record
+STATE_BUILDING = 'building'  # production and static profiles, when the build is not current
+STATE_STARTING = 'starting'
+STATE_READY = 'ready'
+STATE_FAILED = 'failed'
+STATE_STOPPING = 'stopping'
+
+# Seconds between liveness checks while waiting for a demo to exit
+STOP_POLL_INTERVAL = 0.05
+
+# Upstream answers that mean the server is up but not serving yet
+NOT_READY_HTTP_STATUSES = {502, 503, 504}
+
+# A spawn claimed in the registry but never given a pid is abandoned after this
+SPAWN_CLAIM_TIMEOUT = 30.0
+# Attempts to claim a demo when another worker took the leased port first
+CLAIM_ATTEMPTS = 5
+# Seconds between polls of the registry for a demo another worker is starting
+REGISTRY_POLL_INTERVAL = 0.25
+# A demo's last request time is shared with other workers at most this often
+TOUCH_FLUSH_INTERVAL = 10.0
+
 class DemoProcessManager:
-    """Manages demo project processes and port allocation"""
+    """Manages demo project processes and port allocation
+    
+    Each record moves through [building ->] starting -> ready (or failed)
+    -> stopping. A demo is only routed, and reported as 'running', once it
+    is ready: a background probe has connected to its port and got an HTTP
+    answer (a static export is ready as soon as it is built).
+    
+    Records live in the shared DemoRegistry, so several API workers agree
+    on which demos run: a start claims the demo there before spawning, and
+    self.processes is this worker's copy of the records for this host. The
+    worker that spawned a demo (its owner) probes and supervises it, and
+    stops it on exit; demos of a dead worker are adopted by a live one.
+    """
     
     def __init__(self):
+        # This host's records, refreshed from the registry
         self.processes: Dict[str, Dict] = {}
+        # Set when a starting demo becomes ready or fails
+        self._ready_events: Dict[str, threading.Event] = {}
+        self._lock = threading.RLock()
+        # Popen handles of the demos this backend spawned, reaped on exit
+        self._children: Dict[str, subprocess.Popen] = {}
+        # folder_name -> wall-clock time of the last proxied request
+        self.last_request: Dict[str, float] = {}
+        # folder_name -> when last_request was last written to the registry
+        self._flushed_requests: Dict[str, float] = {}
+        # Requests per demo not yet added to the registry's usage counts
+        self._pending_requests: Dict[str, int] = {}
+        # When this worker last renewed its host's registry lease
+        self._heartbeat_at = 0.0
         self.base_port = 3001
-        self.process_file = Path.home() / ".central-illustration" / "demo_processes.json"
-        
-        # Create directory if it doesn't exist
-        self.process_file.parent.mkdir(parents=True, exist_ok=True)
+        state_dir = Path.home() / ".central-illustration"
+        state_dir.mkdir(parents=True, exist_ok=True)
+        self.registry = DemoRegistry(settings.DEMO_REGISTRY_URL)
+        # Per-process record file of earlier versions, imported once
+        self.legacy_process_file = state_dir / "demo_processes.json"
+        # Duration of the last cleanup_all, kept for the next run to report
+        self.shutdown_file = state_dir / "last_shutdown.json"
+        self.last_shutdown: Optional[Dict] = None
         
         # Load existing processes on startup
         self._load_processes()
+        try:
+            with open(self.shutdown_file, 'r') as f:
+                self.last_shutdown = json.load(f)
+        except (OSError, ValueError):
+            pass
         
         # Cleanup on exit
         atexit.register(self.cleanup_all)
     
     def _load_processes(self):
-        """Load process info from file"""
-        if self.process_file.exists():
+        """Load this host's records from the registry and adopt demos that survived a restart"""
+        self._import_legacy_file()
+        self._sync()
+        for folder_name, info in list(self.processes.items()):
+            if info.get('pid') and not self._is_stale(info):
+                self.touch(folder_name, request=False)
+    
+    def _import_legacy_file(self):
+        """Move the records of a demo_processes.json from before the registry into it"""
+        try:
+            with open(self.legacy_process_file, 'r') as f:
+                records = json.load(f)
+            # Another worker may be importing it too; claims make that harmless
+            self.legacy_process_file.rename(self.legacy_process_file.with_suffix('.json.migrated'))
+        except (OSError, ValueError):
+            return
+        for folder_name, info in records.items():
+            if not info.get('pid'):
+                continue
+            try:
+                self.registry.claim({
+                    'folder_name': folder_name,
+                    'host': HOST,
+                    'owner': worker_id(),
+                    'pid': info['pid'],
+                    'port': info['port'],
+                    'state': info.get('state', STATE_READY),
+                    'path': info.get('path'),
+                    'started_at': info.get('started_at'),
+                    'startup_seconds': info.get('startup_seconds'),
+                }, self._is_stale)
+            except PortTaken:
+                pass
+    
+    def _sync(self):
+        """Refresh every record of this host from the registry"""
+        with self._lock:
             try:
-                with open(self.process_file, 'r') as f:
-                    self.processes = json.load(f)
-            except:
-                self.processes = {}
+                records = self.registry.all()
+            except Exception as e:
+                print(f"Error reading demo registry: {e}")
+                return
+            gone = set(self.processes)
+            self.processes = {f: info for f, info in records.items() if info['host'] == HOST}
+            gone -= set(self.processes)
+        for folder_name in gone:
+            self._drop_local(folder_name)
+        for folder_name, info in list(self.processes.items()):
+            self._follow(folder_name, info)
+    
+    def _refresh(self, folder_name: str):
+        """Refresh one record from the registry (it may have been started or stopped elsewhere)"""
+        with self._lock:
+            try:
+                info = self.registry.get(folder_name)
+            except Exception as e:
+                print(f"Error reading demo registry: {e}")
+                return
+            if info is not None and info['host'] != HOST:
+                info = None
+            known = folder_name in self.processes
+            if info is not None:
+                self.processes[folder_name] = info
+            else:
+                self.processes.pop(folder_name, None)
+        if info is not None:
+            self._follow(folder_name, info)
+        elif known:
+            self._drop_local(folder_name)
     
-    def _save_processes(self):
-        """Save process info to file"""
+    def _follow(self, folder_name: str, info: Dict):
+        """Mirror a record in this worker: its port lease, its route, and ownership if orphaned"""
+        owner = info['owner']
+        owner_host, _, owner_pid = owner.rpartition(':')
+        if (owner != worker_id() and owner_host == HOST and info.get('pid')
+                and not self._is_process_running(int(owner_pid))):
+            # Its worker died: take over probing, idle reaping and stopping it on exit
+            if self._store(folder_name, {'owner': owner}, owner=worker_id()):
+                print(f"Adopted demo {folder_name} from exited worker {owner}")
+                pid = info['pid']
+                if info['state'] == STATE_STARTING and self._is_process_running(pid):
+                    self._watch_startup(folder_name, pid, info['port'], lambda: self._is_process_running(pid))
+                elif info['state'] == STATE_BUILDING:
+                    # Its exit code went with the worker; the next start builds again
+                    self._signal_tree(pid, signal.SIGTERM)
+                    self._store(folder_name, {'pid': pid}, state=STATE_FAILED, error='Build abandoned by exited worker')
+        state = info['state']
+        if port_allocator.port_of(folder_name) != info['port']:
+            port_allocator.adopt(folder_name, info['port'], ACTIVE if state == STATE_READY else RESERVED)
+        if state == STATE_READY:
+            self._route(folder_name, info)
+    
+    def _route(self, folder_name: str, info: Dict):
+        """Send a ready demo's proxied traffic to its port (or its static export)"""
+        if info.get('profile') == STATIC:
+            routing_table.set_static_root(folder_name, str(export_dir(Path(info['path']))))
+        else:
+            previous = routing_table.port_for(folder_name)
+            routing_table.set_port(folder_name, info['port'])
+            if previous is not None and previous != info['port']:
+                # Restarted on another port, by another worker
+                upstream_pool.discard(f"http://127.0.0.1:{previous}")
+    
+    def _store(self, folder_name: str, expect: Optional[Dict] = None, **values) -> bool:
+        """Update a record in the registry and in the local copy
+        
+        With expect, only if the registry record still has those values;
+        returns False if it did not (the record changed or is gone).
+        """
         try:
-            with open(self.process_file, 'w') as f:
-                json.dump(self.processes, f)
+            if not self.registry.update(folder_name, expect, **values):
+                return False
         except Exception as e:
-            print(f"Error saving processes: {e}")
-    
-    def _allocate_ephemeral_port(self, used_ports: list[int]) -> int:
-        """Allocate an available high-range port (49152–65535)."""
-        low, high = 49152, 65535
-        # Try random probes first for good distribution
-        for _ in range(100):
-            candidate = random.randint(low, high)
-            if candidate in used_ports:
-                continue
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                try:
-                    s.bind(("127.0.0.1", candidate))
-                    return candidate
-                except OSError:
-                    continue
-        # Fallback: sequential scan
-        for candidate in range(low, high + 1):
-            if candidate in used_ports:
-                continue
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                try:
-                    s.bind(("127.0.0.1", candidate))
-                    return candidate
-                except OSError:
-                    continue
-        raise RuntimeError("No available ephemeral ports found in 49152–65535 range")
+            # The local copy still lets this worker carry on
+            print(f"Error saving demo record {folder_name}: {e}")
+        with self._lock:
+            info = self.processes.get(folder_name)
+            if info is not None:
+                info.update(values)
+        return True
+    
+    def _is_stale(self, info: Dict) -> bool:
+        """Whether a record no longer stands for a live demo and may be replaced"""
+        if info.get('state') == STATE_FAILED:
+            return True
+        if info['host'] != HOST:
+            # Only its own host can check the process; it clears the record,
+            # and renews its lease while alive
+            seen = max(info.get('heartbeat_at') or 0, info['updated_at'])
+            return time.time() - seen > settings.DEMO_REGISTRY_LEASE
+        pid = info.get('pid')
+        if pid:
+            return not self._is_process_running(pid)
+        if info.get('profile') == STATIC and info.get('state') == STATE_READY:
+            # Served from disk, no process
+            return not (export_dir(Path(info['path'])) / 'index.html').is_file()
+        # Claimed but not spawned yet: stale once its worker gave up on it
+        owner_pid = int(info['owner'].rpartition(':')[2])
+        return time.time() - info['updated_at'] > SPAWN_CLAIM_TIMEOUT or not self._is_process_running(owner_pid)
+    
+    def owns(self, folder_name: str) -> bool:
+        """Whether this worker spawned (or adopted) a demo"""
+        return self.processes.get(folder_name, {}).get('owner') == worker_id()
+    
+    def _forget(self, folder_name: str):
+        """Drop a demo's process record, its proxy route and cached assets"""
+        info = self.processes.get(folder_name)
+        if info is not None:
+            try:
+                # Only this process's record: another worker may have restarted it
+                self.registry.delete(folder_name, info.get('pid'))
+            except Exception as e:
+                print(f"Error removing demo record {folder_name}: {e}")
+        self._drop_local(folder_name)
+    
+    def _drop_local(self, folder_name: str):
+        """Forget a demo in this worker only"""
+        with self._lock:
+            info = self.processes.pop(folder_name, None)
+            self.last_request.pop(folder_name, None)
+            self._flushed_requests.pop(folder_name, None)
+            event = self._ready_events.pop(folder_name, None)
+        # Its port may be leased to another demo next
+        for port in {routing_table.port_for(folder_name), (info or {}).get('port')} - {None}:
+            upstream_pool.discard(f"http://127.0.0.1:{port}")
+        port_allocator.release(folder_name)
+        if event:
+            # Release anyone waiting for a start that will never finish
+            event.set()
+        routing_table.remove_port(folder_name)
+        asset_cache.invalidate(folder_name)
+        if info and info.get('profile') == STATIC:
+            exported_pages.invalidate(str(export_dir(Path(info['path']))))
+    
+    def touch(self, folder_name: str, request: bool = True):
+        """Record that a demo just received a request (or, without request, just started)
 
+        Only in memory: flush_touches saves it for the other workers.
+        """
+        now = time.time()
+        with self._lock:
+            self.last_request[folder_name] = now
+            if request:
+                self._pending_requests[folder_name] = self._pending_requests.get(folder_name, 0) + 1
+    
+    def flush_touches(self):
+        """Save last-request times for the other workers' idle reapers (blocking)
+
+        At most one write per demo every TOUCH_FLUSH_INTERVAL seconds.
+        """
+        now = time.time()
+        with self._lock:
+            due = [
+                (folder_name, at, self._pending_requests.pop(folder_name, 0))
+                for folder_name, at in self.last_request.items()
+                if at > self._flushed_requests.get(folder_name, 0)
+                and now - self._flushed_requests.get(folder_name, 0) >= TOUCH_FLUSH_INTERVAL
+            ]
+            for folder_name, _, _ in due:
+                self._flushed_requests[folder_name] = now
+        for folder_name, at, requests in due:
+            self._flush_touch(folder_name, at, requests)
+    
+    def _flush_touch(self, folder_name: str, at: float, requests: int):
+        try:
+            self.registry.touch(folder_name, at, requests)
+        except Exception as e:
+            print(f"Error saving last request of {folder_name}: {e}")
+    
+    def flush_usage(self):
+        """Write every demo's pending request count to the registry (at shutdown)"""
+        with self._lock:
+            pending = [
+                (folder_name, self.last_request.get(folder_name, time.time()), requests)
+                for folder_name, requests in self._pending_requests.items()
+            ]
+            self._pending_requests.clear()
+        for folder_name, at, requests in pending:
+            self._flush_touch(folder_name, at, requests)
+    
+    def sync_registry(self):
+        """Follow the registry (blocking): drop or move the routes of demos
+        stopped or restarted by other workers, save last-request times and
+        renew this host's lease on its records"""
+        self.flush_touches()
+        now = time.time()
+        if now - self._heartbeat_at >= settings.DEMO_REGISTRY_LEASE / 4:
+            try:
+                self.registry.heartbeat(HOST, now)
+                self._heartbeat_at = now
+            except Exception as e:
+                print(f"Error renewing the registry lease of {HOST}: {e}")
+        self._sync()
+    
+    def idle_seconds(self, folder_name: str) -> Optional[float]:
+        """Seconds since a demo's last request (or start) in any worker, None if unknown"""
+        seen = [self.last_request.get(folder_name), self.processes.get(folder_name, {}).get('last_request')]
+        seen = [t for t in seen if t is not None]
+        return time.time() - max(seen) if seen else None
+    
     def get_port_for_demo(self, folder_name: str) -> int:
-        """Get or assign a port for a demo using high-range dynamic ports.
+        """Get or lease a port for a demo from the port pool.
 
         Reuse an existing port only if the recorded process is still running; otherwise
-        allocate a fresh port to avoid conflicts.
+        lease a fresh one, reserved for this demo until it is stopped or dies.
         """
         # Clean up stale record if present
         if folder_name in self.processes:
-            pid = self.processes[folder_name].get('pid')
-            if pid and self._is_process_running(pid):
+            if not self._is_stale(self.processes[folder_name]):
                 return self.processes[folder_name]['port']
             else:
-                # Remove stale entry before allocating a new port
-                try:
-                    del self.processes[folder_name]
-                except Exception:
-                    pass
-                self._save_processes()
-        used_ports = [p['port'] for p in self.processes.values()]
-        return self._allocate_ephemeral_port(used_ports)
+                # Remove stale entry (and its lease) before leasing a new port
+                self._forget(folder_name)
+        return port_allocator.reserve(folder_name)
+    
+    def _already_running(self, info: Dict) -> Dict:
+        result = {
+            'status': 'already_running',
+            'state': info['state'],
+            'port': info['port'],
+            'pid': info.get('pid')
+        }
+        if info['host'] != HOST:
+            result['host'] = info['host']
+        return result
     
     def start_demo(self, folder_name: str, project_path: str) -> Dict:
-        """Start a demo project"""
-        # Check if already running
-        if folder_name in self.processes:
-            pid = self.processes[folder_name].get('pid')
-            if pid and self._is_process_running(pid):
-                return {
-                    'status': 'already_running',
-                    'port': self.processes[folder_name]['port'],
-                    'pid': pid
-                }
+        """Start a demo project
+        
+        Returns as soon as the process is spawned, in the 'starting' state
+        (or 'building', for a production or static demo whose sources changed
+        since its last build); use wait_until_ready to block until it serves
+        requests. Only one worker spawns a demo: the others get 'already_running'.
+        """
+        # Check if already running (or still starting), here or in another worker
+        self._refresh(folder_name)
+        if folder_name in self.processes and not self._is_stale(self.processes[folder_name]):
+            return self._already_running(self.processes[folder_name])
         
-        # Get port
-        port = self.get_port_for_demo(folder_name)
+        demo_dir = Path(project_path) / folder_name
+        if not demo_dir.exists():
+            return {'status': 'error', 'message': f'Demo folder not found: {folder_name}'}
+        setup = self.registry.setup_job(folder_name)
+        if setup is not None:
+            return {'status': 'error', 'message': f"Demo is still being set up ({setup['kind']} job {setup['id']})"}
+        profile = demo_profile(folder_name)
+        
+        # Claim the demo before spawning, so no other worker starts it too
+        try:
+            for _ in range(CLAIM_ATTEMPTS):
+                port = self.get_port_for_demo(folder_name)
+                record = {
+                    'folder_name': folder_name,
+                    'host': HOST,
+                    'owner': worker_id(),
+                    'pid': None,
+                    'port': port,
+                    'state': STATE_STARTING,
+                    'profile': profile,
+                    'started_at': time.time(),
+                    'path': str(demo_dir),
+                }
+                try:
+                    with self._lock:
+                        existing = self.registry.claim(record, self._is_stale)
+                        if existing is None:
+                            self.processes[folder_name] = dict(record, updated_at=time.time())
+                    break
+                except PortTaken:
+                    # Another worker leased it at the same time; learn its leases and retry
+                    port_allocator.release(folder_name)
+                    self._sync()
+            else:
+                return {'status': 'error', 'message': 'Could not claim a free port'}
+        except Exception as e:
+            port_allocator.release(folder_name)
+            return {'status': 'error', 'message': str(e)}
+        if existing is not None:
+            port_allocator.release(folder_name)
+            self._refresh(folder_name)
+            return self._already_running(existing)
         
-        # Start the process
+        # Build first if the profile needs it and the sources changed since the last build
         try:
-            demo_dir = Path(project_path) / folder_name
-            
-            if not demo_dir.exists():
-                return {'status': 'error', 'message': f'Demo folder not found: {folder_name}'}
-            
-            # Change to demo directory and start
-            env = os.environ.copy()
-            env['PORT'] = str(port)
-            # Increase file watching limits to prevent conflicts between multiple Next.js servers
-            env['NODE_OPTIONS'] = '--max-old-space-size=4096'
+            if settings.NEXT_CACHE_SNAPSHOTS:
+                # A new demo compiles from its template's cache rather than from scratch
+                next_cache.seed(demo_dir)
+            source_hash = None
+            if profile != DEV:
+                source_hash = build_cache.source_hash(demo_dir, profile)
+                if not build_cache.is_current(demo_dir, profile, source_hash):
+                    return self._build(folder_name, demo_dir, port, profile, source_hash)
+            return self._serve(folder_name, demo_dir, port, profile, {'owner': worker_id(), 'pid': None}, source_hash)
+        except Exception as e:
+            self._forget(folder_name)
+            return {'status': 'error', 'message': str(e)}
+    
+    def _demo_env(self, demo_dir: Path, port: int, profile: str) -> Dict[str, str]:
+        env = os.environ.copy()
+        env['PORT'] = str(port)
+        # Bound each demo's V8 heap so a few demos cannot take the whole host
+        max_old_space = load_demo_config(demo_dir.name).get('max_old_space_mb', settings.DEMO_NODE_MAX_OLD_SPACE_MB)
+        env['NODE_OPTIONS'] = f'--max-old-space-size={int(max_old_space)}'
+        if profile == DEV:
             # Prevent Next.js from watching parent directories unnecessarily
             env['WATCHPACK_POLLING'] = 'true'
-            
-            process = subprocess.Popen(
-                ['npm', 'run', 'dev', '--', '-p', str(port)],
-                cwd=str(demo_dir),
-                env=env,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                start_new_session=True  # Detach from parent process
-            )
-            
-            # Store process info
-            self.processes[folder_name] = {
-                'pid': process.pid,
-                'port': port,
-                'status': 'running',
-                'path': str(demo_dir)
-            }
-            
-            self._save_processes()
-            
-            return {
-                'status': 'started',
-                'port': port,
-                'pid': process.pid
+        return script_env(demo_dir, env)
+    
+    def _spawn(self, folder_name: str, demo_dir: Path, script: str, args: list, env: Dict[str, str]):
+        """Run a package.json script of the demo, returning the process and how it was launched"""
+        # `next dev -p PORT` itself when possible, saving an npm process per demo
+        direct = load_demo_config(folder_name).get('direct_exec', settings.DEMO_DIRECT_EXEC)
+        command, launcher = script_command(demo_dir, script, args, direct=bool(direct))
+        process = subprocess.Popen(
+            command,
+            cwd=str(demo_dir),
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True  # Detach from parent process
+        )
+        # Keep reading its output, or the child blocks once a pipe fills up
+        demo_logs.attach(folder_name, process)
+        return process, launcher
+    
+    def _build(self, folder_name: str, demo_dir: Path, port: int, profile: str, source_hash: str) -> Dict:
+        """Start the demo's build script; it is served once the build succeeds"""
+        build, launcher = self._spawn(folder_name, demo_dir, 'build', [], self._demo_env(demo_dir, port, profile))
+        # The build process stands for the demo until then, so the claim stays live
+        self._store(folder_name, {'owner': worker_id(), 'pid': None}, pid=build.pid, state=STATE_BUILDING)
+        with self._lock:
+            event = self._ready_events.setdefault(folder_name, threading.Event())
+            event.clear()
+        threading.Thread(
+            target=self._finish_build,
+            args=(folder_name, build, demo_dir, port, profile, source_hash, event),
+            name=f"build-{folder_name}",
+            daemon=True,
+        ).start()
+        return {
+            'status': 'started',
+            'state': STATE_BUILDING,
+            'port': port,
+            'pid': build.pid,
+            'profile': profile,
+            'launcher': launcher
+        }
+    
+    def _finish_build(self, folder_name: str, build: subprocess.Popen, demo_dir: Path, port: int,
+                      profile: str, source_hash: str, event: threading.Event):
+        started = time.monotonic()
+        try:
+            code = build.wait(timeout=settings.DEMO_BUILD_TIMEOUT)
+            error = f'Build failed with exit code {code}' if code else None
+        except subprocess.TimeoutExpired:
+            self._signal_tree(build.pid, signal.SIGKILL)
+            build.wait()
+            error = f'Build did not finish in {settings.DEMO_BUILD_TIMEOUT:.0f}s'
+        if not error and profile == STATIC and not (export_dir(demo_dir) / 'index.html').is_file():
+            error = "Build wrote no static export (set output: 'export' in next.config.js)"
+        
+        # Unless it was stopped meanwhile, possibly by another worker
+        building = {'pid': build.pid, 'state': STATE_BUILDING}
+        if error:
+            if self._store(folder_name, building, state=STATE_FAILED, error=error):
+                print(f"Demo {folder_name} failed to build: {error}")
+            event.set()
+            return
+        print(f"Built demo {folder_name} in {time.monotonic() - started:.1f}s")
+        if settings.NEXT_CACHE_SNAPSHOTS:
+            next_cache.publish(demo_dir)
+        try:
+            build_cache.record(demo_dir, source_hash)
+            self._serve(folder_name, demo_dir, port, profile, building, source_hash)
+        except Exception as e:
+            self._store(folder_name, building, state=STATE_FAILED, error=str(e))
+            event.set()
+    
+    def _serve(self, folder_name: str, demo_dir: Path, port: int, profile: str, expect: Dict,
+               source_hash: Optional[str] = None) -> Dict:
+        """Spawn the demo's server for its profile, or route to its static export"""
+        # A fresh server may serve a different build under the same paths
+        asset_cache.invalidate(folder_name)
+        
+        if profile == STATIC:
+            # Let the proxy send compressed files as they are on disk (no-op when up to date)
+            precompress_export(str(export_dir(demo_dir)))
+            started_at = self.processes.get(folder_name, {}).get('started_at') or time.time()
+            values = {'state': STATE_READY, 'startup_seconds': round(time.time() - started_at, 3)}
+            # No process stands for it any more (not even the build)
+            if not self._store(folder_name, expect, pid=None, build_hash=source_hash, **values):
+                return {'status': 'error', 'message': 'Stopped while starting'}
+            port_allocator.activate(folder_name)
+            self._route(folder_name, {'profile': STATIC, 'path': str(demo_dir), 'port': port})
+            self.touch(folder_name, request=False)
+            event = self._ready_events.get(folder_name)
+            if event:
+                event.set()
+            return {'status': 'started', 'state': STATE_READY, 'port': port, 'pid': None, 'profile': profile}
+        
+        script = 'dev' if profile == DEV else 'start'
+        process, launcher = self._spawn(
+            folder_name, demo_dir, script, ['-p', str(port)], self._demo_env(demo_dir, port, profile)
+        )
+        self._supervise(folder_name, process)
+        
+        # Record the pid; it is routed once the probe finds it ready
+        if not self._store(folder_name, expect, pid=process.pid, state=STATE_STARTING, build_hash=source_hash):
+            self._signal_tree(process.pid, signal.SIGTERM)
+            return {'status': 'error', 'message': 'Stopped while starting'}
+        self.touch(folder_name, request=False)
+        # returncode is set by the supervisor thread once the child is reaped
+        self._watch_startup(folder_name, process.pid, port, lambda: process.returncode is None)
+        
+        return {
+            'status': 'started',
+            'state': STATE_STARTING,
+            'port': port,
+            'pid': process.pid,
+            'profile': profile,
+            'launcher': launcher
+        }
+    
+    def _watch_startup(self, folder_name: str, pid: int, port: int, alive: Callable[[], bool]):
+        """Probe a starting demo in the background until it is ready or failed"""
+        with self._lock:
+            event = self._ready_events.setdefault(folder_name, threading.Event())
+            event.clear()
+        threading.Thread(
+            target=self._probe_readiness,
+            args=(folder_name, pid, port, alive, event),
+            name=f"probe-{folder_name}",
+            daemon=True,
+        ).start()
+    
+    def _probe_once(self, port: int, path: str) -> bool:
+        """TCP connect, then an HTTP request the server must answer"""
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1.0).close()
+        except OSError:
+            return False
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=settings.DEMO_PROBE_HTTP_TIMEOUT)
+        try:
+            # The first request also makes `next dev` compile the page
+            conn.request('GET', path, headers={'User-Agent': 'central-illustration-probe'})
+            return conn.getresponse().status not in NOT_READY_HTTP_STATUSES
+        except (OSError, http.client.HTTPException):
+            return False
+        finally:
+            conn.close()
+    
+    def _probe_readiness(self, folder_name: str, pid: int, port: int, alive: Callable[[], bool], event: threading.Event):
+        path = load_demo_config(folder_name).get('ready_path', '/')
+        started_at = self.processes.get(folder_name, {}).get('started_at', time.time())
+        deadline = time.monotonic() + settings.DEMO_STARTUP_TIMEOUT
+        delay = 0.1
+        error = None
+        while True:
+            info = self.processes.get(folder_name, {})
+            if info.get('pid') != pid or info.get('state') == STATE_STOPPING:
+                return  # stopped or restarted meanwhile
+            if not alive():
+                error = 'Process exited during startup'
+                break
+            probe_started = time.monotonic()
+            if self._probe_once(port, path):
+                # For `next dev` this request waited for the page's first compile
+                first_page = round(time.monotonic() - probe_started, 3)
+                break
+            if time.monotonic() >= deadline:
+                error = f'Not ready after {settings.DEMO_STARTUP_TIMEOUT:.0f}s'
+                break
+            time.sleep(delay)
+            delay = min(delay * 2, 2.0)
+        
+        if error:
+            values = {'state': STATE_FAILED, 'error': error}
+        else:
+            values = {
+                'state': STATE_READY,
+                'startup_seconds': round(time.time() - started_at, 3),
+                'first_page_seconds': first_page,
             }
+        # Unless it was stopped or restarted meanwhile, possibly by another worker
+        if not self._store(folder_name, {'pid': pid, 'state': STATE_STARTING}, **values):
+            event.set()
+            return
+        
+        if error:
+            print(f"Demo {folder_name} failed to start: {error}")
+            self._signal_tree(pid, signal.SIGTERM)
+        else:
+            print(f"Demo {folder_name} ready on port {port} in {values['startup_seconds']:.1f}s "
+                  f"(first page {first_page:.1f}s)")
+            next_cache.record_first_page(folder_name, first_page)
+            port_allocator.activate(folder_name)
+            self._route(folder_name, {'port': port})
+        event.set()
+    
+    def _supervise(self, folder_name: str, process: subprocess.Popen):
+        """Reap a spawned demo as soon as it exits so it never lingers as a zombie"""
+        with self._lock:
+            self._children[folder_name] = process
+        
+        def wait():
+            code = process.wait()
+            demo_logs.buffer(folder_name).append('system', f"--- pid {process.pid} exited with code {code} ---")
+            with self._lock:
+                if self._children.get(folder_name) is process:
+                    del self._children[folder_name]
+                info = self.processes.get(folder_name)
+                crashed = bool(info) and info.get('pid') == process.pid and info.get('state') == STATE_READY
+            if crashed:
+                # Unexpected exit: drop the route and whatever the group left behind
+                print(f"Demo {folder_name} exited with code {code}")
+                self._signal_tree(process.pid, signal.SIGTERM)
+                self._forget(folder_name)
+        
+        threading.Thread(target=wait, name=f"reap-{folder_name}", daemon=True).start()
+    
+    def _signal_tree(self, pid: int, sig: int, tree: Optional[list] = None):
+        """Signal a demo's whole process group plus any descendants that left it"""
+        try:
+            # Demos run in their own session, so the group id is the leader's pid
+            os.killpg(pid, sig)
+        except OSError:
+            pass
+        for child in tree or procfs.process_tree(pid):
+            try:
+                os.kill(child, sig)
+            except OSError:
+                pass
+    
+    def wait_until_ready(self, folder_name: str, timeout: Optional[float] = None) -> Dict:
+        """Block until a starting demo is ready or failed (or timeout), then return its status"""
+        event = self._ready_events.get(folder_name)
+        if event is not None:
+            event.wait(timeout)
+        else:
+            # Started by another worker: follow its record in the registry
+            deadline = time.monotonic() + (settings.DEMO_STARTUP_TIMEOUT if timeout is None else timeout)
+            self._refresh(folder_name)
+            while self.is_starting(folder_name) and time.monotonic() < deadline:
+                time.sleep(REGISTRY_POLL_INTERVAL)
+                self._refresh(folder_name)
+        return self.get_demo_status(folder_name)
+    
+    def is_starting(self, folder_name: str) -> bool:
+        return self.processes.get(folder_name, {}).get('state') in (STATE_BUILDING, STATE_STARTING)
+    
+    def _begin_stop(self, folder_name: str):
+        """Mark a demo stopping and SIGTERM its tree
+        
+        Returns (None, tree) to wait on, or (result, None) if there is nothing to stop.
+        """
+        # It may have been started by another worker
+        self._refresh(folder_name)
+        if folder_name not in self.processes:
+            return {'status': 'not_found'}, None
+        
+        info = self.processes[folder_name]
+        pid = info.get('pid')
+        if not pid:
+            if info.get('profile') == STATIC and info.get('state') == STATE_READY:
+                # Nothing runs; just stop routing to the export
+                self._forget(folder_name)
+                return {'status': 'stopped'}, None
+            return {'status': 'not_running'}, None
+        
+        self._store(folder_name, {'pid': pid}, state=STATE_STOPPING)
+        routing_table.remove_port(folder_name)
+        # Collect the tree first: children are reparented once npm exits
+        tree = procfs.process_tree(pid)
+        # Try graceful termination first (npm, next dev and its workers)
+        self._signal_tree(pid, signal.SIGTERM, tree)
+        return None, tree
+    
+    def _finish_stop(self, folder_name: str, tree: list) -> Dict:
+        """Force kill whatever survived SIGTERM and drop the record"""
+        killed = any(self._is_process_running(p) for p in tree)
+        if killed:
+            self._signal_tree(tree[0], signal.SIGKILL, tree)
+        info = self.processes.get(folder_name, {})
+        self._forget(folder_name)
+        if settings.NEXT_CACHE_SNAPSHOTS and not killed and (info.get('profile') or DEV) == DEV and info.get('path'):
+            # A dev server that exited on its own left a complete compiler cache
+            next_cache.publish(Path(info['path']))
+        return {'status': 'stopped'}
+    
+    def stop_demo(self, folder_name: str) -> Dict:
+        """Stop a demo project (blocking; see stop_demo_async)"""
+        try:
+            result, tree = self._begin_stop(folder_name)
+            if result:
+                return result
+            deadline = time.monotonic() + settings.DEMO_STOP_TIMEOUT
+            while time.monotonic() < deadline and any(self._is_process_running(p) for p in tree):
+                time.sleep(STOP_POLL_INTERVAL)
+            return self._finish_stop(folder_name, tree)
         except Exception as e:
             return {'status': 'error', 'message': str(e)}
     
-    def stop_demo(self, folder_name: str) -> Dict:
-        """Stop a demo project"""
-        if folder_name not in self.processes:
-            return {'status': 'not_found'}
+    async def stop_demo_async(self, folder_name: str) -> Dict:
+        """Stop a demo: SIGTERM, wait for exit up to DEMO_STOP_TIMEOUT, then SIGKILL
         
-        pid = self.processes[folder_name].get('pid')
-        if pid:
-            try:
-                # Try graceful termination first
-                import signal
-                os.kill(pid, signal.SIGTERM)
-                
-                # Wait a bit
-                import time
-                time.sleep(1)
-                
-                # Force kill if still running
-                if self._is_process_running(pid):
-                    os.kill(pid, signal.SIGKILL)
-                
-                del self.processes[folder_name]
-                self._save_processes()
-                
-                return {'status': 'stopped'}
-            except ProcessLookupError:
-                # Process already gone
-                del self.processes[folder_name]
-                self._save_processes()
-                return {'status': 'stopped'}
-            except Exception as e:
-                return {'status': 'error', 'message': str(e)}
+        The registry writes, /proc scan and cleanup before and after run in
+        a thread; the grace period is waited out on the event loop, so it
+        ties up no worker thread and returns as soon as the tree has exited.
+        """
+        try:
+            result, tree = await asyncio.to_thread(self._begin_stop, folder_name)
+            if result:
+                return result
+            deadline = time.monotonic() + settings.DEMO_STOP_TIMEOUT
+            while time.monotonic() < deadline and any(self._is_process_running(p) for p in tree):
+                await asyncio.sleep(STOP_POLL_INTERVAL)
+            return await asyncio.to_thread(self._finish_stop, folder_name, tree)
+        except Exception as e:
+            return {'status': 'error', 'message': str(e)}
+    
+    async def stop_many(self, folder_names: list, parallelism: Optional[int] = None) -> Dict:
+        """Stop several demos concurrently, at most `parallelism` at a time"""
+        semaphore = asyncio.Semaphore(parallelism or settings.DEMO_STOP_PARALLELISM)
+        started = time.monotonic()
+        
+        async def stop(folder_name: str) -> Dict:
+            async with semaphore:
+                return await self.stop_demo_async(folder_name)
         
-        return {'status': 'not_running'}
+        results = await asyncio.gather(*(stop(f) for f in folder_names))
+        return {
+            'results': dict(zip(folder_names, results)),
+            'seconds': round(time.monotonic() - started, 3),
+        }
+    
+    def rebuild_demo(self, folder_name: str, project_path: str) -> Dict:
+        """Make a production or static demo serve its current sources
+        
+        Restarts it through a new build if the sources changed since the
+        build it serves; the demo is unavailable while it rebuilds.
+        """
+        self._refresh(folder_name)
+        info = self.processes.get(folder_name)
+        demo_dir = Path(project_path) / folder_name
+        profile = demo_profile(folder_name)
+        if profile == DEV:
+            return {'status': 'unchanged', 'message': 'Dev servers pick up changes themselves'}
+        if info and info.get('profile') == profile and info.get('build_hash') == build_cache.source_hash(demo_dir, profile):
+            return {'status': 'unchanged'}
+        result = self.stop_demo(folder_name)
+        if result['status'] == 'error':
+            return result
+        return self.start_demo(folder_name, project_path)
     
     def get_demo_status(self, folder_name: str) -> Dict:
         """Get status of a demo"""
+        self._refresh(folder_name)
         if folder_name not in self.processes:
             return {'status': 'not_running', 'port': None}
         
-        port = self.processes[folder_name]['port']
-        pid = self.processes[folder_name].get('pid')
+        info = self.processes[folder_name]
+        port = info['port']
+        pid = info.get('pid')
+        state = info.get('state', STATE_READY)
         
-        if pid and self._is_process_running(pid):
-            return {'status': 'running', 'port': port, 'pid': pid}
+        if state == STATE_FAILED:
+            # Kept so the failure stays visible until the next start or stop
+            return {'status': 'failed', 'state': state, 'port': None, 'error': info.get('error')}
+        
+        if not self._is_stale(info):
+            if state == STATE_READY:
+                self._route(folder_name, info)
+                return {
+                    'status': 'running',
+                    'state': state,
+                    'port': port,
+                    'pid': pid,
+                    'profile': info.get('profile') or DEV,
+                    'startup_seconds': info.get('startup_seconds'),
+                    'first_page_seconds': info.get('first_page_seconds')
+                }
+            return {'status': state, 'state': state, 'port': port, 'pid': pid, 'profile': info.get('profile') or DEV}
         else:
             # Process died
-            del self.processes[folder_name]
-            self._save_processes()
+            self._forget(folder_name)
             return {'status': 'not_running', 'port': None}
     
     def _is_process_running(self, pid: int) -> bool:
-        """Check if process is running"""
-        try:
-            os.kill(pid, 0)
-            return True
-        except OSError:
-            return False
+        """Check if process is running (a zombie counts as exited)"""
+        return procfs.is_alive(pid)
+    
+    def reconcile_orphans(self, projects_dir: str, dry_run: bool = False) -> Dict:
+        """Find and kill Node process trees under projects/ that no record owns
+        
+        These are demos left behind by a backend that crashed or was killed
+        before it could stop them. A Node process counts as orphaned when its
+        cwd is inside projects_dir, it is not part of a tracked demo, and its
+        session was started by a demo (the session leader is itself, another
+        orphan, or gone) - so a `npm run dev` typed in a terminal is left alone.
+        Commands run by jobs (npm install) are left alone too.
+        """
+        root = os.path.realpath(projects_dir) + os.sep
+        self._sync()
+        children = procfs.children_map()
+        keep = set(procfs.process_tree(os.getpid(), children))
+        for info in list(self.processes.values()):
+            pid = info.get('pid')
+            if pid and self._is_process_running(pid):
+                keep.update(procfs.process_tree(pid, children))
+        for pid in self.registry.job_pids(HOST):
+            if self._is_process_running(pid):
+                keep.update(procfs.process_tree(pid, children))
+        own_session = os.getsid(0)
+        
+        candidates = {}
+        for pid in procfs.all_pids():
+            if pid in keep:
+                continue
+            fields = procfs.stat_fields(pid)
+            path = procfs.exe(pid)
+            cwd = procfs.cwd(pid)
+            if not fields or not path or not cwd or os.path.basename(path) != 'node':
+                continue
+            if not (cwd + os.sep).startswith(root) or int(fields[3]) == own_session:
+                continue
+            age = procfs.age_seconds(pid)
+            if age is not None and age < SPAWN_CLAIM_TIMEOUT:
+                continue  # may be a spawn another worker has not recorded yet
+            candidates[pid] = int(fields[3])
+        
+        orphans = [
+            pid for pid, sid in candidates.items()
+            if sid == pid or sid in candidates or not self._is_process_running(sid)
+        ]
+        found = []
+        for pid in orphans:
+            tree = procfs.process_tree(pid, children)
+            found.append({
+                'pid': pid,
+                'cwd': procfs.cwd(pid),
+                'cmdline': ' '.join(procfs.cmdline(pid)),
+                'rss_bytes': sum(procfs.rss_bytes(p) for p in tree),
+                'tree': tree,
+            })
+        
+        if found and not dry_run:
+            for orphan in found:
+                self._signal_tree(orphan['pid'], signal.SIGTERM, orphan['tree'])
+            deadline = time.monotonic() + 2
+            pids = [p for orphan in found for p in orphan['tree']]
+            while time.monotonic() < deadline and any(self._is_process_running(p) for p in pids):
+                time.sleep(0.1)
+            for orphan in found:
+                if any(self._is_process_running(p) for p in orphan['tree']):
+                    self._signal_tree(orphan['pid'], signal.SIGKILL, orphan['tree'])
+            print(f"Killed {len(found)} orphaned demo process tree(s) under {projects_dir}")
+        
+        return {
+            'orphans': found,
+            'killed': 0 if dry_run else len(found),
+            'rss_bytes': sum(orphan['rss_bytes'] for orphan in found),
+        }
     
     def cleanup_all(self):
-        """Cleanup all processes"""
-        for folder_name in list(self.processes.keys()):
-            self.stop_demo(folder_name)
+        """Stop every demo this worker owns, in parallel, and record how long it took"""
+        self.flush_usage()
+        self._sync()
+        folder_names = [f for f in self.processes if self.owns(f)]
+        if not folder_names:
+            return
+        outcome = asyncio.run(self.stop_many(folder_names))
+        self.last_shutdown = {'demos': len(folder_names), 'seconds': outcome['seconds'], 'at': time.time()}
+        print(f"Stopped {len(folder_names)} demo(s) in {outcome['seconds']:.2f}s")
+        try:
+            with open(self.shutdown_file, 'w') as f:
+                json.dump(self.last_shutdown, f)
+        except OSError as e:
+            print(f"Error saving shutdown stats: {e}")
     
     def list_all(self) -> Dict:
-        """List all demo processes"""
+        """List all demo processes on this host, whichever worker started them"""
+        self._sync()
         result = {}
-        for folder_name, info in self.processes.items():
+        for folder_name, info in list(self.processes.items()):
             pid = info.get('pid')
-            if pid and self._is_process_running(pid):
+            state = info.get('state', STATE_READY)
+            if state == STATE_FAILED:
+                result[folder_name] = {'status': 'failed', 'state': state, 'port': None, 'error': info.get('error')}
+            elif not self._is_stale(info):
+                idle = self.idle_seconds(folder_name)
                 result[folder_name] = {
-                    'status': 'running',
+                    'status': 'running' if state == STATE_READY else state,
+                    'state': state,
                     'port': info['port'],
-                    'pid': pid
+                    'pid': pid,
+                    'owner': info['owner'],
+                    'profile': info.get('profile') or DEV,
+                    'startup_seconds': info.get('startup_seconds'),
+                    'first_page_seconds': info.get('first_page_seconds'),
+                    'idle_seconds': round(idle, 1) if idle is not None else None
                 }
             else:
                 result[folder_name] = {'status': 'not_running', 'port': None}
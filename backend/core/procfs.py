@@ -0,0 +1,147 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+PROC = '/proc'
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def stat_fields(pid: int) -> Optional[List[str]]:
+    """Fields of /proc/<pid>/stat after the command name (state is [0])."""
+    data = _read(f"{PROC}/{pid}/stat")
+    if data is None:
+        return None
+    # The command name is parenthesised and may itself contain spaces
+    return data[data.rfind(')') + 2:].split()
+
+
+def rss_bytes(pid: int) -> int:
+    """Resident set size of one process, 0 if it is gone or unreadable."""
+    data = _read(f"{PROC}/{pid}/status")
+    if data is None:
+        return 0
+    for line in data.splitlines():
+        if line.startswith('VmRSS:'):
+            return int(line.split()[1]) * 1024
+    return 0
+
+
+def children_map() -> Dict[int, List[int]]:
+    """ppid -> child pids for every process visible in /proc."""
+    children: Dict[int, List[int]] = {}
+    for pid in all_pids():
+        fields = stat_fields(pid)
+        if fields:
+            children.setdefault(int(fields[1]), []).append(pid)
+    return children
+
+
+def process_tree(pid: int, children: Optional[Dict[int, List[int]]] = None) -> List[int]:
+    """A pid followed by all of its descendants (npm -> node -> next ...)."""
+    if children is None:
+        children = children_map()
+    tree = [pid]
+    for parent in tree:
+        tree.extend(children.get(parent, ()))
+    return tree
+
+
+def tree_rss_bytes(pid: int) -> int:
+    """Combined RSS of a process and its descendants."""
+    return sum(rss_bytes(p) for p in process_tree(pid))
+
+
+def age_seconds(pid: int) -> Optional[float]:
+    """Seconds since a process started, None if it is gone or unreadable."""
+    fields = stat_fields(pid)
+    uptime = _read(f"{PROC}/uptime")
+    if not fields or not uptime:
+        return None
+    # starttime is field 22 of stat, in clock ticks since boot
+    return float(uptime.split()[0]) - int(fields[19]) / CLOCK_TICKS
+
+
+def snapshot() -> Dict[int, Tuple[int, int, int, int]]:
+    """pid -> (ppid, CPU ticks, threads, RSS bytes) of every process.
+
+    One read of /proc/<pid>/stat per process covers all four, so a whole
+    host is sampled with a single pass over /proc.
+    """
+    processes = {}
+    for pid in all_pids():
+        fields = stat_fields(pid)
+        if not fields or fields[0] in ('Z', 'X'):
+            continue
+        # ppid, utime + stime, num_threads and rss (in pages) are fields 4, 14-15, 20 and 24
+        processes[pid] = (
+            int(fields[1]), int(fields[11]) + int(fields[12]), int(fields[17]), int(fields[21]) * PAGE_SIZE,
+        )
+    return processes
+
+
+def meminfo() -> Dict[str, int]:
+    """Fields of /proc/meminfo in bytes (MemTotal, MemAvailable, ...), empty without /proc."""
+    data = _read(f"{PROC}/meminfo")
+    info = {}
+    for line in (data or '').splitlines():
+        name, _, value = line.partition(':')
+        parts = value.split()
+        if parts and parts[0].isdigit():
+            info[name] = int(parts[0]) * (1024 if parts[1:] == ['kB'] else 1)
+    return info
+
+
+def fd_count(pid: int) -> int:
+    """Open file descriptors of a process, 0 if it is gone or unreadable."""
+    try:
+        return len(os.listdir(f"{PROC}/{pid}/fd"))
+    except OSError:
+        return 0
+
+
+def is_alive(pid: int) -> bool:
+    """True if the process exists and is not a zombie waiting to be reaped."""
+    fields = stat_fields(pid)
+    if fields is None:
+        # No /proc (or no such pid): fall back to a signal probe
+        try:
+            os.kill(pid, 0)
+        except OSError:
+            return False
+        return not os.path.isdir(PROC)
+    return fields[0] not in ('Z', 'X')
+
+
+def cwd(pid: int) -> Optional[str]:
+    try:
+        return os.readlink(f"{PROC}/{pid}/cwd")
+    except OSError:
+        return None
+
+
+def cmdline(pid: int) -> List[str]:
+    data = _read(f"{PROC}/{pid}/cmdline")
+    return [arg for arg in data.split('\0') if arg] if data else []
+
+
+def all_pids() -> List[int]:
+    try:
+        return [int(entry) for entry in os.listdir(PROC) if entry.isdigit()]
+    except OSError:
+        return []
+
+
+def exe(pid: int) -> Optional[str]:
+    """Path of the executable a process runs (unaffected by process titles)."""
+    try:
+        return os.readlink(f"{PROC}/{pid}/exe")
+    except OSError:
+        return None
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from core.config import settings
+from core.demo_config import load_demo_config
+from core.procfs import tree_rss_bytes
+from core.process_manager import process_manager
+from core.wake import demo_waker
+
+
+def idle_ttl(folder_name: str) -> float:
+    """Idle seconds after which a demo is stopped; 0 means never.
+
+    DEMO_IDLE_TTL is the default; "idle_ttl" in the demo's .demo.json
+    overrides it (0 or null keeps that demo running).
+    """
+    ttl = load_demo_config(folder_name).get('idle_ttl', settings.DEMO_IDLE_TTL)
+    try:
+        return float(ttl or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class IdleReaper:
+    """Background task that stops demos idle for longer than their TTL.
+
+    Idleness is measured from the last proxied request in any worker (or the
+    start, for a demo nobody has visited). Each worker reaps only the demos
+    it owns, so two workers never stop the same demo. The RSS of each
+    stopped process tree is recorded as reclaimed memory.
+    """
+
+    def __init__(self, interval: float, history: int = 50):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.reaped = 0
+        self.reclaimed_bytes = 0
+        self.events: deque = deque(maxlen=history)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Error in idle reaper: {e}")
+
+    def _idle_demos(self) -> list:
+        """(folder, pid, idle seconds, TTL) of this worker's demos past their TTL (blocking)"""
+        idle_demos = []
+        for folder_name, info in process_manager.list_all().items():
+            if info['status'] != 'running':
+                continue
+            if not process_manager.owns(folder_name):
+                continue  # the worker that owns it reaps it
+            if not info['pid']:
+                continue  # a static export: no process to reclaim
+            ttl = idle_ttl(folder_name)
+            idle = process_manager.idle_seconds(folder_name)
+            if ttl and idle is not None and idle >= ttl:
+                idle_demos.append((folder_name, info['pid'], idle, ttl))
+        return idle_demos
+
+    async def sweep(self) -> list:
+        """Stop every running demo past its idle TTL; returns the events."""
+        reaped = []
+        # The registry, .demo.json files and /proc are read off the event loop
+        for folder_name, pid, idle, ttl in await asyncio.to_thread(self._idle_demos):
+            if demo_waker.is_waking(folder_name):
+                continue
+
+            rss = await asyncio.to_thread(tree_rss_bytes, pid)
+            result = await process_manager.stop_demo_async(folder_name)
+            if result.get('status') != 'stopped':
+                print(f"Idle reaper could not stop {folder_name}: {result}")
+                continue
+
+            event = {
+                'folder_name': folder_name,
+                'idle_seconds': round(idle, 1),
+                'ttl': ttl,
+                'rss_bytes': rss,
+                'stopped_at': time.time(),
+            }
+            self.reaped += 1
+            self.reclaimed_bytes += rss
+            self.events.append(event)
+            reaped.append(event)
+            print(f"Stopped idle demo {folder_name} after {idle:.0f}s, reclaimed {rss / 1048576:.1f} MiB RSS")
+        return reaped
+
+    def stats(self) -> Dict:
+        return {
+            'interval': self.interval,
+            'default_ttl': settings.DEMO_IDLE_TTL,
+            'reaped': self.reaped,
+            'reclaimed_bytes': self.reclaimed_bytes,
+            'recent': list(self.events),
+        }
+
+
+# Global instance
+idle_reaper = IdleReaper(interval=settings.DEMO_REAPER_INTERVAL)
@@ -0,0 +1,296 @@
+import os
+import socket
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import (
+    Column, Float, Integer, MetaData, String, Table, Text, UniqueConstraint,
+    create_engine, delete, event, inspect, insert, or_, select, update,
+)
+from sqlalchemy.exc import IntegrityError
+
+from core import procfs
+
+
+# This machine; demo records are scoped to the host that runs the process
+HOST = socket.gethostname()
+
+metadata = MetaData()
+
+demo_processes = Table(
+    'demo_processes', metadata,
+    Column('folder_name', String(255), primary_key=True),
+    Column('host', String(255), nullable=False),
+    Column('owner', String(255), nullable=False),  # "<host>:<pid>" of the API worker that spawned it
+    Column('pid', Integer),                         # None while a spawn is claimed but not yet running
+    Column('port', Integer, nullable=False),
+    Column('state', String(16), nullable=False),
+    Column('profile', String(16)),                  # runtime profile; None for records of older versions
+    Column('build_hash', String(64)),               # source hash of the build being served
+    Column('path', Text),
+    Column('started_at', Float),
+    Column('startup_seconds', Float),
+    Column('first_page_seconds', Float),            # how long the readiness request for the first page took
+    Column('last_request', Float),
+    Column('error', Text),
+    Column('updated_at', Float, nullable=False),
+    Column('heartbeat_at', Float),                  # when its host last said it was alive
+    UniqueConstraint('host', 'port', name='uq_demo_processes_host_port'),
+)
+
+# How often each demo was requested, kept after it stops (prewarming picks the busiest)
+demo_usage = Table(
+    'demo_usage', metadata,
+    Column('folder_name', String(255), primary_key=True),
+    Column('requests', Integer, nullable=False),
+    Column('last_request', Float),
+)
+
+# Background jobs (project creation, installs, rebuilds), visible to every worker
+demo_jobs = Table(
+    'demo_jobs', metadata,
+    Column('id', String(32), primary_key=True),
+    Column('kind', String(32), nullable=False),
+    Column('folder_name', String(255)),
+    Column('owner', String(255), nullable=False),  # worker running it, as for demo_processes
+    Column('state', String(16), nullable=False),
+    Column('progress', Float, nullable=False),     # 0..1
+    Column('message', Text),
+    Column('error', Text),
+    Column('result', Text),                        # JSON
+    Column('cancel_requested', Integer, nullable=False),
+    Column('created_at', Float, nullable=False),
+    Column('started_at', Float),
+    Column('finished_at', Float),
+    Column('pid', Integer),                        # process group of the command it is running, if any
+)
+
+# Jobs that prepare a demo's files; the demo is not started while one is active
+SETUP_JOB_KINDS = ('npm_install',)
+
+
+class PortTaken(Exception):
+    """The port of a claim is already recorded for another demo on this host"""
+
+
+def worker_id() -> str:
+    # Computed on use: a worker forked after import has a different pid
+    return f"{HOST}:{os.getpid()}"
+
+
+def is_owner_alive(owner: str) -> bool:
+    """Whether the worker named by an owner field still runs (always assumed on other hosts)."""
+    host, _, pid = owner.rpartition(':')
+    return host != HOST or procfs.is_alive(int(pid))
+
+
+def default_registry_url() -> str:
+    path = Path.home() / ".central-illustration" / "demo_registry.db"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return f"sqlite:///{path}"
+
+
+class DemoRegistry:
+    """Demo process records shared by every API worker (and host) using the same store.
+
+    By default this is an SQLite file in WAL mode, so concurrent workers on
+    one machine read without blocking and write one at a time. Point
+    DEMO_REGISTRY_URL at the main database to share it across hosts.
+    Every change is a single-row statement or a short transaction, and
+    spawning goes through claim(), so exactly one worker starts a demo.
+    """
+
+    def __init__(self, url: str = ""):
+        self.url = url or default_registry_url()
+        self.is_sqlite = self.url.startswith('sqlite')
+        if self.is_sqlite:
+            self.engine = create_engine(self.url, connect_args={'check_same_thread': False, 'timeout': 30})
+            self._configure_sqlite()
+        else:
+            self.engine = create_engine(self.url, pool_pre_ping=True)
+        metadata.create_all(self.engine)
+        self._add_missing_columns()
+
+    def _configure_sqlite(self):
+        @event.listens_for(self.engine, 'connect')
+        def on_connect(dbapi_connection, connection_record):
+            # Let SQLAlchemy's BEGIN below control transactions
+            dbapi_connection.isolation_level = None
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            cursor.execute('PRAGMA busy_timeout=30000')
+            cursor.close()
+
+        @event.listens_for(self.engine, 'begin')
+        def on_begin(conn):
+            # Writers take the lock up front so read-then-write is atomic;
+            # readers keep WAL's non-blocking snapshots
+            if conn.get_execution_options().get('immediate'):
+                conn.exec_driver_sql('BEGIN IMMEDIATE')
+            else:
+                conn.exec_driver_sql('BEGIN')
+
+    def _add_missing_columns(self):
+        """Add columns introduced after a registry table was created (all nullable)"""
+        with self._write() as conn:
+            # Inspected under the write lock, so concurrent workers add each column once
+            for table in (demo_processes, demo_jobs):
+                existing = {column['name'] for column in inspect(conn).get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in existing:
+                        column_type = column.type.compile(dialect=self.engine.dialect)
+                        conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+
+    @contextmanager
+    def _write(self):
+        """A transaction that holds the write lock from its first statement"""
+        with self.engine.connect() as conn:
+            conn.execution_options(immediate=True)
+            with conn.begin():
+                yield conn
+
+    def all(self) -> Dict[str, Dict]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(demo_processes)).mappings().all()
+        return {row['folder_name']: dict(row) for row in rows}
+
+    def get(self, folder_name: str) -> Optional[Dict]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(demo_processes).where(demo_processes.c.folder_name == folder_name)
+            ).mappings().first()
+        return dict(row) if row else None
+
+    def claim(self, record: Dict, is_stale: Callable[[Dict], bool]) -> Optional[Dict]:
+        """Atomically take a demo's slot to spawn it.
+
+        Inserts record unless a live record for the folder exists (one that
+        is_stale rejects), in which case that record is returned instead.
+        Raises PortTaken if another demo on this host holds the port.
+        """
+        folder_name = record['folder_name']
+        query = select(demo_processes).where(demo_processes.c.folder_name == folder_name)
+        if not self.is_sqlite:
+            query = query.with_for_update()
+        try:
+            with self._write() as conn:
+                row = conn.execute(query).mappings().first()
+                if row is not None:
+                    existing = dict(row)
+                    if not is_stale(existing):
+                        return existing
+                    conn.execute(delete(demo_processes).where(demo_processes.c.folder_name == folder_name))
+                now = time.time()
+                conn.execute(insert(demo_processes).values(**record, updated_at=now, heartbeat_at=now))
+        except IntegrityError:
+            # Lost a race for the folder (first insert) or for the port
+            existing = self.get(folder_name)
+            if existing is not None and existing['owner'] != record['owner']:
+                return existing
+            raise PortTaken(record['port'])
+        return None
+
+    def update(self, folder_name: str, expect: Optional[Dict] = None, **values) -> bool:
+        """Set values on a record, only if its columns still equal expect."""
+        query = update(demo_processes).where(demo_processes.c.folder_name == folder_name)
+        for column, value in (expect or {}).items():
+            query = query.where(demo_processes.c[column] == value)
+        with self._write() as conn:
+            result = conn.execute(query.values(**values, updated_at=time.time()))
+        return result.rowcount == 1
+
+    def heartbeat(self, host: str, at: float):
+        """Renew the lease of every record of a host (see DEMO_REGISTRY_LEASE)."""
+        with self._write() as conn:
+            conn.execute(update(demo_processes).where(demo_processes.c.host == host).values(heartbeat_at=at))
+
+    def touch(self, folder_name: str, at: float, requests: int = 0):
+        """Move a demo's last_request forward (never back) and add to its request count."""
+        with self._write() as conn:
+            conn.execute(
+                update(demo_processes)
+                .where(demo_processes.c.folder_name == folder_name)
+                .where(or_(demo_processes.c.last_request.is_(None), demo_processes.c.last_request < at))
+                .values(last_request=at)
+            )
+            if requests:
+                self._count_requests(conn, folder_name, at, requests)
+
+    def _count_requests(self, conn, folder_name: str, at: float, requests: int):
+        counted = conn.execute(
+            update(demo_usage)
+            .where(demo_usage.c.folder_name == folder_name)
+            .values(requests=demo_usage.c.requests + requests, last_request=at)
+        ).rowcount
+        if not counted:
+            conn.execute(insert(demo_usage).values(folder_name=folder_name, requests=requests, last_request=at))
+
+    def most_requested(self, limit: int) -> Dict[str, int]:
+        """The demos with the most requests, busiest first, with their counts."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(demo_usage.c.folder_name, demo_usage.c.requests)
+                .order_by(demo_usage.c.requests.desc(), demo_usage.c.last_request.desc())
+                .limit(limit)
+            ).all()
+        return {folder_name: requests for folder_name, requests in rows}
+
+    def delete(self, folder_name: str, pid: Optional[int] = None) -> bool:
+        """Remove a record; with pid, only if it still describes that process."""
+        query = delete(demo_processes).where(demo_processes.c.folder_name == folder_name)
+        if pid is not None:
+            query = query.where(demo_processes.c.pid == pid)
+        with self._write() as conn:
+            return conn.execute(query).rowcount == 1
+
+    def add_job(self, record: Dict):
+        with self._write() as conn:
+            conn.execute(insert(demo_jobs).values(**record))
+
+    def update_job(self, job_id: str, states: Optional[tuple] = None, **values) -> bool:
+        """Set values on a job, only if it is in one of states (when given)."""
+        query = update(demo_jobs).where(demo_jobs.c.id == job_id)
+        if states:
+            query = query.where(demo_jobs.c.state.in_(states))
+        with self._write() as conn:
+            return conn.execute(query.values(**values)).rowcount == 1
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self.engine.connect() as conn:
+            row = conn.execute(select(demo_jobs).where(demo_jobs.c.id == job_id)).mappings().first()
+        return dict(row) if row else None
+
+    def jobs(self, limit: int, folder_name: Optional[str] = None, states: Optional[tuple] = None) -> List[Dict]:
+        """Most recent jobs first, optionally of one demo or in some states."""
+        query = select(demo_jobs).order_by(demo_jobs.c.created_at.desc()).limit(limit)
+        if folder_name is not None:
+            query = query.where(demo_jobs.c.folder_name == folder_name)
+        if states:
+            query = query.where(demo_jobs.c.state.in_(states))
+        with self.engine.connect() as conn:
+            return [dict(row) for row in conn.execute(query).mappings().all()]
+
+    def job_pids(self, host: str) -> List[int]:
+        """Pids of the commands started by running jobs of live workers on a host"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(demo_jobs.c.pid, demo_jobs.c.owner)
+                .where(demo_jobs.c.owner.like(f'{host}:%'))
+                .where(demo_jobs.c.state == 'running')
+                .where(demo_jobs.c.pid.isnot(None))
+            ).all()
+        return [row.pid for row in rows if is_owner_alive(row.owner)]
+
+    def setup_job(self, folder_name: str) -> Optional[Dict]:
+        """A queued or running setup job of a demo whose worker is still alive"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(demo_jobs)
+                .where(demo_jobs.c.folder_name == folder_name)
+                .where(demo_jobs.c.kind.in_(SETUP_JOB_KINDS))
+                .where(demo_jobs.c.state.in_(('queued', 'running')))
+            ).mappings().all()
+        return next((dict(row) for row in rows if is_owner_alive(row['owner'])), None)
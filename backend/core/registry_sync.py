@@ -0,0 +1,60 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+from core.config import settings
+from core.process_manager import process_manager
+
+
+class RegistrySync:
+    """Background task keeping this worker in step with the demo registry.
+
+    The proxy routes from an in-memory table and counts requests in memory,
+    so neither touches the registry on the event loop. Every interval, this
+    re-reads the registry in a thread: routes of demos that other workers
+    stopped are dropped and those of demos restarted on another port move,
+    so a route never outlives its demo by more than an interval, pending
+    last-request times are written for the other workers, and this host's
+    lease on its records is renewed for the other hosts.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.syncs = 0
+        self.last_sync_seconds: Optional[float] = None
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                started = time.monotonic()
+                await asyncio.to_thread(process_manager.sync_registry)
+                self.syncs += 1
+                self.last_sync_seconds = round(time.monotonic() - started, 4)
+            except Exception as e:
+                print(f"Error syncing the demo registry: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            'interval': self.interval,
+            'syncs': self.syncs,
+            'last_sync_seconds': self.last_sync_seconds,
+        }
+
+
+# Global instance
+registry_sync = RegistrySync(interval=settings.DEMO_REGISTRY_SYNC_INTERVAL)
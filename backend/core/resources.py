@@ -0,0 +1,203 @@
+import array
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional
+
+from core import procfs
+from core.config import settings
+from core.process_manager import process_manager
+
+# Columns of a sample and the array typecode each is stored with
+METRICS = (
+    ('timestamp', 'd'),
+    ('rss_bytes', 'Q'),
+    ('cpu_seconds', 'd'),
+    ('cpu_percent', 'd'),
+    ('open_fds', 'I'),
+    ('threads', 'I'),
+    ('processes', 'I'),
+)
+
+# Decimals kept when a float column is reported
+ROUNDING = {'timestamp': 3, 'cpu_seconds': 2, 'cpu_percent': 1}
+
+
+class SampleRing:
+    """Fixed-size history of one demo's samples.
+
+    Each metric is a preallocated array.array of `capacity` slots; once
+    full, a new sample overwrites the oldest, so recording allocates
+    nothing and a demo's history never grows past its capacity.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._columns = {name: array.array(code, [0]) * capacity for name, code in METRICS}
+        self._next = 0
+        self.count = 0
+
+    def append(self, sample: Dict):
+        for name, column in self._columns.items():
+            column[self._next] = sample[name]
+        self._next = (self._next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def _row(self, index: int) -> Dict:
+        return {
+            name: round(column[index], ROUNDING[name]) if name in ROUNDING else column[index]
+            for name, column in self._columns.items()
+        }
+
+    def latest(self) -> Optional[Dict]:
+        return self._row((self._next - 1) % self.capacity) if self.count else None
+
+    def samples(self) -> List[Dict]:
+        """All samples, oldest first."""
+        start = (self._next - self.count) % self.capacity
+        return [self._row((start + i) % self.capacity) for i in range(self.count)]
+
+    def peak(self, name: str):
+        start = (self._next - self.count) % self.capacity
+        column = self._columns[name]
+        return max((column[(start + i) % self.capacity] for i in range(self.count)), default=0)
+
+
+class ResourceSampler:
+    """Background task recording what each running demo costs the host.
+
+    Every interval, the process tree of each demo with a process (its
+    server, or its build) is summed from /proc: RSS, CPU time, open file
+    descriptors, threads and process count. The CPU percentage is the CPU
+    time used since the previous sample of the same tree. One pass over
+    /proc serves all demos, so a sweep costs one stat read per process on
+    the host plus one fd listing per demo process; its own CPU time is
+    reported as overhead_percent.
+    """
+
+    def __init__(self, interval: float, history: int):
+        self.interval = interval
+        self.history = max(1, history)
+        self._task: Optional[asyncio.Task] = None
+        self._rings: Dict[str, SampleRing] = {}
+        # Root pid each demo's last sample was taken from (a restart resets its CPU baseline)
+        self._roots: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.sweeps = 0
+        self.last_sweep_seconds = 0.0
+        self.total_cpu_seconds = 0.0
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.sample)
+            except Exception as e:
+                print(f"Error in resource sampler: {e}")
+            await asyncio.sleep(self.interval)
+
+    def sample(self) -> Dict[str, Dict]:
+        """Take one sample of every demo with a process; returns them by folder."""
+        cpu_started = time.thread_time()
+        roots = {
+            folder_name: info['pid'] for folder_name, info in process_manager.list_all().items()
+            if info.get('pid')
+        }
+        processes = procfs.snapshot()
+        children: Dict[int, List[int]] = {}
+        for pid, (ppid, _, _, _) in processes.items():
+            children.setdefault(ppid, []).append(pid)
+        now = time.time()
+
+        samples = {}
+        for folder_name, root in roots.items():
+            if root not in processes:
+                continue
+            tree = procfs.process_tree(root, children)
+            ticks = threads = rss = 0
+            for pid in tree:
+                _, pid_ticks, pid_threads, pid_rss = processes.get(pid, (0, 0, 0, 0))
+                ticks += pid_ticks
+                threads += pid_threads
+                rss += pid_rss
+            sample = {
+                'timestamp': now,
+                'rss_bytes': rss,
+                'cpu_seconds': ticks / procfs.CLOCK_TICKS,
+                'cpu_percent': 0.0,
+                'open_fds': sum(procfs.fd_count(pid) for pid in tree),
+                'threads': threads,
+                'processes': len(tree),
+            }
+            with self._lock:
+                ring = self._rings.get(folder_name)
+                if ring is None:
+                    ring = self._rings[folder_name] = SampleRing(self.history)
+                previous = ring.latest()
+                if previous and self._roots.get(folder_name) == root and now > previous['timestamp']:
+                    # Children that exited take their CPU time along; never report less than nothing
+                    used = sample['cpu_seconds'] - previous['cpu_seconds']
+                    sample['cpu_percent'] = max(0.0, used / (now - previous['timestamp']) * 100)
+                self._roots[folder_name] = root
+                ring.append(sample)
+            samples[folder_name] = sample
+
+        with self._lock:
+            # Stopped demos: their history goes with them
+            for folder_name in [name for name in self._rings if name not in roots]:
+                del self._rings[folder_name]
+                self._roots.pop(folder_name, None)
+        self.last_sweep_seconds = time.thread_time() - cpu_started
+        self.total_cpu_seconds += self.last_sweep_seconds
+        self.sweeps += 1
+        return samples
+
+    def latest(self, folder_name: str) -> Optional[Dict]:
+        with self._lock:
+            ring = self._rings.get(folder_name)
+            return ring.latest() if ring else None
+
+    def history(self, folder_name: str) -> List[Dict]:
+        with self._lock:
+            ring = self._rings.get(folder_name)
+            return ring.samples() if ring else []
+
+    def stats(self) -> Dict:
+        with self._lock:
+            demos = {
+                folder_name: dict(
+                    ring.latest(),
+                    peak_rss_bytes=ring.peak('rss_bytes'),
+                    peak_open_fds=ring.peak('open_fds'),
+                    samples=ring.count,
+                )
+                for folder_name, ring in self._rings.items()
+            }
+        return {
+            'interval': self.interval,
+            'history': self.history,
+            'sweeps': self.sweeps,
+            'last_sweep_seconds': round(self.last_sweep_seconds, 4),
+            'overhead_percent': round(self.last_sweep_seconds / self.interval * 100, 3) if self.interval > 0 else None,
+            'total_rss_bytes': sum(demo['rss_bytes'] for demo in demos.values()),
+            'demos': dict(sorted(demos.items(), key=lambda item: item[1]['rss_bytes'], reverse=True)),
+        }
+
+
+# Global instance
+resource_sampler = ResourceSampler(
+    interval=settings.DEMO_SAMPLE_INTERVAL,
+    history=settings.DEMO_SAMPLE_HISTORY,
+)
@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from core.config import settings
+
+
+class DemoRoutingTable:
+    """In-memory routes used by the proxy on every request.
+
+    Two maps are kept in sync by their owners:
+
+    - demo_id -> folder_name, maintained by the demo CRUD endpoints (and filled
+      lazily from the database on a miss). Other workers' endpoints may
+      rename or delete a demo, so an entry is only trusted for folder_ttl
+      seconds before it is looked up again;
+    - folder_name -> upstream port, maintained by the process manager when a
+      demo starts, stops or is found dead; a statically exported demo is
+      routed to its export directory instead.
+
+    Lookups are plain dict reads, so a proxied request never touches the
+    database or the process state file once its demo is known.
+    """
+
+    def __init__(self, folder_ttl: float = 5.0):
+        self.folder_ttl = folder_ttl
+        # demo_id -> (folder_name, when it was set)
+        self._folders: Dict[int, Tuple[str, float]] = {}
+        self._ports: Dict[str, int] = {}
+        self._static_roots: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def set_demo(self, demo_id: int, folder_name: str):
+        with self._lock:
+            self._folders[demo_id] = (folder_name, time.monotonic())
+
+    def remove_demo(self, demo_id: int):
+        with self._lock:
+            self._folders.pop(demo_id, None)
+
+    def folder_for(self, demo_id: int) -> Optional[str]:
+        """A demo's folder, or None if unknown or not confirmed for folder_ttl"""
+        entry = self._folders.get(demo_id)
+        if entry is None or time.monotonic() - entry[1] > self.folder_ttl:
+            return None
+        return entry[0]
+
+    def set_port(self, folder_name: str, port: int):
+        with self._lock:
+            self._ports[folder_name] = port
+
+    def remove_port(self, folder_name: str):
+        """Drop a demo's route, whether a port or a static root"""
+        with self._lock:
+            self._ports.pop(folder_name, None)
+            self._static_roots.pop(folder_name, None)
+
+    def port_for(self, folder_name: str) -> Optional[int]:
+        return self._ports.get(folder_name)
+
+    def set_static_root(self, folder_name: str, root: str):
+        with self._lock:
+            self._static_roots[folder_name] = root
+
+    def static_root_for(self, folder_name: str) -> Optional[str]:
+        return self._static_roots.get(folder_name)
+
+    def has_route(self, folder_name: str) -> bool:
+        return folder_name in self._ports or folder_name in self._static_roots
+
+    def stats(self) -> Dict:
+        return {
+            'demos': len(self._folders),
+            'routes': len(self._ports),
+            'static_routes': len(self._static_roots),
+        }
+
+
+# Global instance
+routing_table = DemoRoutingTable(folder_ttl=settings.DEMO_FOLDER_CACHE_TTL)
@@ -0,0 +1,267 @@
+import asyncio
+import itertools
+import weakref
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Set, Tuple
+
+from core.config import settings
+
+
+# Request headers identifying a client; always part of the coalescing key
+CREDENTIAL_HEADERS = frozenset({'cookie', 'authorization'})
+
+
+def is_private(headers: List[Tuple[str, str]]) -> bool:
+    """Whether a response is meant for the one client that asked for it:
+    it sets a cookie, is private or no-store, or varies by credentials."""
+    for key, value in headers:
+        key, value = key.lower(), value.lower()
+        if key == 'set-cookie':
+            return True
+        if key == 'cache-control' and any(
+            directive.split('=')[0].strip() in ('private', 'no-store') for directive in value.split(',')
+        ):
+            return True
+        if key == 'vary' and any(name.strip() in CREDENTIAL_HEADERS | {'*'} for name in value.split(',')):
+            return True
+    return False
+
+
+class UpstreamBody:
+    """Status, headers and body stream of a response ready to send"""
+
+    def __init__(self, status_code: int, headers: List[Tuple[str, str]], chunks: AsyncIterator[bytes]):
+        self.status_code = status_code
+        self.headers = headers
+        self.chunks = chunks
+
+
+class _Reader:
+    """Where one subscriber is in a flight's body: the next chunk it needs"""
+
+    __slots__ = ('position', '__weakref__')
+
+    def __init__(self, position: int):
+        self.position = position
+
+
+class Flight:
+    """One in-progress upstream fetch shared by every identical request.
+
+    A background task pulls the body and fans it out, so a subscriber that
+    disconnects does not cut the others off. While the flight is open to
+    joiners its chunks are kept, so late subscribers replay the body from
+    the first byte. Once it is closed - the body grew past max_bytes, or
+    its Content-Length says it will - chunks every subscriber has read are
+    dropped, and the fetch waits for the slowest subscriber whenever more
+    than max_bytes are buffered, so a flight holds about max_bytes at most.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.status_code = 0
+        self.headers: List[Tuple[str, str]] = []
+        self.error: Optional[BaseException] = None
+        self.size = 0
+        self.done = False
+        self.shared = True
+        self.private = False
+        self._chunks: Deque[bytes] = deque()
+        self._base = 0  # absolute index of self._chunks[0]
+        self._buffered = 0
+        # A subscriber that never reads its body is dropped with its generator
+        self._readers: 'weakref.WeakSet[_Reader]' = weakref.WeakSet()
+        self._head_ready = asyncio.Event()
+        self._changed = asyncio.Condition()
+
+    async def run(self, opener: Callable[[], Awaitable[UpstreamBody]], on_full: Callable[[], None]):
+        try:
+            body = await opener()
+        except BaseException as e:
+            self.error = e
+            self.done = True
+            self._head_ready.set()
+            on_full()
+            return
+
+        self.status_code = body.status_code
+        self.headers = body.headers
+        try:
+            declared = int(next((value for key, value in body.headers if key.lower() == 'content-length'), 0))
+        except ValueError:
+            declared = 0
+        self.private = is_private(body.headers)
+        if self.private or declared > self.max_bytes:
+            # Not shared; those already waiting still get a large body,
+            # while a private one goes to the first subscriber only
+            self._close(on_full)
+        self._head_ready.set()
+        try:
+            async for chunk in body.chunks:
+                self.size += len(chunk)
+                if self.shared and self.size > self.max_bytes:
+                    # Too large to share further; existing subscribers finish
+                    self._close(on_full)
+                async with self._changed:
+                    self._chunks.append(chunk)
+                    self._buffered += len(chunk)
+                    self._changed.notify_all()
+                    if not self.shared and not await self._drained():
+                        break
+        except Exception as e:
+            self.error = e
+        finally:
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+            on_full()
+            aclose = getattr(body.chunks, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+
+    def _close(self, on_full: Callable[[], None]):
+        self.shared = False
+        on_full()
+
+    def _trim(self):
+        """Drop the chunks every subscriber has read."""
+        low = min((reader.position for reader in self._readers), default=self._base + len(self._chunks))
+        while self._base < low:
+            self._buffered -= len(self._chunks.popleft())
+            self._base += 1
+
+    async def _drained(self) -> bool:
+        """Wait (holding _changed) until at most max_bytes are buffered;
+        False once no subscriber is left to read the rest."""
+        self._trim()
+        while self._buffered > self.max_bytes:
+            try:
+                # Subscribers that vanish without reading do not notify
+                await asyncio.wait_for(self._changed.wait(), 1.0)
+            except asyncio.TimeoutError:
+                pass
+            self._trim()
+        return bool(self._readers)
+
+    async def head(self) -> Tuple[int, List[Tuple[str, str]]]:
+        """Wait for the upstream status line and headers (or its error)."""
+        await self._head_ready.wait()
+        if self.status_code == 0 and self.error is not None:
+            raise self.error
+        return self.status_code, self.headers
+
+    def iter_body(self) -> AsyncIterator[bytes]:
+        """Subscribe to the body from the first chunk, following the live fetch.
+
+        Call it when joining, before waiting for the head, so no chunk is
+        dropped before this subscriber has read it.
+        """
+        reader = _Reader(self._base)
+        self._readers.add(reader)
+        return self._follow(reader)
+
+    async def _follow(self, reader: _Reader) -> AsyncIterator[bytes]:
+        try:
+            while True:
+                async with self._changed:
+                    while reader.position >= self._base + len(self._chunks) and not self.done:
+                        await self._changed.wait()
+                    pending = list(itertools.islice(self._chunks, reader.position - self._base, None))
+                    finished = self.done
+                for chunk in pending:
+                    yield chunk
+                    reader.position += 1
+                if not self.shared:
+                    # The fetch may be waiting for this subscriber
+                    async with self._changed:
+                        self._changed.notify_all()
+                if finished and reader.position >= self._base + len(self._chunks):
+                    if self.error is not None:
+                        raise self.error
+                    return
+        finally:
+            self._readers.discard(reader)
+
+
+class RequestCoalescer:
+    """Single-flight for identical idempotent proxied requests.
+
+    Concurrent requests with the same key share one upstream fetch whose
+    response is fanned out to all of them, unless it is private to the
+    client that started it. A key leaves the table once its
+    fetch completes (or grows past max_bytes), so nothing is cached beyond
+    the in-flight window.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._flights: Dict[Hashable, Flight] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        # Header names each upstream has listed in Vary, added to its keys
+        self._vary: Dict[str, frozenset] = {}
+        self.upstream_fetches = 0
+        self.coalesced = 0
+        # Joiners that fetched their own response because the shared one was private
+        self.private_refetches = 0
+
+    def join(self, key: Hashable, opener: Callable[[], Awaitable[UpstreamBody]]) -> Flight:
+        """Return the flight for key, starting the upstream fetch if needed."""
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            return flight
+
+        flight = Flight(self.max_bytes)
+        self._flights[key] = flight
+        self.upstream_fetches += 1
+
+        def release():
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+        # Keep a reference so the fetch task is not garbage collected
+        task = asyncio.create_task(flight.run(opener, release))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return flight
+
+    async def fetch(self, key: Hashable, opener: Callable[[], Awaitable[UpstreamBody]]) -> UpstreamBody:
+        """Join the flight for key and wait for its head.
+
+        A response the upstream marks as private (see is_private) is only
+        given to the request that started the flight; the others that
+        joined it fetch their own with their opener.
+        """
+        started = key not in self._flights
+        flight = self.join(key, opener)
+        chunks = flight.iter_body()
+        status_code, headers = await flight.head()
+        if flight.private and not started:
+            await chunks.aclose()
+            self.private_refetches += 1
+            return await opener()
+        return UpstreamBody(status_code, headers, chunks)
+
+    def vary_for(self, upstream: str) -> frozenset:
+        return self._vary.get(upstream, frozenset())
+
+    def note_vary(self, upstream: str, vary: str):
+        """Remember the Vary header names an upstream responded with."""
+        names = {v.strip().lower() for v in vary.split(',') if v.strip()}
+        known = self._vary.get(upstream, frozenset())
+        if not names <= known:
+            self._vary[upstream] = known | names
+
+    def stats(self) -> Dict:
+        total = self.upstream_fetches + self.coalesced
+        return {
+            'in_flight': len(self._flights),
+            'upstream_fetches': self.upstream_fetches,
+            'coalesced_requests': self.coalesced,
+            'private_refetches': self.private_refetches,
+            'dedupe_ratio': round((self.coalesced - self.private_refetches) / total, 4) if total else 0.0,
+        }
+
+
+# Global instance
+request_coalescer = RequestCoalescer(settings.PROXY_COALESCE_MAX_BYTES)
@@ -0,0 +1,200 @@
+import gzip
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+from core.asset_cache import accepted_encodings, etag_matches
+from core.config import settings
+from core.html_rewriter import HTMLURLRewriter
+
+# Precompressed siblings of an exported file (about.html.br, about.html.gz), by encoding
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# Exported files gzipped after a build; smaller ones are not worth it
+COMPRESSIBLE_EXTENSIONS = ('.html', '.js', '.mjs', '.css', '.json', '.svg', '.txt', '.xml', '.map', '.webmanifest')
+MIN_COMPRESS_BYTES = 1024
+
+
+def resolve_export_path(root: str, path: str) -> Tuple[Optional[str], int]:
+    """File of a Next.js static export that answers a request path, and its status.
+
+    Follows the layout `next build` writes with output: 'export': / is
+    index.html, /about is about.html (or about/index.html with
+    trailingSlash), assets are plain files. Anything else gets the export's
+    404.html with a 404 status, or (None, 404) without one. Paths never
+    resolve outside root.
+    """
+    root = os.path.realpath(root)
+    clean = path.strip('/')
+    candidates = [clean, f"{clean}.html", os.path.join(clean, 'index.html')] if clean else ['index.html']
+    for relative in candidates:
+        full = os.path.realpath(os.path.join(root, relative))
+        if full.startswith(root + os.sep) and os.path.isfile(full):
+            return full, 200
+    not_found = os.path.join(root, '404.html')
+    return (not_found, 404) if os.path.isfile(not_found) else (None, 404)
+
+
+def select_variant(path: str, accept_encoding: str) -> Tuple[str, os.stat_result, str]:
+    """The file to send for an exported path: a precompressed sibling the client
+    accepts (br before gzip), else the file itself; with its stat and encoding.
+
+    A sibling older than the file is ignored, so a stale .gz never shadows
+    a rebuilt page.
+    """
+    st = os.stat(path)
+    for encoding in accepted_encodings(accept_encoding):
+        suffix = PRECOMPRESSED_SUFFIXES.get(encoding)
+        if suffix is None:
+            continue
+        try:
+            sibling = os.stat(path + suffix)
+        except OSError:
+            continue
+        if sibling.st_mtime_ns >= st.st_mtime_ns:
+            return path + suffix, sibling, encoding
+    return path, st, 'identity'
+
+
+def file_etag(st: os.stat_result, tag: str = '') -> str:
+    """Strong validator of a file version (and of a variant of it, via tag)."""
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}{"-" + tag if tag else ""}"'
+
+
+def last_modified(st: os.stat_result) -> str:
+    return formatdate(st.st_mtime, usegmt=True)
+
+
+def is_not_modified(if_none_match: Optional[str], if_modified_since: Optional[str], etag: str,
+                    st: os.stat_result) -> bool:
+    """Whether a conditional GET can be answered with 304.
+
+    If-None-Match wins over If-Modified-Since when both are sent (RFC 9110).
+    """
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(st.st_mtime) <= since
+
+
+def precompress_export(root: str) -> int:
+    """Write .gz siblings for the compressible files of an export.
+
+    Runs after a static build so the proxy can send them as-is. Up-to-date
+    siblings are kept; each one is written to a temporary file first, so a
+    request never sees a partial sibling. Returns how many were written.
+    """
+    written = 0
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                st = os.stat(path)
+                if st.st_size < MIN_COMPRESS_BYTES:
+                    continue
+                try:
+                    if os.stat(path + '.gz').st_mtime_ns >= st.st_mtime_ns:
+                        continue
+                except OSError:
+                    pass
+                with open(path, 'rb') as f:
+                    compressed = gzip.compress(f.read(), compresslevel=9, mtime=0)
+                if len(compressed) >= st.st_size:
+                    continue
+                temp = f"{path}.gz.tmp{os.getpid()}"
+                with open(temp, 'wb') as f:
+                    f.write(compressed)
+                os.replace(temp, path + '.gz')
+                written += 1
+            except OSError as e:
+                print(f"Could not precompress {path}: {e}")
+    return written
+
+
+class ExportedPageCache:
+    """Byte-budgeted LRU of exported HTML pages with their URLs rewritten.
+
+    HTML of a static export is rewritten for the demo's proxy prefix like
+    proxied HTML; caching the result (and its gzip form, made on first
+    request that accepts it) means a page is rewritten once per version of
+    the file rather than on every request. Entries are keyed by file and
+    prefix and checked against the file's mtime and size.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._pages: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def page(self, path: str, st: os.stat_result, url_prefix: str, accept_encoding: str) -> Tuple[bytes, str]:
+        """Rewritten page body, gzipped if the client accepts it; and its encoding."""
+        key = (path, url_prefix)
+        version = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry and entry['version'] == version:
+                self._pages.move_to_end(key)
+                self.hits += 1
+            else:
+                entry = None
+        if entry is None:
+            self.misses += 1
+            rewriter = HTMLURLRewriter(url_prefix)
+            with open(path, 'rb') as f:
+                body = rewriter.feed(f.read()) + rewriter.close()
+            entry = {'version': version, 'identity': body, 'gzip': None}
+            self._store(key, entry)
+        if 'gzip' not in accepted_encodings(accept_encoding) or len(entry['identity']) < MIN_COMPRESS_BYTES:
+            return entry['identity'], 'identity'
+        if entry['gzip'] is None:
+            compressed = gzip.compress(entry['identity'], compresslevel=6, mtime=0)
+            with self._lock:
+                if entry['gzip'] is None:
+                    entry['gzip'] = compressed
+                    if self._pages.get(key) is entry:
+                        self._bytes += len(compressed)
+        return entry['gzip'], 'gzip'
+
+    def _store(self, key: Tuple[str, str], entry: Dict):
+        size = len(entry['identity'])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._pages.pop(key, None)
+            if old:
+                self._bytes -= self._size(old)
+            self._pages[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._pages:
+                _, evicted = self._pages.popitem(last=False)
+                self._bytes -= self._size(evicted)
+
+    @staticmethod
+    def _size(entry: Dict) -> int:
+        return len(entry['identity']) + len(entry['gzip'] or b'')
+
+    def invalidate(self, root: str):
+        """Drop the pages of one export (after a rebuild or stop)."""
+        root = os.path.realpath(root) + os.sep
+        with self._lock:
+            for key in [key for key in self._pages if key[0].startswith(root)]:
+                self._bytes -= self._size(self._pages.pop(key))
+
+    def stats(self) -> Dict:
+        return {'pages': len(self._pages), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+# Global instance
+exported_pages = ExportedPageCache(settings.STATIC_PAGE_CACHE_BYTES)
@@ -0,0 +1,104 @@
+import asyncio
+from typing import Dict, Optional, Set, Tuple
+
+import httpx
+
+from core.config import settings
+
+
+def client_options(overrides: Optional[Dict] = None) -> Dict:
+    """Merge global proxy defaults with a demo's "proxy" overrides."""
+    options = {
+        'timeout': settings.PROXY_TIMEOUT,
+        'connect_timeout': settings.PROXY_CONNECT_TIMEOUT,
+        'max_connections': settings.PROXY_MAX_CONNECTIONS,
+        'max_keepalive_connections': settings.PROXY_MAX_KEEPALIVE_CONNECTIONS,
+        'keepalive_expiry': settings.PROXY_KEEPALIVE_EXPIRY,
+    }
+    for key, value in (overrides or {}).items():
+        if key in options and value is not None:
+            options[key] = value
+    return options
+
+
+class UpstreamClientPool:
+    """Long-lived httpx clients, one connection pool per upstream base URL.
+
+    Opening a new AsyncClient per proxied request pays a TCP connect for every
+    asset; keeping one client per upstream lets requests reuse keep-alive
+    connections.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, Tuple[Tuple, httpx.AsyncClient]] = {}
+        self._lock = asyncio.Lock()
+        # Loop the clients belong to, so discard can close them from any thread
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing: Set[asyncio.Task] = set()
+
+    def _build_client(self, options: Dict) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(options['timeout'], connect=options['connect_timeout']),
+            limits=httpx.Limits(
+                max_connections=options['max_connections'],
+                max_keepalive_connections=options['max_keepalive_connections'],
+                keepalive_expiry=options['keepalive_expiry'],
+            ),
+            follow_redirects=True,
+            trust_env=False,
+        )
+
+    async def get_client(self, base_url: str, overrides: Optional[Dict] = None) -> httpx.AsyncClient:
+        """Return the pooled client for an upstream, creating it on first use.
+
+        If the demo's options changed since the client was created, the client
+        is replaced. The old one is not closed, since responses still streaming
+        through it would break; it is released once they are done with it.
+        """
+        options = client_options(overrides)
+        key = tuple(sorted(options.items()))
+
+        entry = self._clients.get(base_url)
+        if entry and entry[0] == key:
+            return entry[1]
+
+        async with self._lock:
+            self._loop = asyncio.get_running_loop()
+            entry = self._clients.get(base_url)
+            if entry and entry[0] == key:
+                return entry[1]
+            client = self._build_client(options)
+            self._clients[base_url] = (key, client)
+        return client
+
+    def discard(self, base_url: str):
+        """Forget and close the client for an upstream whose demo stopped.
+
+        Safe to call from any thread; the client is closed on its event loop.
+        """
+        entry = self._clients.pop(base_url, None)
+        if entry is None or self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._close, entry[1])
+        except RuntimeError:
+            pass  # loop already closed (shutdown)
+
+    def _close(self, client: httpx.AsyncClient):
+        # Keep a reference so the close task is not garbage collected
+        task = self._loop.create_task(client.aclose())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def aclose(self):
+        """Close every pooled client (app shutdown)."""
+        clients = [client for _, client in self._clients.values()]
+        self._clients.clear()
+        await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {'upstreams': len(self._clients)}
+
+
+# Global instance, opened lazily and closed on app shutdown
+upstream_pool = UpstreamClientPool()
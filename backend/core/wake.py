@@ -0,0 +1,99 @@
+import asyncio
+from typing import Dict
+
+from core.config import settings
+from core.demo_config import PROJECTS_DIR, load_demo_config
+from core.process_manager import process_manager
+from core.routing import routing_table
+
+
+def auto_wake_enabled(folder_name: str) -> bool:
+    """Whether a stopped demo is started by the first proxied request.
+
+    DEMO_AUTO_WAKE is the default; "auto_wake" in the demo's .demo.json
+    overrides it either way.
+    """
+    return bool(load_demo_config(folder_name).get('auto_wake', settings.DEMO_AUTO_WAKE))
+
+
+class DemoWaker:
+    """Starts stopped demos on demand and parks requests until they are ready.
+
+    One wake per demo is in progress at a time; every request for that demo
+    waits on it. At most queue_size requests may wait per demo, and each
+    waits at most timeout seconds.
+    """
+
+    def __init__(self, timeout: float, queue_size: int):
+        self.timeout = timeout
+        self.queue_size = queue_size
+        self._wakes: Dict[str, asyncio.Task] = {}
+        self._waiting: Dict[str, int] = {}
+        self.wakes = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    async def _start_and_wait(self, folder_name: str) -> Dict:
+        result = await asyncio.to_thread(process_manager.start_demo, folder_name, PROJECTS_DIR)
+        if result['status'] not in ('started', 'already_running'):
+            return result
+        # Readiness is probed by the process manager; just wait for its verdict
+        result = await asyncio.to_thread(process_manager.wait_until_ready, folder_name, self.timeout)
+        if result['status'] == 'running':
+            return {'status': 'ready', 'port': result['port']}
+        if result['status'] in ('building', 'starting'):
+            return {'status': 'timeout'}
+        return {'status': 'error', 'message': result.get('error') or f"Demo is {result['status']}"}
+
+    async def wake(self, folder_name: str) -> Dict:
+        """Start a demo if needed and wait until it is ready.
+
+        Returns {'status': 'ready', 'port': ...}, or a 'queue_full',
+        'timeout' or 'error' status.
+        """
+        task = self._wakes.get(folder_name)
+        if task is None and routing_table.has_route(folder_name):
+            return {'status': 'ready', 'port': routing_table.port_for(folder_name)}
+
+        waiting = self._waiting.get(folder_name, 0)
+        if waiting >= self.queue_size:
+            self.rejected += 1
+            return {'status': 'queue_full'}
+
+        if task is None:
+            self.wakes += 1
+            task = asyncio.create_task(self._start_and_wait(folder_name))
+            self._wakes[folder_name] = task
+            task.add_done_callback(lambda _: self._wakes.pop(folder_name, None))
+
+        self._waiting[folder_name] = waiting + 1
+        try:
+            # shield: a waiter timing out or disconnecting leaves the wake running
+            result = await asyncio.wait_for(asyncio.shield(task), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            result = {'status': 'timeout'}
+        except Exception as e:
+            result = {'status': 'error', 'message': str(e)}
+        finally:
+            self._waiting[folder_name] -= 1
+            if not self._waiting[folder_name]:
+                del self._waiting[folder_name]
+        if result['status'] == 'timeout':
+            self.timeouts += 1
+        return result
+
+    def is_waking(self, folder_name: str) -> bool:
+        return folder_name in self._wakes
+
+    def stats(self) -> Dict:
+        return {
+            'waking': sorted(self._wakes),
+            'waiting': sum(self._waiting.values()),
+            'wakes': self.wakes,
+            'timeouts': self.timeouts,
+            'rejected': self.rejected,
+        }
+
+
+# Global instance
+demo_waker = DemoWaker(timeout=settings.DEMO_WAKE_TIMEOUT, queue_size=settings.DEMO_WAKE_QUEUE_SIZE)
@@ -1,7 +1,17 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from core.config import settings
-from api import auth, demos, comments, demo_manager, proxy, exporter, extensions, content_editor
+from core.demo_config import PROJECTS_DIR, load_demo_config
+from core.process_manager import process_manager
+from core.upstream import upstream_pool
+from core.registry_sync import registry_sync
+from core.reaper import idle_reaper
+from core.resources import resource_sampler
+from core.eviction import memory_evictor
+from core.prewarm import demo_prewarmer
+from core.jobs import job_engine
+from api import auth, demos, comments, demo_manager, proxy, exporter, extensions, content_editor, jobs
 
 app = FastAPI(
     title="Central Illustration API",
@@ -39,10 +49,102 @@ app.include_router(demo_manager.router)
 app.include_router(exporter.router)
 app.include_router(extensions.router)
 app.include_router(content_editor.router)
+app.include_router(jobs.router)
 # Proxy router must be last due to catch-all pattern
 app.include_router(proxy.router)
 
 
+@app.on_event("startup")
+async def open_upstream_pools():
+    """Open proxy connection pools for demos that are already running"""
+    for folder_name, info in process_manager.list_all().items():
+        if info['status'] == 'running':
+            await upstream_pool.get_client(
+                f"http://127.0.0.1:{info['port']}",
+                load_demo_config(folder_name).get('proxy'),
+            )
+
+
+@app.on_event("startup")
+async def reconcile_orphaned_demos():
+    """Kill demo processes a previous backend left running without a record"""
+    if settings.DEMO_RECONCILE_ON_STARTUP:
+        await asyncio.to_thread(process_manager.reconcile_orphans, PROJECTS_DIR)
+
+
+@app.on_event("startup")
+async def recover_jobs():
+    """Mark jobs left queued or running by an exited worker as failed"""
+    await asyncio.to_thread(job_engine.recover)
+
+
+@app.on_event("startup")
+async def prewarm_demos():
+    """Start the most requested (and listed) demos in the background"""
+    demo_prewarmer.start()
+
+
+@app.on_event("startup")
+async def start_registry_sync():
+    """Keep proxy routes in step with demos started and stopped by other workers"""
+    registry_sync.start()
+
+
+@app.on_event("startup")
+async def start_idle_reaper():
+    """Stop demos that stay idle past their TTL"""
+    idle_reaper.start()
+
+
+@app.on_event("startup")
+async def start_resource_sampler():
+    """Record RSS, CPU, open files and threads of each demo's process tree"""
+    resource_sampler.start()
+
+
+@app.on_event("startup")
+async def start_memory_evictor():
+    """Stop least recently used demos when demos use too much memory together"""
+    memory_evictor.start()
+
+
+@app.on_event("shutdown")
+async def stop_jobs():
+    """Cancel this worker's jobs, killing their commands"""
+    job_engine.shutdown()
+
+
+@app.on_event("shutdown")
+async def stop_prewarming():
+    await demo_prewarmer.stop()
+
+
+@app.on_event("shutdown")
+async def stop_registry_sync():
+    await registry_sync.stop()
+
+
+@app.on_event("shutdown")
+async def stop_idle_reaper():
+    await idle_reaper.stop()
+
+
+@app.on_event("shutdown")
+async def stop_resource_sampler():
+    await resource_sampler.stop()
+
+
+@app.on_event("shutdown")
+async def stop_memory_evictor():
+    await memory_evictor.stop()
+
+
+@app.on_event("shutdown")
+async def close_upstream_pools():
+    """Close all pooled proxy connections"""
+    await upstream_pool.aclose()
+
+
 @app.get("/")
 def root():
     return {
@@ -122,7 +122,7 @@ export default function EditorPage() {
   }
 
   const startPreview = async () => {
-    await apiService.startDemo(demoId)
+    await apiService.startDemo(demoId, true)
     const status = await apiService.getDemoStatus(demoId)
     setIsRunning(status?.status === 'running')
     setPreviewUrl(status?.url || null)
@@ -64,8 +64,8 @@ export default function DemoDetailPage() {
     if (!demo) return
     setIsLoadingStatus(true)
     try {
-      await apiService.startDemo(demo.id)
-      checkDemoStatus()
+      await apiService.startDemo(demo.id, true)
+      await checkDemoStatus()
     } catch (error) {
       console.error('Failed to start demo:', error)
       alert('Failed to start demo')
@@ -62,7 +62,7 @@ export default function DemoCard({ id, title, description, folderName, status, u
   const handleStartDemo = async () => {
     setIsLoadingControl(true)
     try {
-      await apiService.startDemo(id)
+      await apiService.startDemo(id, true)
       // Refresh status
       window.location.reload()
     } catch (error) {
@@ -142,8 +142,9 @@ export const apiService = {
   },
   
   // Demo Manager
-  startDemo: async (demoId: number) => {
-    const response = await api.post(`/demo-manager/start/${demoId}`)
+  // With wait, resolves once the demo serves (or failed) rather than while it is starting
+  startDemo: async (demoId: number, wait = false) => {
+    const response = await api.post(`/demo-manager/start/${demoId}${wait ? '?wait=true' : ''}`)
     return response.data
   },
   